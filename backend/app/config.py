@@ -1,19 +1,89 @@
-import os
-from pydantic import BaseModel
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-class Settings(BaseModel):
-    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
-    openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    use_langchain: bool = os.getenv("USE_LANGCHAIN", "false").lower() == "true"
-
-settings = Settings()
-
-# Debug: Check if API key is loaded
-if settings.openai_api_key:
-    print(f"✅ OpenAI API key loaded (length: {len(settings.openai_api_key)})")
-else:
+import os
+from pydantic import BaseModel
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+class Settings(BaseModel):
+    openai_api_key: str = os.getenv("OPENAI_API_KEY", "")
+    openai_model: str = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # OpenAI-compatible endpoint override, e.g. the bundled mock: http://localhost:8100/v1
+    openai_base_url: str = os.getenv("OPENAI_BASE_URL", "")
+    use_langchain: bool = os.getenv("USE_LANGCHAIN", "false").lower() == "true"
+
+    # Shared LLM HTTP client (connection pooling / keep-alive)
+    llm_http2: bool = os.getenv("LLM_HTTP2", "true").lower() == "true"
+    llm_max_connections: int = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+    llm_max_keepalive_connections: int = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    llm_keepalive_expiry: float = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+    llm_timeout: float = float(os.getenv("LLM_TIMEOUT", "120"))
+    llm_connect_timeout: float = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+
+    # Shared adaptive rate limiter (0 disables a bucket until provider headers report a limit)
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    llm_min_concurrency: int = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+    llm_rpm_limit: float = float(os.getenv("LLM_RPM_LIMIT", "0"))
+    llm_tpm_limit: float = float(os.getenv("LLM_TPM_LIMIT", "0"))
+
+    # Exact-match LLM response cache (empty db path = memory tier only)
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+    llm_cache_ttl: float = float(os.getenv("LLM_CACHE_TTL", "3600"))
+    llm_cache_db_path: str = os.getenv("LLM_CACHE_DB_PATH", "")
+    llm_cache_db_max_entries: int = int(os.getenv("LLM_CACHE_DB_MAX_ENTRIES", "10000"))
+
+    # Near-duplicate (semantic) cache tier, local hashed vectors
+    llm_semantic_cache_enabled: bool = os.getenv("LLM_SEMANTIC_CACHE_ENABLED", "false").lower() == "true"
+    llm_semantic_cache_threshold: float = float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    llm_semantic_cache_max_entries: int = int(os.getenv("LLM_SEMANTIC_CACHE_MAX_ENTRIES", "256"))
+    llm_semantic_cache_dims: int = int(os.getenv("LLM_SEMANTIC_CACHE_DIMS", "2048"))
+
+    # Coalesce identical in-flight LLM calls into one provider request
+    llm_singleflight_enabled: bool = os.getenv("LLM_SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+    # Retries with backoff, per-model circuit breaker, fallback model (empty = none)
+    llm_max_retries: int = int(os.getenv("LLM_MAX_RETRIES", "3"))
+    llm_retry_base_delay: float = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+    llm_retry_max_delay: float = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+    llm_breaker_failure_threshold: int = int(os.getenv("LLM_BREAKER_FAILURE_THRESHOLD", "5"))
+    llm_breaker_cooldown: float = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+    llm_fallback_model: str = os.getenv("LLM_FALLBACK_MODEL", "")
+
+    # Per-model price overrides for cost estimates, JSON: {"model": [input, cached_input, output]} USD per 1M tokens
+    llm_price_table: str = os.getenv("LLM_PRICE_TABLE", "")
+
+    # Token counting and context budgets: "auto" uses a locally cached tiktoken encoding, "approx" never does;
+    # windows override JSON: {"model": [context_window, max_output]}; max output 0 = the model's own maximum
+    llm_tokenizer: str = os.getenv("LLM_TOKENIZER", "auto")
+    llm_context_windows: str = os.getenv("LLM_CONTEXT_WINDOWS", "")
+    llm_max_output_tokens: int = int(os.getenv("LLM_MAX_OUTPUT_TOKENS", "0"))
+
+    # Request tracing: recent traces kept in memory (GET /traces); export dir writes OTel + Chrome files per trace
+    tracing_enabled: bool = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+    tracing_max_traces: int = int(os.getenv("TRACING_MAX_TRACES", "200"))
+    tracing_export_dir: str = os.getenv("TRACING_EXPORT_DIR", "")
+    tracing_service_name: str = os.getenv("TRACING_SERVICE_NAME", "thought-partner")
+
+    # Token budgets for iterative prompts ({state} per loop, {iteration_summary} in final synthesis); 0 = unbounded
+    iterative_state_max_tokens: int = int(os.getenv("ITERATIVE_STATE_MAX_TOKENS", "2000"))
+    iterative_summary_max_tokens: int = int(os.getenv("ITERATIVE_SUMMARY_MAX_TOKENS", "6000"))
+
+    # POST /run/batch: items run at once (their LLM calls share the limiter), payload cap, provider batch polling (s)
+    batch_max_concurrency: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+    batch_max_items: int = int(os.getenv("BATCH_MAX_ITEMS", "10000"))
+    batch_poll_interval: float = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+
+    # POST /jobs: background workers, queue bound, finished jobs kept; empty db path = in-memory store
+    jobs_max_workers: int = int(os.getenv("JOBS_MAX_WORKERS", "2"))
+    jobs_max_queued: int = int(os.getenv("JOBS_MAX_QUEUED", "100"))
+    jobs_max_retained: int = int(os.getenv("JOBS_MAX_RETAINED", "1000"))
+    jobs_db_path: str = os.getenv("JOBS_DB_PATH", "")
+
+settings = Settings()
+
+# Debug: Check if API key is loaded
+if settings.openai_api_key:
+    print(f"✅ OpenAI API key loaded (length: {len(settings.openai_api_key)})")
+else:
     print("❌ OpenAI API key not found in environment variables")
\ No newline at end of file
@@ -1,22 +1,53 @@
-import json, pathlib
-from .models import Recipe
-
-RECIPES: dict[str, Recipe] = {}
-
-def load_recipes(path: str | pathlib.Path):
-    global RECIPES
-    try:
-        data = json.loads(pathlib.Path(path).read_text(encoding="utf-8"))
-        RECIPES = { r["id"]: Recipe(**r) for r in data }
-        print(f"Loaded {len(RECIPES)} recipes successfully")
-    except Exception as e:
-        print(f"Error loading recipes: {e}")
-
-def list_recipes():
-    return [r for r in RECIPES.values()]
-
-# Auto-load recipes on module import
-try:
-    load_recipes("brainstorm_recipes.json")
-except Exception as e:
+import json, pathlib
+from typing import Any, Callable
+from .models import Recipe
+from .services.prompt_template import check_recipe_templates
+from .services.recipe_plan import PLANS, compile_plan
+
+RECIPES: dict[str, Recipe] = {}
+RECIPES_VERSION = 0  # Bumped on every load; derived caches (chat tool schemas) follow it
+_reload_hooks: list[Callable[[list[Recipe], int], Any]] = []
+
+def on_reload(hook: Callable[[list[Recipe], int], Any]):
+    """Call hook(recipes, version) after every load_recipes"""
+    _reload_hooks.append(hook)
+
+def load_recipes(path: str | pathlib.Path):
+    global RECIPES_VERSION
+    try:
+        data = json.loads(pathlib.Path(path).read_text(encoding="utf-8"))
+        # Compile each recipe into its execution plan now, so a misconfigured one is
+        # rejected at startup instead of failing a request after some LLM calls
+        recipes, plans = {}, {}
+        for r in data:
+            try:
+                recipe = Recipe(**r)
+                plans[recipe.id] = compile_plan(recipe)
+            except ValueError as e:
+                print(f"❌ Skipping recipe '{r.get('id')}': {e}")
+                continue
+            recipes[recipe.id] = recipe
+            # Flag placeholders no runner fills
+            for issue in check_recipe_templates(recipe):
+                print(f"⚠️ Recipe '{recipe.id}' {issue}")
+        # Updated in place: routers hold a reference to this dict, and plans are
+        # looked up by recipe object
+        RECIPES.clear()
+        RECIPES.update(recipes)
+        PLANS.clear()
+        PLANS.update(plans)
+        RECIPES_VERSION += 1
+        print(f"Loaded {len(RECIPES)} recipes successfully")
+        for hook in _reload_hooks:
+            hook(list_recipes(), RECIPES_VERSION)
+    except Exception as e:
+        print(f"Error loading recipes: {e}")
+
+def list_recipes():
+    return [r for r in RECIPES.values()]
+
+# Auto-load recipes on module import
+try:
+    load_recipes("brainstorm_recipes.json")
+except Exception as e:
     print(f"Could not auto-load recipes: {e}")
\ No newline at end of file
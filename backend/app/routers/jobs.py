@@ -0,0 +1,48 @@
+from fastapi import APIRouter, HTTPException
+from ..models import Job, RunRequest
+from ..recipes import RECIPES
+from ..services.job_queue import job_queue, JobQueueFull
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+def _summary(job: Job) -> dict:
+    """A job without its result (for listings and submit responses)"""
+    return job.model_dump(exclude={"result"})
+
+
+@router.post("", status_code=202)
+async def submit_job(req: RunRequest):
+    """Queue a run (same body as /run) and return its job id right away; poll GET /jobs/{id}"""
+    if req.recipe_id not in RECIPES:
+        raise HTTPException(404, f"Unknown recipe '{req.recipe_id}'. Available: {list(RECIPES.keys())}")
+    try:
+        job = await job_queue.submit(req)
+    except JobQueueFull as e:
+        raise HTTPException(429, str(e))
+    return _summary(job)
+
+
+@router.get("")
+async def list_jobs(limit: int = 50):
+    """Queue state and the most recent jobs (newest first, without results)"""
+    jobs = await job_queue.store.list(limit)
+    return {**job_queue.stats(), "jobs": [_summary(job) for job in jobs]}
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str) -> Job:
+    """Status, progress (last event with its loop/step/branch) and, once finished, the /run response or error"""
+    job = await job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown or expired job '{job_id}'")
+    return job
+
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str) -> Job:
+    """Cancel a queued or running job (a running one stops its provider calls); finished jobs are unchanged"""
+    job = await job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(404, f"Unknown or expired job '{job_id}'")
+    return job
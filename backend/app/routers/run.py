@@ -1,79 +1,294 @@
-from fastapi import APIRouter, HTTPException
-from ..models import RunRequest, RunResponse
-from ..recipes import RECIPES
-from ..config import settings
-from ..services import runner as native_runner
-from ..services import langchain_runner as lc_runner
-from ..services import unified_runner
-import json
-
-router = APIRouter(prefix="/run", tags=["run"])
-
-@router.post("")
-async def run(req: RunRequest) -> RunResponse:
-    print(f"Available recipes: {list(RECIPES.keys())}")
-    print(f"Requested recipe: {req.recipe_id}")
-    if req.recipe_id not in RECIPES:
-        raise HTTPException(404, f"Unknown recipe '{req.recipe_id}'. Available: {list(RECIPES.keys())}")
-    
-    recipe = RECIPES[req.recipe_id]
-    
-    # Use unified runner (with fallback to legacy runners)
-    try:
-        # Add loops to params if specified
-        params = req.params.copy()
-        if req.loops is not None:
-            params["loops"] = req.loops
-        
-        # Try new unified runner first
-        output = await unified_runner.run_recipe(recipe, params)
-        
-        # Parse result to get mode info
-        result_data = json.loads(output)
-        mode = result_data.get("mode", "auto")
-        
-    except Exception as e:
-        print(f"Unified runner failed, falling back to legacy: {e}")
-        # Fallback to legacy runners
-        mode = req.mode
-        if mode == "auto":
-            # Determine mode based on recipe type
-            if recipe.iterative:
-                mode = "iterative"
-            elif recipe.workflow and recipe.workflow.type in ["chain", "parallel", "orchestrator", "routing"]:
-                # New workflow types default to one-shot for legacy compatibility
-                mode = "one-shot"
-            else:
-                mode = "one-shot"
-        
-        # Only use legacy runners for recipes that are compatible
-        if mode == "iterative" and recipe.iterative:
-            if settings.use_langchain:
-                output = await lc_runner.run_iterative_generic(recipe, req.params, req.loops)
-            else:
-                output = await native_runner.run_iterative_generic(recipe, req.params, req.loops)
-        elif mode == "one-shot":
-            if settings.use_langchain:
-                output = await lc_runner.run_one_shot(recipe, req.params)
-            else:
-                output = await native_runner.run_one_shot(recipe, req.params)
-        else:
-            # If we can't handle it with legacy runners, re-raise the original error
-            raise e
-    
-    try:
-        parsed = json.loads(output)
-    except Exception:
-        parsed = output
-    
-    return RunResponse(recipe_id=recipe.id, mode=mode, output=parsed, meta={"model": settings.openai_model})
-
-
-@router.get("/runner-info/{recipe_id}")
-async def get_runner_info(recipe_id: str):
-    """Get information about what runner would be used for a recipe"""
-    if recipe_id not in RECIPES:
-        raise HTTPException(404, f"Unknown recipe '{recipe_id}'. Available: {list(RECIPES.keys())}")
-    
-    recipe = RECIPES[recipe_id]
-    return unified_runner.get_runner_info(recipe)
\ No newline at end of file
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from openai.types import Batch
+from openai.types.chat import ChatCompletion
+from ..models import RunRequest, RunResponse
+from ..recipes import RECIPES
+from ..config import settings
+from ..services import runner as native_runner
+from ..services import langchain_runner as lc_runner
+from ..services import unified_runner
+from ..services.rate_limiter import rate_limiter
+from ..services.llm_cache import llm_cache
+from ..services.semantic_cache import semantic_cache
+from ..services.singleflight import singleflight
+from ..services.sse import format_sse, SSE_HEADERS
+from ..services.resilience import breakers, CircuitOpenError
+from ..services.context_budget import ContextBudgetExceeded
+from ..services.tokenizer import token_counter
+from ..services.metrics import prompt_cache_stats
+from ..services.llm_client import get_llm_client
+from ..services import batch_runner
+import json
+import openai
+
+router = APIRouter(prefix="/run", tags=["run"])
+
+
+@router.post("")
+async def run(req: RunRequest) -> RunResponse:
+    return await _execute(req)
+
+
+async def _execute(req: RunRequest) -> RunResponse:
+    """One recipe run, as POST /run does it (also used per item by POST /run/batch)"""
+    print(f"Available recipes: {list(RECIPES.keys())}")
+    print(f"Requested recipe: {req.recipe_id}")
+    if req.recipe_id not in RECIPES:
+        raise HTTPException(404, f"Unknown recipe '{req.recipe_id}'. Available: {list(RECIPES.keys())}")
+    
+    recipe = RECIPES[req.recipe_id]
+    
+    # Use unified runner (with fallback to legacy runners)
+    try:
+        # Add loops to params if specified
+        params = req.params.copy()
+        if req.loops is not None:
+            params["loops"] = req.loops
+        if req.tracks is not None:
+            params["tracks"] = req.tracks
+        
+        # Try new unified runner first
+        output = await unified_runner.run_recipe(recipe, params)
+        
+        # Parse result to get mode info
+        result_data = json.loads(output)
+        mode = result_data.get("mode", "auto")
+        
+    except ContextBudgetExceeded as e:
+        # Caught before any provider call; the legacy runners would build the same prompt
+        raise HTTPException(413, str(e))
+    except (openai.APIError, CircuitOpenError) as e:
+        # Provider failures were already retried; re-running on the legacy path would only double the spend
+        print(f"Unified runner failed on the LLM provider: {e}")
+        raise HTTPException(503, f"LLM provider unavailable: {e}")
+    except Exception as e:
+        print(f"Unified runner failed, falling back to legacy: {e}")
+        # Fallback to legacy runners
+        mode = req.mode
+        if mode == "auto":
+            # Determine mode based on recipe type
+            if recipe.iterative:
+                mode = "iterative"
+            elif recipe.workflow and recipe.workflow.type in ["chain", "parallel", "orchestrator", "routing"]:
+                # New workflow types default to one-shot for legacy compatibility
+                mode = "one-shot"
+            else:
+                mode = "one-shot"
+        
+        # Only use legacy runners for recipes that are compatible
+        if mode == "iterative" and recipe.iterative:
+            if settings.use_langchain:
+                output = await lc_runner.run_iterative_generic(recipe, req.params, req.loops)
+            else:
+                output = await native_runner.run_iterative_generic(recipe, req.params, req.loops)
+        elif mode == "one-shot":
+            if settings.use_langchain:
+                output = await lc_runner.run_one_shot(recipe, req.params)
+            else:
+                output = await native_runner.run_one_shot(recipe, req.params)
+        else:
+            # If we can't handle it with legacy runners, re-raise the original error
+            raise e
+    
+    try:
+        parsed = json.loads(output)
+    except Exception:
+        parsed = output
+    
+    return RunResponse(recipe_id=recipe.id, mode=mode, output=parsed, meta=unified_runner.response_meta(parsed))
+
+
+@router.post("/stream")
+async def run_stream(req: RunRequest):
+    """
+    Run a recipe and stream progress as Server-Sent Events.
+    Each event is `event: <type>` + `data: <json>`; the last one is
+    `run_completed` (with the same output /run returns) or `error`.
+    """
+    if req.recipe_id not in RECIPES:
+        raise HTTPException(404, f"Unknown recipe '{req.recipe_id}'. Available: {list(RECIPES.keys())}")
+
+    recipe = RECIPES[req.recipe_id]
+    params = req.params.copy()
+    if req.loops is not None:
+        params["loops"] = req.loops
+    if req.tracks is not None:
+        params["tracks"] = req.tracks
+
+    async def event_source():
+        async for event in unified_runner.stream_recipe(recipe, params):
+            if event["type"] == "run_completed":
+                result = event["result"]
+                event = {
+                    "type": "run_completed",
+                    **RunResponse(recipe_id=recipe.id, mode=result.get("mode", "auto"), output=result,
+                                  meta=unified_runner.response_meta(result)).model_dump()
+                }
+            yield format_sse(event)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def _item_error(index: int, recipe_id: str, status_code: int, message: str) -> Dict[str, Any]:
+    return {"type": "item_completed", "index": index, "recipe_id": recipe_id, "status": "error",
+            "status_code": status_code, "error": message}
+
+
+async def _run_item(index: int, req: RunRequest) -> Dict[str, Any]:
+    """A batch item run like POST /run; failures become error results instead of failing the batch"""
+    try:
+        response = await _execute(req)
+    except HTTPException as e:
+        return _item_error(index, req.recipe_id, e.status_code, str(e.detail))
+    except Exception as e:
+        return _item_error(index, req.recipe_id, 500, str(e))
+    return {"type": "item_completed", "index": index, "recipe_id": req.recipe_id, "status": "ok",
+            "response": response.model_dump()}
+
+
+def _provider_batch_status(batch: Batch) -> Dict[str, Any]:
+    counts = batch.request_counts
+    return {
+        "batch_id": batch.id,
+        "status": batch.status,
+        "total": counts.total if counts else None,
+        "completed": counts.completed if counts else None,
+        "failed": counts.failed if counts else None
+    }
+
+
+def _batch_item(index: int, recipe_id: str, output: Any, batch: Batch,
+                request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """The item result of one provider batch output (a completion or the provider's error)"""
+    if not isinstance(output, ChatCompletion):
+        return _item_error(index, recipe_id, 502, output or f"No result in provider batch ({batch.status})")
+    recipe = RECIPES.get(recipe_id)
+    if recipe is None:
+        return _item_error(index, recipe_id, 404, f"Unknown recipe '{recipe_id}'")
+    try:
+        result = batch_runner.batch_result(recipe, output, batch.id, request)
+    except Exception as e:
+        return _item_error(index, recipe_id, 502, f"Unreadable batch output: {e}")
+    response = RunResponse(recipe_id=recipe.id, mode=result.get("mode", "auto"), output=result,
+                           meta=unified_runner.response_meta(result))
+    return {"type": "item_completed", "index": index, "recipe_id": recipe_id, "status": "ok",
+            "response": response.model_dump()}
+
+
+async def _run_deferred(items: List[Tuple[int, RunRequest]]):
+    """Single-shot items through the provider's batch API: submit, poll, then one result per item"""
+    requests: Dict[str, Dict[str, Any]] = {}
+    for index, req in items:
+        try:
+            requests[batch_runner.custom_id(index, req.recipe_id)] = batch_runner.batch_request(
+                RECIPES[req.recipe_id], req.params)
+        except ContextBudgetExceeded as e:
+            yield _item_error(index, req.recipe_id, 413, str(e))
+        except Exception as e:
+            yield _item_error(index, req.recipe_id, 500, str(e))
+    if not requests:
+        return
+
+    client = get_llm_client()
+    try:
+        batch = await batch_runner.submit_batch(client, requests)
+        yield {"type": "provider_batch_submitted", "batch_id": batch.id,
+               "items": [batch_runner.parse_custom_id(cid)[0] for cid in requests]}
+        async for batch in batch_runner.poll_batch(client, batch.id):
+            yield {"type": "provider_batch_progress", **_provider_batch_status(batch)}
+        outputs = await batch_runner.batch_outputs(client, batch)
+    except openai.APIError as e:
+        print(f"Provider batch failed: {e}")
+        for cid in requests:
+            index, recipe_id = batch_runner.parse_custom_id(cid)
+            yield _item_error(index, recipe_id, 503, f"Provider batch failed: {e}")
+        return
+
+    for cid, request in requests.items():
+        index, recipe_id = batch_runner.parse_custom_id(cid)
+        yield _batch_item(index, recipe_id, outputs.get(cid), batch, request)
+
+
+@router.post("/batch")
+async def run_batch(request: Request, deferred: bool = False,
+                    concurrency: Optional[int] = Query(None, ge=1)):
+    """
+    Run many recipes from one payload: a JSON array of /run bodies, or JSONL (one per line).
+    Streams JSON lines as items finish: `item_completed` (index, status, the /run response or
+    status_code + error), `provider_batch_submitted` / `provider_batch_progress` in deferred mode,
+    and a final `batch_completed` with counts. `deferred=true` sends single-shot items to the
+    provider's batch API; other items run live, at most `concurrency` (<= BATCH_MAX_CONCURRENCY) at once.
+    """
+    try:
+        items = batch_runner.parse_batch_payload(await request.body())
+    except ValueError as e:
+        raise HTTPException(400, f"Invalid batch: {e}")
+    concurrency = min(concurrency or settings.batch_max_concurrency, settings.batch_max_concurrency)
+
+    live, queued = [], []
+    for index, req in enumerate(items):
+        recipe = RECIPES.get(req.recipe_id)
+        if deferred and recipe is not None and batch_runner.deferrable(recipe, req):
+            queued.append((index, req))
+        else:
+            live.append((index, req))
+    print(f"📦 Batch of {len(items)} items: {len(live)} live, {len(queued)} deferred")
+
+    async def event_source():
+        counts = {"ok": 0, "error": 0}
+        streams = [batch_runner.run_bounded(live, _run_item, concurrency)]
+        if queued:
+            streams.append(_run_deferred(queued))
+        async for event in batch_runner.merge(*streams):
+            if event["type"] == "item_completed":
+                counts[event["status"]] += 1
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+        yield json.dumps({"type": "batch_completed", "items": len(items), **counts}) + "\n"
+
+    return StreamingResponse(event_source(), media_type="application/x-ndjson", headers=SSE_HEADERS)
+
+
+@router.get("/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """Status of a deferred provider batch; once it has finished, also the result of every item in it"""
+    client = get_llm_client()
+    try:
+        batch = await client.batches.retrieve(batch_id)
+        status = _provider_batch_status(batch)
+        if batch.status not in batch_runner.TERMINAL_STATUSES:
+            return status
+        outputs = await batch_runner.batch_outputs(client, batch)
+    except openai.NotFoundError:
+        raise HTTPException(404, f"Unknown batch '{batch_id}'")
+    except openai.APIError as e:
+        raise HTTPException(503, f"LLM provider unavailable: {e}")
+
+    items = sorted(((batch_runner.parse_custom_id(cid), output) for cid, output in outputs.items()),
+                   key=lambda item: item[0][0])
+    return {**status, "items": [_batch_item(index, recipe_id, output, batch)
+                                for (index, recipe_id), output in items]}
+
+
+@router.get("/runner-info/{recipe_id}")
+async def get_runner_info(recipe_id: str):
+    """Get information about what runner would be used for a recipe"""
+    if recipe_id not in RECIPES:
+        raise HTTPException(404, f"Unknown recipe '{recipe_id}'. Available: {list(RECIPES.keys())}")
+    
+    recipe = RECIPES[recipe_id]
+    return unified_runner.get_runner_info(recipe)
+
+
+@router.get("/limiter")
+async def get_limiter_stats():
+    """Shared LLM rate limiter (concurrency window, queue depth, buckets), circuit breakers and token counter"""
+    return {**rate_limiter.stats(), "breakers": breakers.stats(), "tokenizer": token_counter.stats()}
+
+
+@router.get("/cache")
+async def get_cache_stats():
+    """Hit/miss counters of the LLM response caches, in-flight call coalescing and the provider prompt cache"""
+    return {**llm_cache.stats(), "semantic": semantic_cache.stats(), "singleflight": singleflight.stats(),
+            "prompt_cache": prompt_cache_stats()}
\ No newline at end of file
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException
+from ..services.tracing import trace_store, to_otel_json, to_chrome_trace
+
+router = APIRouter(prefix="/traces", tags=["traces"])
+
+
+@router.get("")
+async def list_traces(limit: int = 50):
+    """Most recent completed traces (newest first)"""
+    return {"traces": [trace.summary() for trace in trace_store.recent(limit)]}
+
+
+@router.get("/export")
+async def export_traces(format: str = "otel", limit: int = 50):
+    """Recent traces in one file: OTLP/JSON ("otel") or Chrome trace events ("chrome")"""
+    traces = list(reversed(trace_store.recent(limit)))
+    return _export(traces, format)
+
+
+@router.get("/{trace_id}")
+async def get_trace(trace_id: str, format: str = "otel"):
+    """One trace as OTLP/JSON ("otel") or Chrome trace events ("chrome", open in ui.perfetto.dev)"""
+    trace = trace_store.get(trace_id)
+    if trace is None:
+        raise HTTPException(404, f"Unknown or expired trace '{trace_id}'")
+    return _export([trace], format)
+
+
+def _export(traces, format: str):
+    if format == "otel":
+        return to_otel_json(traces)
+    if format == "chrome":
+        return to_chrome_trace(traces)
+    raise HTTPException(400, f"Unknown format '{format}' (expected 'otel' or 'chrome')")
@@ -1,46 +1,201 @@
-from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
-from ..models import Recipe
-from ..models_user import UserProfile
-
-
-class BaseRunner(ABC):
-    """Abstract base class for all recipe runners"""
-    
-    def __init__(self, profile: Optional[UserProfile] = None):
-        self.profile = profile
-
-    @abstractmethod
-    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        """Execute the recipe with given inputs and return results"""
-        pass
-
-    def build_system_prompt(self, base_prompt: str) -> str:
-        """Inject profile preferences into system prompt"""
-        if not self.profile:
-            return base_prompt
-        
-        profile_context = (
-            "User Preferences:\n"
-            f"- Goals: {', '.join(self.profile.goals)}\n"
-            f"- Domains: {', '.join(self.profile.domains)}\n"
-            f"- Tone: {self.profile.preferred_tone}; Detail: {self.profile.detail}\n"
-            f"- Output formats: {', '.join(self.profile.output_formats)}\n"
-            f"- Cognitive: div={self.profile.cognitive.divergent}, big={self.profile.cognitive.big_picture}, "
-            f"speed={self.profile.cognitive.speed_over_evidence}, risk={self.profile.cognitive.risk_tolerance}, visual={self.profile.cognitive.visual_pref}\n"
-            f"- Step-by-step: {self.profile.step_by_step}; Citations: {self.profile.wants_citations}\n"
-            f"- Constraints: {self.profile.constraints}\n"
-            f"- Notes: {self.profile.style_notes or '—'}\n"
-            "Follow these when applying any recipe.\n\n"
-        )
-        
-        return profile_context + base_prompt
-
-    def safe_template_replace(self, template: str, params: Dict[str, Any]) -> str:
-        """Safely replace template variables avoiding JSON conflicts"""
-        result = template
-        for key, value in params.items():
-            placeholder = f"{{{key}}}"
-            if placeholder in result:
-                result = result.replace(placeholder, str(value))
-        return result
\ No newline at end of file
+import asyncio
+import json
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Callable, Dict, Any, Optional, AsyncIterator, Sequence
+from openai import AsyncOpenAI
+from ..config import settings
+from ..models import Recipe
+from ..models_user import UserProfile
+from .llm_client import get_llm_client
+from .llm_gateway import chat_completion
+from .hedging import Hedger
+from .call_log import call_log_scope
+from .tracing import span
+from .metrics import recipe_run_seconds
+from .context_budget import fit_sections, render_value
+from .prompt_template import compile_template
+from .prompt_layout import layout_system_prompt, profile_context
+
+if TYPE_CHECKING:
+    from .recipe_plan import RecipePlan
+
+JSON_OBJECT_FORMAT = {"type": "json_object"}
+
+
+def build_response_format(name: str, schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Strict json_schema response_format for a schema, plain JSON mode without one"""
+    if not schema:
+        return JSON_OBJECT_FORMAT
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "schema": schema,
+            "strict": True
+        }
+    }
+
+
+class BaseRunner(ABC):
+    """Abstract base class for all recipe runners"""
+    
+    def __init__(self, profile: Optional[UserProfile] = None, client: Optional[AsyncOpenAI] = None):
+        self.profile = profile
+        # Shared pooled client unless one is injected explicitly
+        self.client = client or get_llm_client()
+        # Set while stream() is consuming progress events
+        self._events: Optional[asyncio.Queue] = None
+        # Compiled recipe (see recipe_plan); runners built without one derive everything per run
+        self.plan: Optional["RecipePlan"] = None
+
+    @property
+    def runner_type(self) -> str:
+        """"single_shot" for SingleShotRunner, "chain" for ChainRunner, ..."""
+        return re.sub(r"(?<!^)(?=[A-Z])", "_", type(self).__name__.removesuffix("Runner")).lower()
+
+    @abstractmethod
+    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute the recipe with given inputs and return results"""
+        pass
+
+    async def execute(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """run() plus per-run LLM call telemetry (tokens/cost, retries, fallbacks, serving model) in meta"""
+        status = "error"
+        started = time.monotonic()
+        try:
+            with call_log_scope(recipe=recipe.id) as call_log, span(f"runner.{type(self).__name__}", recipe=recipe.id):
+                result = await self.run(recipe, inputs)
+            status = "ok"
+        finally:
+            recipe_run_seconds.observe(time.monotonic() - started, recipe.id, self.runner_type, status)
+        meta = result.setdefault("meta", {})
+        meta["usage"] = call_log.usage_summary()
+        meta["resilience"] = call_log.summary()
+        return result
+
+    def emit(self, event_type: str, **data):
+        """
+        Publish a progress event (step_completed, substep_completed, vote_completed, ...).
+        Runners call this at each milestone; it is a no-op unless the run is being streamed.
+        """
+        if self._events is not None:
+            self._events.put_nowait({"type": event_type, **data})
+
+    async def stream(self, recipe: Recipe, inputs: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute the recipe, yielding progress events as they happen.
+        Ends with a "run_completed" event carrying the same result run() returns,
+        or an "error" event. Closing the iterator early cancels the run.
+        """
+        events = self._events = asyncio.Queue()
+        task = asyncio.create_task(self.execute(recipe, inputs))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+
+            try:
+                yield {"type": "run_completed", "result": task.result()}
+            except Exception as e:
+                yield {"type": "error", "message": str(e)}
+        finally:
+            if not task.done():
+                task.cancel()
+            self._events = None
+
+    def cache_enabled(self, recipe: Recipe, step: Optional[Dict[str, Any]] = None,
+                      temperature: Optional[float] = None) -> bool:
+        """
+        Resolve response-cache opt-in: step "cache" key > recipe.cache > deterministic calls only.
+        Sampling calls (temperature above 0, or unset: the provider default samples) are meant to
+        vary from run to run, so they are cached only when the recipe or step opts in.
+        """
+        if step and step.get("cache") is not None:
+            return bool(step["cache"])
+        if recipe.cache is not None:
+            return recipe.cache
+        return temperature == 0
+
+    def coalesce_enabled(self, recipe: Recipe, step: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Whether identical in-flight calls may share one provider request (see singleflight).
+        On unless the step, or else the recipe, explicitly sets "cache": false to get its own sample.
+        """
+        if step and step.get("cache") is not None:
+            return bool(step["cache"])
+        return recipe.cache is not False
+
+    def hedger(self, recipe: Recipe, stage: str) -> Optional[Hedger]:
+        """Hedging policy for a fan-out stage, or None unless the recipe opts in"""
+        if recipe.hedging and recipe.hedging.enabled:
+            return Hedger(recipe.hedging, f"{recipe.id}:{stage}")
+        return None
+
+    async def hedged_completion(self, hedger: Optional[Hedger], **request):
+        """chat_completion, raced against a duplicate when the call runs slow (see hedging.Hedger)"""
+        if hedger is None:
+            return await chat_completion(self.client, **request)
+        # The duplicate must not coalesce onto the very call it is hedging
+        return await hedger.run(
+            lambda: chat_completion(self.client, **request),
+            lambda: chat_completion(self.client, **{**request, "coalesce": False})
+        )
+
+    def response_format(self, name: str, schema: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        response_format for a call, taken prebuilt from the recipe's plan when it was
+        compiled from this very schema; shared objects, never to be modified
+        """
+        if self.plan is not None:
+            prebuilt = self.plan.response_formats.get(name)
+            if prebuilt is not None and prebuilt.get("json_schema", {}).get("schema") is (schema or None):
+                return prebuilt
+        return build_response_format(name, schema)
+
+    def parse_response(self, response) -> Any:
+        """JSON content of a completion, timed as its own trace span"""
+        return self.parse_json(response.choices[0].message.content)
+
+    def parse_json(self, content: str) -> Any:
+        """JSON answer text (e.g. assembled from a stream), timed as its own trace span"""
+        with span("llm.parse", chars=len(content or "")):
+            return json.loads(content)
+
+    def semantic_cache_text(self, inputs: Dict[str, Any]) -> str:
+        """
+        User-supplied values of a prompt, compared by the semantic cache.
+        The shared template text is left out on purpose: it would dominate the
+        similarity of any two renders of the same step.
+        """
+        return "\n".join(
+            str(value) for key, value in sorted(inputs.items())
+            if key != "user_id" and not key.startswith("step.") and isinstance(value, (str, int, float))
+        )
+
+    def build_system_prompt(self, base_prompt: str, *static_parts: Optional[str]) -> str:
+        """
+        System prompt laid out for provider prefix caching (see prompt_layout): the recipe
+        prompt, then any step/guardrail/track parts, then the profile preferences last
+        """
+        return layout_system_prompt(base_prompt, *static_parts,
+                                    profile=profile_context(self.profile) if self.profile else None)
+
+    def render_prompt(self, template: str, context: Dict[str, Any], system_prompt: str,
+                      trim: Sequence[str] = (), render: Callable[[Any], str] = render_value) -> str:
+        """
+        safe_template_replace for prompts carrying bulky inputs: the `trim` context values
+        (lowest priority first, given unrendered) are shrunk as needed so system prompt +
+        prompt fit the model's context budget, then rendered with `render` (JSON by default)
+        """
+        context = fit_sections(settings.openai_model, system_prompt, template, context, list(trim), render)
+        context = {key: render(value) if key in trim else value for key, value in context.items()}
+        return self.safe_template_replace(template, context)
+
+    def safe_template_replace(self, template: str, params: Dict[str, Any]) -> str:
+        """Fill {name} placeholders in one pass (compiled once per template; literal JSON braces are left alone)"""
+        return compile_template(template).render(params)
\ No newline at end of file
@@ -0,0 +1,219 @@
+"""
+Batch Runs
+POST /run/batch takes many (recipe_id, params) items at once. Live items go
+through the normal run path, at most BATCH_MAX_CONCURRENCY at a time. Their LLM
+calls still queue on the shared limiter, but a large batch cannot take every
+slot from interactive requests. Results are reported as items finish.
+
+Deferred mode hands single-shot items to the provider's batch API instead:
+half the price, finished within 24h, and no limiter slots used. Their requests
+are built exactly as SingleShotRunner builds them, written to one JSONL file,
+uploaded and submitted as one provider batch, then polled every
+BATCH_POLL_INTERVAL seconds. The output file is turned back into the result a
+live run returns. Each request's custom_id is "<item index>:<recipe id>", so a
+batch can also be read back later without any local state
+(GET /run/batch/{batch_id}).
+"""
+
+import asyncio
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from openai import AsyncOpenAI
+from openai.types import Batch
+from openai.types.chat import ChatCompletion
+from pydantic import ValidationError
+from ..config import settings
+from ..models import Recipe, RunRequest
+from .call_log import CallLog, call_log_scope
+from .context_budget import apply_budget
+from .llm_gateway import record_batch_completion
+from .recipe_plan import plan_for
+from .runner import load_profile
+from .tracing import span
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def parse_batch_payload(body: bytes) -> List[RunRequest]:
+    """Run requests from a JSON array, or from JSONL (one run request per line); raises ValueError"""
+    text = body.decode("utf-8").strip()
+    if not text:
+        raise ValueError("Empty batch")
+    if text.startswith("["):
+        items = json.loads(text)
+    else:
+        items = []
+        for number, line in enumerate(text.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {number}: {e}")
+    if len(items) > settings.batch_max_items:
+        raise ValueError(f"Batch of {len(items)} items exceeds BATCH_MAX_ITEMS ({settings.batch_max_items})")
+
+    requests = []
+    for index, item in enumerate(items):
+        try:
+            requests.append(RunRequest.model_validate(item))
+        except ValidationError as e:
+            raise ValueError(f"Item {index}: {e}")
+    return requests
+
+
+async def merge(*streams: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Events of several streams in the order they are produced"""
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def pump(stream: AsyncIterator[Dict[str, Any]]):
+        try:
+            async for event in stream:
+                await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(finished)
+
+    tasks = [asyncio.create_task(pump(stream)) for stream in streams]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            event = await queue.get()
+            if event is finished:
+                remaining -= 1
+            elif isinstance(event, Exception):
+                raise event
+            else:
+                yield event
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def run_bounded(items: List[Tuple[int, RunRequest]],
+                      run_item: Callable[[int, RunRequest], Awaitable[Dict[str, Any]]],
+                      concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+    """
+    run_item for every (index, request), yielded as they finish. A fixed pool of
+    `concurrency` workers pulls the items in order, so a large batch never holds
+    more than `concurrency` tasks however many items it has.
+    """
+    pending = iter(items)
+    finished: asyncio.Queue = asyncio.Queue()
+
+    async def worker():
+        for index, req in pending:
+            try:
+                await finished.put((await run_item(index, req), None))
+            except Exception as e:
+                await finished.put((None, e))
+
+    workers = [asyncio.create_task(worker()) for _ in range(min(max(1, concurrency), len(items)))]
+    try:
+        for _ in range(len(items)):
+            result, error = await finished.get()
+            if error is not None:
+                raise error
+            yield result
+    finally:
+        for task in workers:
+            task.cancel()
+
+
+def deferrable(recipe: Recipe, req: RunRequest) -> bool:
+    """Whether an item is one provider call, i.e. can go to the provider's batch API"""
+    if req.mode == "iterative":
+        return False
+    try:
+        return plan_for(recipe).runner_type == "single_shot"
+    except ValueError:
+        return False
+
+
+def batch_request(recipe: Recipe, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    The chat completion body a live single-shot run would send (profile, prompts,
+    response_format and output limit included); raises ContextBudgetExceeded
+    """
+    runner = plan_for(recipe).runner(load_profile(params.get("user_id")))
+    request = runner.build_request(recipe, params)
+    apply_budget(request["messages"], request)
+    return request
+
+
+def custom_id(index: int, recipe_id: str) -> str:
+    return f"{index}:{recipe_id}"
+
+
+def parse_custom_id(value: str) -> Tuple[int, str]:
+    index, _, recipe_id = value.partition(":")
+    return int(index), recipe_id
+
+
+async def submit_batch(client: AsyncOpenAI, requests: Dict[str, Dict[str, Any]]) -> Batch:
+    """Upload {custom_id: request body} as a batch input file and start the batch"""
+    lines = [
+        json.dumps({"custom_id": cid, "method": "POST", "url": BATCH_ENDPOINT, "body": body}, ensure_ascii=False)
+        for cid, body in requests.items()
+    ]
+    with span("batch.submit", requests=len(lines)):
+        upload = await client.files.create(file=("run_batch.jsonl", "\n".join(lines).encode("utf-8")),
+                                           purpose="batch")
+        batch = await client.batches.create(input_file_id=upload.id, endpoint=BATCH_ENDPOINT,
+                                            completion_window="24h")
+    print(f"📦 Submitted provider batch {batch.id} ({len(lines)} requests)")
+    return batch
+
+
+async def poll_batch(client: AsyncOpenAI, batch_id: str,
+                     interval: Optional[float] = None) -> AsyncIterator[Batch]:
+    """The batch at every poll, ending with its terminal state"""
+    interval = settings.batch_poll_interval if interval is None else interval
+    while True:
+        batch = await client.batches.retrieve(batch_id)
+        yield batch
+        if batch.status in TERMINAL_STATUSES:
+            return
+        await asyncio.sleep(interval)
+
+
+async def batch_outputs(client: AsyncOpenAI, batch: Batch) -> Dict[str, Any]:
+    """custom_id -> ChatCompletion, or an error message for requests the provider failed"""
+    outputs: Dict[str, Any] = {}
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        content = await client.files.content(file_id)
+        for line in content.text.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            body = response.get("body") or {}
+            if response.get("status_code") == 200 and body.get("choices"):
+                outputs[record["custom_id"]] = ChatCompletion.model_validate(body)
+            else:
+                error = record.get("error") or body.get("error") or {}
+                outputs[record["custom_id"]] = error.get("message") or f"HTTP {response.get('status_code')}"
+    return outputs
+
+
+def batch_result(recipe: Recipe, response: ChatCompletion, batch_id: str,
+                 request: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    The result a live single-shot run of this completion returns, with usage priced
+    at batch rates. With the submitted `request`, the call is also counted in the
+    process-wide token/cost metrics (only the run that submitted the batch does so).
+    """
+    result = plan_for(recipe).runner().build_result(recipe, response)
+    if request is not None:
+        with call_log_scope(recipe=recipe.id) as call_log:
+            record_batch_completion(recipe.id, request, request["messages"], response)
+    else:
+        call_log = CallLog(recipe=recipe.id)
+        call_log.record(recipe.id, response.model, response.model, usage=response.usage, batch=True)
+    result["meta"].update(usage=call_log.usage_summary(), batch_id=batch_id)
+    return result
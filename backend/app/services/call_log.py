@@ -0,0 +1,151 @@
+"""
+Per-Run LLM Call Log
+Every provider call made while a run (or chat turn) is in progress is recorded
+with its token usage, estimated cost, retries and serving model, tagged with
+the runner phase it belongs to (loop, substep, branch, step).
+Runners tag phases with `with phase(loop=2, substep="skeptic"):`, which also
+opens a trace span for the phase; the gateway records calls into the current log. Logs nest: a recipe run started by a chat
+tool call also counts towards the chat turn.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from .pricing import token_usage, estimate_cost
+from .resilience import breakers
+from .tracing import span
+
+# Phase labels of the code currently running (copied into tasks spawned by gather)
+current_phase: ContextVar[Dict[str, Any]] = ContextVar("llm_phase", default={})
+
+
+def _phase_name(labels: Dict[str, Any]) -> str:
+    """Span name of a phase: "loop 2", "Skeptic", "vote vote_3", "worker market", ..."""
+    parts = [f"loop {labels['loop']}"] if "loop" in labels else []
+    parts += [str(labels[key]) for key in ("step", "branch") if key in labels]
+    if "substep" in labels and labels["substep"] != labels.get("step"):
+        parts.append(str(labels["substep"]))
+    return " ".join(parts)
+
+
+@contextmanager
+def phase(**labels):
+    """Tag LLM calls made inside the block, e.g. phase(loop=2) then phase(substep="skeptic")"""
+    token = current_phase.set({**current_phase.get(), **labels})
+    try:
+        with span(_phase_name(labels), **labels):
+            yield
+    finally:
+        current_phase.reset(token)
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+            "total_tokens": 0, "cost_usd": 0.0}
+
+
+def _add(totals: Dict[str, Any], call: Dict[str, Any]):
+    totals["calls"] += 1
+    for key in ("prompt_tokens", "completion_tokens", "cached_tokens"):
+        totals[key] += call[key]
+    totals["total_tokens"] += call["prompt_tokens"] + call["completion_tokens"]
+    if call["cost_usd"] is None:
+        totals["unpriced_calls"] = totals.get("unpriced_calls", 0) + 1
+    else:
+        totals["cost_usd"] += call["cost_usd"]
+
+
+def _rounded(totals: Dict[str, Any]) -> Dict[str, Any]:
+    prompt_tokens = totals["prompt_tokens"]
+    hit_rate = totals["cached_tokens"] / prompt_tokens if prompt_tokens else 0.0
+    return {**totals, "cost_usd": round(totals["cost_usd"], 6), "prompt_cache_hit_rate": round(hit_rate, 4)}
+
+
+class CallLog:
+    """Provider calls made during one run or chat turn"""
+
+    def __init__(self, parent: Optional["CallLog"] = None, recipe: Optional[str] = None):
+        self.parent = parent
+        # Recipe (or "chat") the calls are made for; labels per-recipe prompt cache metrics
+        self.recipe = recipe or (parent.recipe if parent else None)
+        self.calls: List[Dict[str, Any]] = []
+        self.cache_hits = 0
+
+    def record(self, step: Optional[str], requested_model: str, served_model: str,
+               retries: int = 0, usage: Any = None, batch: bool = False):
+        labels = current_phase.get()
+        tokens = token_usage(usage)
+        call = {
+            "step": labels.get("step") or step,
+            "loop": labels.get("loop"),
+            "substep": labels.get("substep"),
+            "branch": labels.get("branch"),
+            "requested_model": requested_model,
+            "model": served_model,
+            "fallback": served_model != requested_model,
+            "retries": retries,
+            **tokens,
+            "cost_usd": estimate_cost(served_model, tokens, batch)
+        }
+        log = self
+        while log is not None:
+            log.calls.append(call)
+            log = log.parent
+
+    def record_cache_hit(self):
+        log = self
+        while log is not None:
+            log.cache_hits += 1
+            log = log.parent
+
+    def usage_summary(self) -> Dict[str, Any]:
+        """Token/cost totals for the run, per step, per loop and per branch"""
+        total = _empty_totals()
+        groups: Dict[str, Dict[str, Dict[str, Any]]] = {"by_step": {}, "by_loop": {}, "by_branch": {}}
+        for call in self.calls:
+            _add(total, call)
+            for group, key in (("by_step", call["step"] or "unlabeled"), ("by_loop", call["loop"]),
+                               ("by_branch", call["branch"])):
+                if key is None:
+                    continue
+                _add(groups[group].setdefault(str(key), _empty_totals()), call)
+
+        summary = {"total": _rounded(total), "cache_hits": self.cache_hits}
+        for group, buckets in groups.items():
+            if buckets:
+                summary[group] = {key: _rounded(totals) for key, totals in buckets.items()}
+        return summary
+
+    def summary(self) -> Dict[str, Any]:
+        """Retries, fallbacks and breaker state of the models this run touched"""
+        models = {call["model"] for call in self.calls} | {call["requested_model"] for call in self.calls}
+        return {
+            "provider_calls": len(self.calls),
+            "retries": sum(call["retries"] for call in self.calls),
+            "fallbacks": sum(1 for call in self.calls if call["fallback"]),
+            "breakers": {model: breakers.get(model).state for model in sorted(models)},
+            "steps": [
+                {key: call[key] for key in ("step", "requested_model", "model", "fallback", "retries")}
+                for call in self.calls
+            ]
+        }
+
+
+# Set for the duration of a run / chat turn; asyncio tasks spawned inside share it
+current_call_log: ContextVar[Optional[CallLog]] = ContextVar("llm_call_log", default=None)
+
+
+@contextmanager
+def call_log_scope(recipe: Optional[str] = None):
+    """
+    Collect the LLM calls made inside the block into a new CallLog (nested under any current one).
+    Phase labels start empty: a run launched from a chat turn is labeled by its own steps.
+    """
+    call_log = CallLog(parent=current_call_log.get(), recipe=recipe)
+    token = current_call_log.set(call_log)
+    phase_token = current_phase.set({})
+    try:
+        yield call_log
+    finally:
+        current_phase.reset(phase_token)
+        current_call_log.reset(token)
@@ -0,0 +1,210 @@
+"""
+Context Budget
+Per-model context windows and output limits, checked before a request is sent:
+- llm_gateway measures every request; one that cannot fit even a minimal answer
+  raises ContextBudgetExceeded without a provider round-trip. Requests that do
+  not set an output limit get max_tokens (max_completion_tokens for reasoning
+  models) only when LLM_MAX_OUTPUT_TOKENS is set or the prompt leaves less room
+  than the model's maximum output; otherwise the provider default applies and
+  no large limit is reserved against the TPM budget. Both need the model's
+  limits: for models not listed (custom deployments, new names) only
+  LLM_MAX_OUTPUT_TOKENS is applied.
+- Runners render prompts that carry bulky, lower-priority inputs (prior state,
+  plans, worker/branch results, synthesis inputs) through fit_sections, which
+  shrinks those values until system prompt + rendered template fit the budget.
+
+Windows are (context window, max output) in tokens; dated snapshots match their
+base name by longest prefix. Override or extend with
+LLM_CONTEXT_WINDOWS='{"my-model": [context_window, max_output]}'.
+"""
+
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from ..config import settings
+from .tokenizer import token_counter
+from .prompt_template import compile_template
+
+MODEL_CONTEXT_WINDOWS: Dict[str, Tuple[int, int]] = {
+    "gpt-4o-mini": (128_000, 16_384),
+    "gpt-4o": (128_000, 16_384),
+    "gpt-4.1": (1_047_576, 32_768),
+    "gpt-4-turbo": (128_000, 4_096),
+    "gpt-4": (8_192, 8_192),
+    "gpt-3.5-turbo": (16_385, 4_096),
+    "gpt-5": (400_000, 128_000),
+    "o1": (200_000, 100_000),
+    "o3": (200_000, 100_000),
+    "o4-mini": (200_000, 100_000),
+}
+
+# Prompt budget of unknown models (e.g. behind OPENAI_BASE_URL) for trimming bulky
+# inputs; their requests are neither rejected nor given an output limit from it
+_DEFAULT_WINDOW = (32_768, 4_096)
+
+# Fewer output tokens than this left in the window means the request cannot succeed
+MIN_OUTPUT_TOKENS = 256
+
+_REASONING_PREFIXES = ("o1", "o3", "o4", "gpt-5")
+
+if settings.llm_context_windows:
+    try:
+        MODEL_CONTEXT_WINDOWS.update({
+            model: (int(limits[0]), int(limits[1]))
+            for model, limits in json.loads(settings.llm_context_windows).items()
+        })
+    except (ValueError, TypeError, IndexError) as e:
+        print(f"⚠️ Ignoring invalid LLM_CONTEXT_WINDOWS: {e}")
+
+
+class ContextBudgetExceeded(ValueError):
+    """The prompt alone does not fit the model's context window"""
+
+
+def known_limits(model: Optional[str]) -> Optional[Tuple[int, int]]:
+    """(context window, max output) listed or configured for a model, None if unknown"""
+    model = model or ""
+    if model in MODEL_CONTEXT_WINDOWS:
+        return MODEL_CONTEXT_WINDOWS[model]
+    matches = [name for name in MODEL_CONTEXT_WINDOWS if model.startswith(name)]
+    return MODEL_CONTEXT_WINDOWS[max(matches, key=len)] if matches else None
+
+
+def model_limits(model: Optional[str]) -> Tuple[int, int]:
+    """(context window, output tokens reserved for the answer); conservative for unknown models"""
+    window, max_output = known_limits(model) or _DEFAULT_WINDOW
+    if settings.llm_max_output_tokens:
+        max_output = min(max_output, settings.llm_max_output_tokens)
+    return window, max_output
+
+
+def prompt_budget(model: Optional[str]) -> int:
+    """Prompt tokens available once the answer's reserve is set aside"""
+    window, max_output = model_limits(model)
+    return window - max_output
+
+
+def output_limit_param(model: Optional[str]) -> str:
+    return "max_completion_tokens" if (model or "").startswith(_REASONING_PREFIXES) else "max_tokens"
+
+
+def retarget(request: Dict[str, Any], model: str) -> Dict[str, Any]:
+    """
+    A caller's request (before apply_budget) sent to another model, e.g. the fallback:
+    an explicit output limit moves to that model's parameter name and is clamped to
+    its maximum output; apply_budget then sizes the rest for that model.
+    """
+    retargeted = {**request, "model": model}
+    explicit = [retargeted.pop(name) for name in ("max_tokens", "max_completion_tokens") if name in retargeted]
+    if explicit:
+        limits = known_limits(model)
+        retargeted[output_limit_param(model)] = min(explicit[0], limits[1]) if limits else explicit[0]
+    return retargeted
+
+
+def apply_budget(messages: List[Dict[str, Any]], request: Dict[str, Any]) -> int:
+    """
+    Measure a request before it is sent; returns its prompt tokens.
+    Sets the output limit when the caller did not and the window (or LLM_MAX_OUTPUT_TOKENS)
+    is tighter than the model's maximum output, and raises ContextBudgetExceeded when the
+    prompt leaves no room for an answer. Both only for models with known limits; other
+    requests keep the provider's defaults (LLM_MAX_OUTPUT_TOKENS aside).
+    """
+    model = request.get("model")
+    prompt_tokens = token_counter.count_messages(messages, model)
+    has_limit = "max_tokens" in request or "max_completion_tokens" in request
+    if known_limits(model) is None:
+        if settings.llm_max_output_tokens and not has_limit:
+            request[output_limit_param(model)] = settings.llm_max_output_tokens
+        return prompt_tokens
+    window, max_output = model_limits(model)
+    room = window - prompt_tokens
+    if room < MIN_OUTPUT_TOKENS:
+        raise ContextBudgetExceeded(
+            f"Prompt of ~{prompt_tokens} tokens does not fit {model}'s {window}-token context window"
+        )
+    if not has_limit and (room < max_output or settings.llm_max_output_tokens):
+        request[output_limit_param(model)] = min(max_output, room)
+    return prompt_tokens
+
+
+def render_value(value: Any) -> str:
+    """How runners put structured values into prompts"""
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def _longest_string(value: Any, path: Tuple = ()) -> Tuple[int, Tuple]:
+    """(length, path) of the longest string leaf"""
+    if isinstance(value, str):
+        return len(value), path
+    items = value.items() if isinstance(value, dict) else enumerate(value) if isinstance(value, list) else ()
+    return max((_longest_string(item, path + (key,)) for key, item in items), default=(0, path))
+
+
+def _replace(value: Any, path: Tuple, new: Any) -> Any:
+    if not path:
+        return new
+    head, rest = path[0], path[1:]
+    if isinstance(value, dict):
+        return {**value, head: _replace(value[head], rest, new)}
+    return [_replace(item, rest, new) if index == head else item for index, item in enumerate(value)]
+
+
+def shrink_to(value: Any, max_tokens: int, model: Optional[str] = None,
+              render: Callable[[Any], str] = render_value) -> Any:
+    """
+    Cut a value down to about `max_tokens` once rendered. Structured values keep their
+    shape: the longest string leaf is halved until the whole fits, so every branch or
+    worker keeps its share; strings keep their head with a marker.
+    """
+    for _ in range(256):
+        tokens = token_counter.count(render(value), model)
+        if tokens <= max_tokens:
+            return value
+        length, path = _longest_string(value)
+        if length < 16:
+            break
+        leaf = value
+        for key in path:
+            leaf = leaf[key]
+        # Halve, or cut straight to size for a lone string
+        keep = length // 2 if path else max(0, int(length * max_tokens / tokens) - 24)
+        value = _replace(value, path, leaf[:keep] + "…[trimmed]")
+    text = render(value)
+    if token_counter.count(text, model) <= max_tokens:
+        return value
+    return text[:max(0, max_tokens * 3)] + "…[trimmed]"
+
+
+def fit_sections(model: Optional[str], system_prompt: str, template: str, context: Dict[str, Any],
+                 sections: List[str], render: Callable[[Any], str] = render_value) -> Dict[str, Any]:
+    """
+    Context with the `sections` (context keys, lowest priority first) shrunk so that
+    system prompt + rendered template fit the model's prompt budget. Other keys are
+    left alone; values are returned unrendered, so callers render them as before.
+    """
+    budget = prompt_budget(model)
+    compiled = compile_template(template)
+    fixed = compiled.render({key: value for key, value in context.items() if key not in sections})
+    used = token_counter.count(system_prompt, model) + token_counter.count(fixed, model) + 16
+
+    sizes = {}
+    for key in sections:
+        if key in context:
+            sizes[key] = token_counter.count(render(context[key]), model) * max(1, compiled.count(key))
+    excess = used + sum(sizes.values()) - budget
+    if excess <= 0:
+        return context
+
+    fitted = dict(context)
+    for key in sections:
+        if excess <= 0:
+            break
+        if key not in sizes:
+            continue
+        occurrences = max(1, compiled.count(key))
+        target = max(0, (sizes[key] - excess) // occurrences)
+        fitted[key] = shrink_to(context[key], target, model, render)
+        new_size = token_counter.count(render(fitted[key]), model) * occurrences
+        excess -= sizes[key] - new_size
+        print(f"✂️ Trimmed '{key}' from ~{sizes[key]} to ~{new_size} tokens to fit {model}'s context budget")
+    return fitted
@@ -0,0 +1,95 @@
+"""
+Hedged Requests
+Tail-latency control for fan-out stages, where one slow call holds up the whole
+asyncio.gather: if a call has not returned after the stage's observed latency
+percentile, a duplicate is fired and whichever finishes first wins (the other
+is cancelled). Duplicates are capped per run as a fraction of the calls made.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+from ..models import HedgingConfig
+
+
+class LatencyTracker:
+    """Sliding window of call latencies per stage scope (e.g. "debate:workers")"""
+
+    def __init__(self, window: int = 200, min_samples: int = 5):
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def observe(self, scope: str, seconds: float):
+        self._samples.setdefault(scope, deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, scope: str, pct: float) -> Optional[float]:
+        """Latency percentile, or None until enough calls have been observed"""
+        samples = self._samples.get(scope)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+# Process-wide latency history the hedge delays are derived from
+latency_tracker = LatencyTracker()
+
+
+class Hedger:
+    """Hedging policy for the calls of one run stage"""
+
+    def __init__(self, config: HedgingConfig, scope: str):
+        self.config = config
+        self.scope = scope
+        observed = latency_tracker.percentile(scope, config.percentile)
+        # No hedging until the stage has a latency history to judge "slow" against
+        self.delay = max(config.min_delay, observed) if observed is not None else None
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def _can_hedge(self) -> bool:
+        return self.delay is not None and self.hedged + 1 <= self.config.max_extra * self.calls
+
+    async def run(self, primary: Callable[[], Awaitable[Any]], hedge: Callable[[], Awaitable[Any]]) -> Any:
+        """Await primary(); start hedge() if it is still running after the delay; return the first success"""
+        self.calls += 1
+        started = {}
+        first = asyncio.ensure_future(primary())
+        started[first] = time.monotonic()
+        tasks = [first]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.delay)
+            if not done and self._can_hedge():
+                second = asyncio.ensure_future(hedge())
+                started[second] = time.monotonic()
+                tasks.append(second)
+                self.hedged += 1
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in done if task.exception() is None), None)
+                if winner is not None:
+                    latency_tracker.observe(self.scope, time.monotonic() - started[winner])
+                    if winner is not first:
+                        self.hedge_wins += 1
+                    return winner.result()
+            # Every attempt failed: surface the primary's error
+            return first.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": round(self.hedged / self.calls, 4) if self.calls else 0.0,
+            "delay": round(self.delay, 3) if self.delay is not None else None
+        }
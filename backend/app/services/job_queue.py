@@ -0,0 +1,186 @@
+"""
+Job Queue
+Long recipe runs (multi_agent_debate at 10 loops takes minutes) outlive proxy
+timeouts, and a client that retries a timed-out POST /run pays for the run
+twice. POST /jobs enqueues the run and returns its id at once. A fixed pool of
+JOBS_MAX_WORKERS workers executes queued jobs through the same streaming path
+as /run/stream, so each job records its latest progress event (loop, step,
+branch, ...) and finally its result. GET /jobs/{id} reads it back. At most
+JOBS_MAX_QUEUED jobs wait at a time; beyond that, submit() raises JobQueueFull.
+
+Cancelling a queued job drops it. Cancelling a running job cancels its run,
+which stops any provider calls in flight. On shutdown, running jobs are marked
+failed. With the SQLite store, queued jobs are picked up again on the next start.
+"""
+
+import asyncio
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Set
+from ..config import settings
+from ..models import Job, RunRequest, RunResponse
+from ..recipes import RECIPES
+from . import unified_runner
+from .job_store import FINISHED_STATUSES, JobStore, create_job_store
+from .metrics import registry
+
+# Event fields copied into a job's progress (outputs and plans stay out of it)
+_PROGRESS_KEYS = ("loop", "total", "index", "step", "substep", "role", "track", "branch", "vote", "worker", "route")
+
+
+class JobQueueFull(Exception):
+    """JOBS_MAX_QUEUED jobs are already waiting"""
+
+
+def run_params(req: RunRequest) -> Dict[str, Any]:
+    """Runner inputs of a run request, as /run passes them"""
+    params = req.params.copy()
+    if req.loops is not None:
+        params["loops"] = req.loops
+    if req.tracks is not None:
+        params["tracks"] = req.tracks
+    return params
+
+
+class JobQueue:
+    def __init__(self, store: JobStore, max_workers: int, max_queued: int):
+        self.store = store
+        self.max_workers = max(1, max_workers)
+        self.max_queued = max_queued
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._cancelled_queued: Set[str] = set()
+        self._finished = {status: 0 for status in FINISHED_STATUSES}
+        self._stopping = False
+
+    async def start(self):
+        """Start the workers, failing jobs a previous process left running and requeueing queued ones"""
+        if self._queue is not None:
+            return
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        for job in await self.store.unfinished():
+            if job.status == "running":
+                await self._finish(job, "failed", error="Interrupted by a restart")
+            else:
+                self._queue.put_nowait(job.id)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_workers)]
+        print(f"🧵 Job queue started ({self.max_workers} workers, {self._queue.qsize()} queued)")
+
+    async def shutdown(self):
+        self._stopping = True
+        running = list(self._running.values())
+        for task in self._workers + running:
+            task.cancel()
+        await asyncio.gather(*self._workers, *running, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def submit(self, req: RunRequest) -> Job:
+        await self.start()
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"{self._queue.qsize()} jobs are already queued (JOBS_MAX_QUEUED)")
+        job = Job(id=uuid.uuid4().hex, recipe_id=req.recipe_id, request=req, created_at=time.time())
+        await self.store.save(job)
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        job = await self.store.get(job_id)
+        if job is None or job.status in FINISHED_STATUSES:
+            return job
+        task = self._running.get(job_id)
+        if task is None:
+            # Still queued: the worker that dequeues it skips it
+            self._cancelled_queued.add(job_id)
+            await self._finish(job, "cancelled")
+            return job
+        task.cancel()
+        await asyncio.wait([task])
+        return await self.store.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            job = await self.store.get(job_id)
+            if job_id in self._cancelled_queued:
+                self._cancelled_queued.discard(job_id)
+                continue
+            if job is None or job.status != "queued":
+                continue
+            task = asyncio.create_task(self._run(job))
+            self._running[job_id] = task
+            try:
+                # A cancelled job ends its own task; the worker carries on
+                await asyncio.wait([task])
+            finally:
+                self._running.pop(job_id, None)
+
+    async def _run(self, job: Job):
+        try:
+            job.status = "running"
+            job.started_at = time.time()
+            await self.store.save(job)
+            recipe = RECIPES.get(job.recipe_id)
+            if recipe is None:
+                await self._finish(job, "failed", error=f"Unknown recipe '{job.recipe_id}'")
+                return
+
+            async for event in unified_runner.stream_recipe(recipe, run_params(job.request)):
+                if event["type"] == "run_completed":
+                    result = event["result"]
+                    job.result = RunResponse(recipe_id=recipe.id, mode=result.get("mode", "auto"), output=result,
+                                             meta=unified_runner.response_meta(result))
+                    await self._finish(job, "succeeded")
+                elif event["type"] == "error":
+                    await self._finish(job, "failed", error=event.get("message"))
+                else:
+                    job.progress = {
+                        "last_event": event["type"],
+                        "events": job.progress.get("events", 0) + 1,
+                        **{key: value for key, value in job.progress.items() if key in _PROGRESS_KEYS},
+                        **{key: event[key] for key in _PROGRESS_KEYS if key in event}
+                    }
+                    await self.store.save(job)
+        except asyncio.CancelledError:
+            # Leaving the stream above cancels the run itself
+            if self._stopping:
+                await self._finish(job, "failed", error="Interrupted by shutdown")
+            else:
+                await self._finish(job, "cancelled")
+        except Exception as e:
+            await self._finish(job, "failed", error=str(e))
+
+    async def _finish(self, job: Job, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = time.time()
+        self._finished[status] += 1
+        await self.store.save(job)
+        elapsed = job.finished_at - (job.started_at or job.created_at)
+        print(f"🧵 Job {job.id} ({job.recipe_id}) {status} after {elapsed:.1f}s" + (f": {error}" if error else ""))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.max_workers,
+            "running": len(self._running),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued": self.max_queued,
+            "finished": dict(self._finished)
+        }
+
+
+# Process-wide queue used by the /jobs router; workers start with the app (or on the first submit)
+job_queue = JobQueue(
+    create_job_store(settings.jobs_db_path, settings.jobs_max_retained),
+    max_workers=settings.jobs_max_workers,
+    max_queued=settings.jobs_max_queued
+)
+
+registry.sampled("jobs_queued", "Jobs waiting for a worker", lambda: job_queue.stats()["queued"])
+registry.sampled("jobs_running", "Jobs being executed", lambda: job_queue.stats()["running"])
+registry.sampled("jobs_finished_total", "Jobs finished since startup by status",
+                 lambda: {(status,): count for status, count in job_queue.stats()["finished"].items()},
+                 labels=("status",), kind="counter")
@@ -0,0 +1,133 @@
+"""
+Job Store
+Where POST /jobs keeps its jobs (status, progress, result). Two backends:
+- MemoryJobStore (default): a dict in the process; jobs are lost on restart
+- SQLiteJobStore (JOBS_DB_PATH): one JSON row per job; queued jobs survive a
+  restart and are picked up again (see JobQueue.start)
+
+Both keep every unfinished job and the newest `max_finished` finished ones.
+"""
+
+import asyncio
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, List, Optional
+from ..models import Job
+
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled")
+
+
+class JobStore(ABC):
+    """Async interface the job queue and router use; implementations must not block the event loop"""
+
+    @abstractmethod
+    async def save(self, job: Job):
+        """Insert or replace a job"""
+
+    @abstractmethod
+    async def get(self, job_id: str) -> Optional[Job]:
+        pass
+
+    @abstractmethod
+    async def list(self, limit: int = 50) -> List[Job]:
+        """Newest jobs first"""
+
+    @abstractmethod
+    async def unfinished(self) -> List[Job]:
+        """Queued and running jobs, oldest first"""
+
+
+class MemoryJobStore(JobStore):
+    def __init__(self, max_finished: int):
+        self.max_finished = max_finished
+        self._jobs: Dict[str, Job] = {}
+
+    async def save(self, job: Job):
+        self._jobs[job.id] = job.model_copy(deep=True)
+        if job.status in FINISHED_STATUSES:
+            finished = [stored for stored in self._jobs.values() if stored.status in FINISHED_STATUSES]
+            for stored in sorted(finished, key=lambda stored: stored.created_at)[:-self.max_finished or None]:
+                del self._jobs[stored.id]
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        return job.model_copy(deep=True) if job else None
+
+    async def list(self, limit: int = 50) -> List[Job]:
+        jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+        return [job.model_copy(deep=True) for job in jobs[:limit]]
+
+    async def unfinished(self) -> List[Job]:
+        jobs = sorted(self._jobs.values(), key=lambda job: job.created_at)
+        return [job.model_copy(deep=True) for job in jobs if job.status not in FINISHED_STATUSES]
+
+
+class SQLiteJobStore(JobStore):
+    """Blocking sqlite3 calls, run in a worker thread"""
+
+    def __init__(self, path: str, max_finished: int):
+        self.path = path
+        self.max_finished = max_finished
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, created_at REAL NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_created_at ON jobs (created_at)")
+            self._conn.commit()
+
+    def _save(self, job: Job):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, status, created_at, data) VALUES (?, ?, ?, ?)",
+                (job.id, job.status, job.created_at, job.model_dump_json())
+            )
+            if job.status in FINISHED_STATUSES:
+                self._conn.execute(
+                    "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE status IN (?, ?, ?) "
+                    "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (*FINISHED_STATUSES, self.max_finished)
+                )
+            self._conn.commit()
+
+    def _query(self, sql: str, args: tuple = ()) -> List[Job]:
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [Job.model_validate_json(row[0]) for row in rows]
+
+    async def save(self, job: Job):
+        await asyncio.to_thread(self._save, job)
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        jobs = await asyncio.to_thread(self._query, "SELECT data FROM jobs WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    async def list(self, limit: int = 50) -> List[Job]:
+        return await asyncio.to_thread(self._query, "SELECT data FROM jobs ORDER BY created_at DESC LIMIT ?",
+                                       (limit,))
+
+    async def unfinished(self) -> List[Job]:
+        return await asyncio.to_thread(
+            self._query, "SELECT data FROM jobs WHERE status NOT IN (?, ?, ?) ORDER BY created_at",
+            FINISHED_STATUSES
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_job_store(db_path: str, max_finished: int) -> JobStore:
+    """SQLite store when a path is configured, else in memory"""
+    if db_path:
+        try:
+            return SQLiteJobStore(db_path, max_finished)
+        except sqlite3.Error as e:
+            print(f"⚠️ Job store {db_path} unavailable, keeping jobs in memory: {e}")
+    return MemoryJobStore(max_finished)
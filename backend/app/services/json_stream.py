@@ -0,0 +1,89 @@
+"""
+Incremental JSON
+Picks the elements of one top-level array field out of a JSON object while it is
+still being streamed (e.g. plan["workers"] from a streamed planner answer), so
+each element can be acted on as soon as its closing bracket arrives.
+"""
+
+import json
+from typing import Any, List, Optional
+
+_WHITESPACE = " \t\r\n"
+
+
+class JsonArrayStream:
+    """
+    Feed text chunks in order; feed() returns the elements of `key` completed by
+    that chunk. Only a field of the outermost object counts, and the scan is a
+    single pass over each character (strings and escapes are tracked so brackets
+    inside them are ignored). The full answer is still parsed normally at the end.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._current_key: Optional[str] = None
+        self._in_array = False
+        self._item_start: Optional[int] = None
+        self.done = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        items: List[Any] = []
+        self._text += chunk
+        text = self._text
+        for pos in range(self._pos, len(text)):
+            if self.done:
+                break
+            char = text[pos]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1:
+                        self._last_string = json.loads(text[self._string_start:pos + 1])
+                    elif self._in_array and self._depth == 2:
+                        self._complete(items, pos + 1)
+                continue
+
+            if self._in_array and self._depth == 2 and self._item_start is None and char not in _WHITESPACE + ",]":
+                self._item_start = pos
+
+            if char == '"':
+                self._in_string = True
+                self._string_start = pos
+            elif char == ":" and self._depth == 1:
+                self._current_key = self._last_string
+            elif char == "," and self._depth == 1:
+                self._current_key = None
+            elif char in "{[":
+                if char == "[" and self._depth == 1 and self._current_key == self.key:
+                    self._in_array = True
+                self._depth += 1
+            elif char in "}]":
+                if self._in_array and self._depth == 2:
+                    # End of the array itself; flush a trailing scalar element
+                    if self._item_start is not None:
+                        self._complete(items, pos)
+                    self._in_array = False
+                    self.done = True
+                self._depth -= 1
+                if self._in_array and self._depth == 2:
+                    self._complete(items, pos + 1)
+            elif char == "," and self._in_array and self._depth == 2 and self._item_start is not None:
+                self._complete(items, pos)
+        self._pos = len(text)
+        return items
+
+    def _complete(self, items: List[Any], end: int):
+        items.append(json.loads(self._text[self._item_start:end]))
+        self._item_start = None
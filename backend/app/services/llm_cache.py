@@ -0,0 +1,212 @@
+"""
+LLM Response Cache
+Exact-match cache for chat completions, keyed by a stable hash of the request
+(model, messages, response_format/schema, temperature, ...).
+Two tiers:
+- bounded in-memory LRU with TTL
+- optional SQLite tier that survives restarts (settings.llm_cache_db_path),
+  pruned of expired and overflow rows at startup and every PRUNE_EVERY writes
+"""
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+from ..config import settings
+
+
+def cache_key(request: Dict[str, Any]) -> str:
+    """Stable hash of a chat completion request (key order independent)"""
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class MemoryLRU:
+    """Bounded LRU of serialized responses with per-entry expiry"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: str, expires_at: Optional[float] = None):
+        self._entries[key] = (expires_at or time.time() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheStore:
+    """Persistent cache tier. Calls are blocking and meant to run in a worker thread."""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str, ttl: float, max_entries: int):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._writes = 0
+        self._lock = threading.Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[tuple[float, str]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT expires_at, value FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or row[0] < time.time():
+            return None
+        return row[0], row[1]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + self.ttl)
+            )
+            self._conn.commit()
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (time.time(),))
+            self._conn.commit()
+        return cursor.rowcount
+
+    def trim(self) -> int:
+        """Drop the oldest rows beyond max_entries (TTL is fixed, so earliest expiry = oldest write)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def prune(self) -> int:
+        return self.purge_expired() + self.trim()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class LLMResponseCache:
+    """
+    Two-tier exact-match cache of serialized chat completion responses.
+    Disk hits are promoted into the memory tier.
+    """
+
+    def __init__(self, max_entries: int, ttl: float, db_path: str = "", db_max_entries: int = 10000):
+        self.memory = MemoryLRU(max_entries, ttl)
+        self.disk: Optional[SQLiteCacheStore] = None
+        if db_path:
+            try:
+                self.disk = SQLiteCacheStore(db_path, ttl, db_max_entries)
+            except sqlite3.Error as e:
+                print(f"⚠️ LLM cache disk tier disabled ({db_path}): {e}")
+        self._hits_memory = 0
+        self._hits_disk = 0
+        self._misses = 0
+        self._stores = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is not None:
+            self._hits_memory += 1
+            return value
+
+        if self.disk:
+            row = await asyncio.to_thread(self.disk.get, key)
+            if row is not None:
+                expires_at, value = row
+                self.memory.set(key, value, expires_at)
+                self._hits_disk += 1
+                return value
+
+        self._misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        self._stores += 1
+        if self.disk:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    async def prune(self) -> int:
+        """Remove expired and overflow disk rows (the memory tier bounds itself)"""
+        if not self.disk:
+            return 0
+        return await asyncio.to_thread(self.disk.prune)
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk:
+            self.disk.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._hits_memory + self._hits_disk + self._misses
+        hits = self._hits_memory + self._hits_disk
+        return {
+            "memory_entries": len(self.memory),
+            "max_entries": self.memory.max_entries,
+            "ttl": self.memory.ttl,
+            "disk_tier": self.disk.path if self.disk else None,
+            "disk_max_entries": self.disk.max_entries if self.disk else None,
+            "hits_memory": self._hits_memory,
+            "hits_disk": self._hits_disk,
+            "misses": self._misses,
+            "stores": self._stores,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0
+        }
+
+
+# Process-wide response cache used by llm_gateway.chat_completion
+llm_cache = LLMResponseCache(
+    max_entries=settings.llm_cache_max_entries,
+    ttl=settings.llm_cache_ttl,
+    db_path=settings.llm_cache_db_path,
+    db_max_entries=settings.llm_cache_db_max_entries
+)
@@ -0,0 +1,88 @@
+"""
+Shared LLM Client Provider
+One pooled AsyncOpenAI client per process instead of a new client (and a new
+connection pool / TLS handshake) for every run.
+Created at app startup, closed at shutdown, injected into runners and the chat agent.
+"""
+
+from typing import Optional
+import httpx
+from openai import AsyncOpenAI
+from ..config import settings
+from .rate_limiter import rate_limiter
+
+
+class LLMClientProvider:
+    """
+    Owns the process-wide AsyncOpenAI client and its underlying httpx pool.
+    The client is created lazily so scripts and tests that never call
+    startup() still share a single pool.
+    """
+
+    def __init__(self):
+        self._client: Optional[AsyncOpenAI] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+
+    def _build_http_client(self) -> httpx.AsyncClient:
+        """Build the pooled httpx client using keep-alive / HTTP/2 settings"""
+        limits = httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_keepalive_connections,
+            keepalive_expiry=settings.llm_keepalive_expiry
+        )
+        timeout = httpx.Timeout(settings.llm_timeout, connect=settings.llm_connect_timeout)
+        # Every response feeds the shared limiter (429s, x-ratelimit-* headers)
+        event_hooks = {"response": [rate_limiter.on_response]}
+
+        try:
+            return httpx.AsyncClient(http2=settings.llm_http2, limits=limits, timeout=timeout,
+                                     event_hooks=event_hooks)
+        except ImportError:
+            # HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+            print("⚠️ HTTP/2 requested but 'h2' is not installed, falling back to HTTP/1.1")
+            return httpx.AsyncClient(http2=False, limits=limits, timeout=timeout,
+                                     event_hooks=event_hooks)
+
+    def startup(self) -> AsyncOpenAI:
+        """Create the shared client (idempotent)"""
+        if self._client is None:
+            self._http_client = self._build_http_client()
+            self._client = AsyncOpenAI(
+                api_key=settings.openai_api_key,
+                base_url=settings.openai_base_url or None,
+                http_client=self._http_client,
+                # Retries are done by llm_gateway (backoff + circuit breaker), not the SDK
+                max_retries=0
+            )
+        return self._client
+
+    async def shutdown(self):
+        """Close the shared client and release pooled connections"""
+        if self._client is not None:
+            await self._client.close()
+        self._client = None
+        self._http_client = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        """The shared client, created on first use if startup() was not called"""
+        return self._client or self.startup()
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        """The pooled httpx client, for integrations that bring their own SDK (LangChain)"""
+        self.startup()
+        return self._http_client
+
+    @property
+    def is_started(self) -> bool:
+        return self._client is not None
+
+
+# Process-wide provider (started/stopped from main.py lifespan)
+llm_clients = LLMClientProvider()
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """Return the shared AsyncOpenAI client"""
+    return llm_clients.client
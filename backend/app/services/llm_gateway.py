@@ -0,0 +1,293 @@
+"""
+LLM Gateway
+Single entry point for chat completion calls made by the runners, the legacy
+runners and the chat agent, so cross-cutting policies (response cache, request
+coalescing, rate limiting, retries/circuit breaking, usage accounting, tracing,
+...) are applied in one place instead of around every call site.
+"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import openai
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from ..config import settings
+from .rate_limiter import rate_limiter
+from .llm_cache import llm_cache, cache_key
+from .semantic_cache import semantic_cache
+from .singleflight import singleflight
+from .resilience import call_with_resilience
+from .call_log import current_call_log
+from .tracing import span, active_span
+from .pricing import token_usage, estimate_cost
+from .tokenizer import token_counter
+from .context_budget import apply_budget, retarget
+from . import metrics
+
+# Only complete answers are worth replaying
+_CACHEABLE_FINISH_REASONS = {"stop", "tool_calls"}
+
+
+def _is_cacheable(response: ChatCompletion) -> bool:
+    return bool(response.choices) and all(
+        choice.finish_reason in _CACHEABLE_FINISH_REASONS for choice in response.choices
+    )
+
+
+def _step_label(cache_scope: Optional[str], request: Dict[str, Any]) -> Optional[str]:
+    """Best available name of the recipe step a call belongs to, for run meta"""
+    schema = (request.get("response_format") or {}).get("json_schema") or {}
+    return cache_scope or schema.get("name")
+
+
+def _record_call(cache_scope: Optional[str], request: Dict[str, Any], served_model: str,
+                 retries: int, usage: Any, messages: List[Dict[str, Any]], batch: bool = False):
+    call_log = current_call_log.get()
+    if call_log is not None:
+        call_log.record(_step_label(cache_scope, request), request.get("model"), served_model, retries, usage, batch)
+    tokens = token_usage(usage)
+    if served_model == request.get("model"):
+        token_counter.calibrate(served_model, messages, tokens["prompt_tokens"])
+    active_span().set(served_model=served_model, retries=retries, prompt_tokens=tokens["prompt_tokens"],
+                      completion_tokens=tokens["completion_tokens"])
+    for kind, count in tokens.items():
+        if count:
+            metrics.llm_tokens.inc(served_model, kind.replace("_tokens", ""), amount=count)
+    if tokens["prompt_tokens"]:
+        recipe = (call_log.recipe if call_log is not None else None) or "none"
+        metrics.llm_prompt_tokens.inc(recipe, "prompt", amount=tokens["prompt_tokens"])
+        metrics.llm_prompt_tokens.inc(recipe, "cached", amount=tokens["cached_tokens"])
+    cost = estimate_cost(served_model, tokens, batch)
+    if cost:
+        metrics.llm_cost.inc(served_model, amount=cost)
+
+
+def _span_attributes(messages: List[Dict[str, Any]], cache_scope: Optional[str],
+                     request: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "model": request.get("model"),
+        "step": _step_label(cache_scope, request) or "",
+        "messages": len(messages),
+        "prompt_chars": sum(len(m["content"]) for m in messages if isinstance(m.get("content"), str))
+    }
+
+
+def _result_code(error: BaseException) -> str:
+    """Metrics label for a failed provider request"""
+    if isinstance(error, openai.APIStatusError):
+        return str(error.status_code)
+    if isinstance(error, openai.APITimeoutError):
+        return "timeout"
+    if isinstance(error, openai.APIConnectionError):
+        return "connection_error"
+    if isinstance(error, asyncio.CancelledError):
+        return "cancelled"  # e.g. the losing side of a hedge
+    return "error"
+
+
+async def _provider_call(create: Any, **kwargs) -> Any:
+    """The provider request itself, timed apart from queueing and retries"""
+    call_span = active_span()
+    model = kwargs.get("model")
+    code = "200"
+    started = time.monotonic()
+    try:
+        with span("llm.provider", model=model):
+            return await create(**kwargs)
+    except BaseException as e:
+        code = _result_code(e)
+        raise
+    finally:
+        elapsed = time.monotonic() - started
+        call_span.add("provider_ms", elapsed * 1000)
+        metrics.llm_calls.inc(model, code)
+        metrics.llm_call_seconds.observe(elapsed, model)
+
+
+def _record_cache_hit():
+    call_log = current_call_log.get()
+    if call_log is not None:
+        call_log.record_cache_hit()
+
+
+def _semantic_scope(cache_scope: str, messages: List[Dict[str, Any]], request: Dict[str, Any]) -> str:
+    """Everything except the user turn: model, system prompt, response format, recipe step"""
+    fixed_messages = [m for m in messages if m.get("role") != "user"]
+    return cache_key({"scope": cache_scope, "messages": fixed_messages, **request})
+
+
+def record_batch_completion(cache_scope: Optional[str], request: Dict[str, Any],
+                            messages: List[Dict[str, Any]], response: ChatCompletion):
+    """Account a completion served by the provider's batch API like a live call, at batch prices"""
+    _record_call(cache_scope, request, request.get("model"), 0, response.usage, messages, batch=True)
+
+
+def _budget_for(model: str, messages: List[Dict[str, Any]], request: Dict[str, Any],
+                requested: Dict[str, Any], prompt_tokens: int) -> Tuple[Dict[str, Any], int]:
+    """(request, prompt tokens) for one candidate model: the budgeted request, or the caller's re-budgeted for a fallback"""
+    if model == request.get("model"):
+        return request, prompt_tokens
+    candidate = retarget(requested, model)
+    return candidate, apply_budget(messages, candidate)
+
+
+def _tpm_charge(request: Dict[str, Any], prompt_tokens: int) -> int:
+    """Tokens a call may use against TPM: its prompt plus its output limit, if any"""
+    return prompt_tokens + (request.get("max_tokens") or request.get("max_completion_tokens") or 0)
+
+
+def _settle(charge: int, usage: Any):
+    """Replace the call's estimated TPM charge with the tokens it actually used"""
+    if usage is not None:
+        rate_limiter.settle(charge, usage.total_tokens)
+
+
+async def chat_completion(client: AsyncOpenAI, *, messages: List[Dict[str, Any]],
+                          cache: bool = False, cache_scope: Optional[str] = None,
+                          semantic_text: Optional[str] = None, coalesce: Optional[bool] = None,
+                          **request) -> ChatCompletion:
+    """
+    Call client.chat.completions.create under the shared rate limiter.
+    Accepts the same keyword arguments as the OpenAI SDK and returns its response.
+
+    Args:
+        cache: Serve/store this call through the exact-match response cache
+               (callers resolve the recipe/step opt-in, see BaseRunner.cache_enabled)
+        cache_scope: Recipe step identity (e.g. "random_word:seed") for the semantic tier and run meta
+        semantic_text: User-supplied text compared for near-duplicates within the scope
+        coalesce: Share one provider call with identical in-flight calls (on by default with
+                  LLM_SINGLEFLIGHT_ENABLED, cached or not; False for calls that want their own sample)
+    """
+    if coalesce is None:
+        coalesce = settings.llm_singleflight_enabled
+
+    with span("llm.chat_completion", **_span_attributes(messages, cache_scope, request)) as call_span:
+        # Fails fast on prompts that cannot fit, and sets the output limit (part of the cache key)
+        requested = dict(request)
+        prompt_tokens = apply_budget(messages, request)
+        call_span.set(prompt_tokens_estimate=prompt_tokens)
+
+        key = None
+        if (cache and settings.llm_cache_enabled) or (coalesce and settings.llm_singleflight_enabled):
+            key = cache_key({"messages": messages, **request})
+
+        use_cache = cache and settings.llm_cache_enabled
+        if use_cache:
+            cached = await llm_cache.get(key)
+            if cached is not None:
+                _record_cache_hit()
+                call_span.set(cache="hit")
+                return ChatCompletion.model_validate_json(cached)
+
+        scope = None
+        if use_cache and settings.llm_semantic_cache_enabled and cache_scope and semantic_text:
+            scope = _semantic_scope(cache_scope, messages, request)
+            similar = semantic_cache.lookup(scope, semantic_text)
+            if similar is not None:
+                _record_cache_hit()
+                call_span.set(cache="semantic_hit")
+                return ChatCompletion.model_validate_json(similar)
+
+        async def attempt(model: str) -> ChatCompletion:
+            candidate, candidate_tokens = _budget_for(model, messages, request, requested, prompt_tokens)
+            charge = _tpm_charge(candidate, candidate_tokens)
+            async with rate_limiter.limit(charge):
+                response = await _provider_call(client.chat.completions.create, messages=messages, **candidate)
+            _settle(charge, response.usage)
+            return response
+
+        async def call() -> ChatCompletion:
+            response, served_model, retries = await call_with_resilience(attempt, request.get("model"))
+            _record_call(cache_scope, request, served_model, retries, response.usage, messages)
+
+            # A fallback model's answer must not be replayed for the requested model
+            if use_cache and served_model == request.get("model") and _is_cacheable(response):
+                serialized = response.model_dump_json()
+                await llm_cache.set(key, serialized)
+                if scope:
+                    semantic_cache.store(scope, semantic_text, serialized)
+            return response
+
+        if coalesce and settings.llm_singleflight_enabled:
+            return await singleflight.do(key, call)
+        return await call()
+
+
+def _replay_chunk(response: ChatCompletion) -> ChatCompletionChunk:
+    """A cached completion as the single chunk of a stream"""
+    choice = response.choices[0]
+    return ChatCompletionChunk.model_validate({
+        "id": response.id, "object": "chat.completion.chunk", "created": response.created, "model": response.model,
+        "choices": [{"index": 0, "delta": {"role": "assistant", "content": choice.message.content},
+                     "finish_reason": choice.finish_reason}]
+    })
+
+
+def _assemble_completion(first: ChatCompletionChunk, content: List[str], usage: Any) -> ChatCompletion:
+    """The completion a streamed text answer amounts to, for the response cache"""
+    return ChatCompletion.model_validate({
+        "id": first.id, "object": "chat.completion", "created": first.created, "model": first.model,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "".join(content)}}],
+        "usage": usage.model_dump() if usage is not None else None
+    })
+
+
+async def chat_completion_stream(client: AsyncOpenAI, *, messages: List[Dict[str, Any]],
+                                 cache: bool = False, **request) -> AsyncIterator[ChatCompletionChunk]:
+    """
+    Streaming variant of chat_completion: yields chunks as the provider sends them.
+    The rate-limiter slot is held until the stream is exhausted or closed.
+    Streams are never coalesced and only opening the stream is retried.
+    Usage is requested as a final chunk and recorded when the stream ends.
+
+    Args:
+        cache: Replay an exact-cache hit as a single chunk, and store a fully consumed
+               text answer under the same key chat_completion would use (tool-call
+               streams finish with "tool_calls" and are never stored)
+    """
+    async def open_stream(model: str):
+        candidate, _ = _budget_for(model, messages, request, requested, prompt_tokens)
+        return await _provider_call(
+            client.chat.completions.create,
+            messages=messages, stream=True, stream_options={"include_usage": True}, **candidate
+        )
+
+    with span("llm.chat_completion_stream", **_span_attributes(messages, None, request)) as call_span:
+        requested = dict(request)
+        prompt_tokens = apply_budget(messages, request)
+        call_span.set(prompt_tokens_estimate=prompt_tokens)
+        key = cache_key({"messages": messages, **request}) if cache and settings.llm_cache_enabled else None
+
+        if key is not None:
+            cached = await llm_cache.get(key)
+            if cached is not None:
+                _record_cache_hit()
+                call_span.set(cache="hit")
+                yield _replay_chunk(ChatCompletion.model_validate_json(cached))
+                return
+
+        charge = _tpm_charge(request, prompt_tokens)
+        async with rate_limiter.limit(charge):
+            stream, served_model, retries = await call_with_resilience(open_stream, request.get("model"))
+            usage = None
+            first = None
+            content: List[str] = []
+            finish_reason = None
+            try:
+                async for chunk in stream:
+                    if chunk.usage is not None:
+                        usage = chunk.usage
+                    if key is not None and chunk.choices:
+                        first = first or chunk
+                        content.append(chunk.choices[0].delta.content or "")
+                        finish_reason = chunk.choices[0].finish_reason or finish_reason
+                    yield chunk
+            finally:
+                await stream.close()
+                _settle(charge, usage)
+                _record_call(None, request, served_model, retries, usage, messages)
+
+            # Only reached when the caller consumed the whole stream
+            if key is not None and served_model == request.get("model") and finish_reason == "stop":
+                await llm_cache.set(key, _assemble_completion(first, content, usage).model_dump_json())
@@ -0,0 +1,215 @@
+"""
+Prometheus Metrics
+Counters and histograms updated on the hot path, plus gauges sampled from the
+existing stats() of the limiter, caches and breakers at scrape time, rendered in
+the Prometheus text exposition format by GET /metrics.
+
+Updates are plain dict/list arithmetic on the event loop thread, so no locks are
+taken; histogram buckets are fixed at definition and found with bisect. Nothing
+is aggregated until a scrape asks for it.
+"""
+
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+from .rate_limiter import rate_limiter
+from .llm_cache import llm_cache
+from .semantic_cache import semantic_cache
+from .singleflight import singleflight
+from .resilience import breakers
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter per label combination"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for values, total in list(self._values.items()):
+            yield f"{self.name}{_labels(self.label_names, values)} {_number(total)}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram; observations only bump one bucket counter"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        # per label combination: [bucket counts..., sum, count]
+        self._series: Dict[LabelValues, List[float]] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def samples(self) -> Iterable[str]:
+        for values, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.label_names, values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, values)} {_number(series[-2])}"
+            yield f"{self.name}_count{_labels(self.label_names, values)} {series[-1]}"
+
+
+class Sampled:
+    """
+    Gauge (or counter) read at scrape time from state kept elsewhere.
+    `read` returns a number, or {label values tuple: number} for labelled series.
+    """
+
+    def __init__(self, name: str, help: str, read: Callable[[], Any],
+                 labels: Sequence[str] = (), kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.read = read
+        self.label_names = tuple(labels)
+        self.kind = kind
+
+    def samples(self) -> Iterable[str]:
+        value = self.read()
+        if not isinstance(value, dict):
+            value = {(): value}
+        for values, number in value.items():
+            if number is not None:
+                yield f"{self.name}{_labels(self.label_names, values)} {_number(number)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def register(self, metric):
+        """Add a metric; re-registering a name replaces it (module reloads, tests)"""
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), **kwargs) -> Histogram:
+        return self.register(Histogram(name, help, labels, **kwargs))
+
+    def sampled(self, name: str, help: str, read: Callable[[], Any], labels: Sequence[str] = (),
+                kind: str = "gauge") -> Sampled:
+        return self.register(Sampled(name, help, read, labels, kind))
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                print(f"⚠️ Metric {metric.name} failed to collect: {e}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Recorded by BaseRunner.execute (whole runs, streamed or not)
+recipe_run_seconds = registry.histogram(
+    "recipe_run_duration_seconds", "Recipe run latency by recipe, runner type and outcome",
+    labels=("recipe", "runner_type", "status"), buckets=(0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300)
+)
+
+# Recorded by llm_gateway for every provider request (retries and hedges included)
+llm_calls = registry.counter(
+    "llm_calls_total", "Provider requests by model and result code (HTTP status or error kind)",
+    labels=("model", "code")
+)
+llm_call_seconds = registry.histogram(
+    "llm_call_duration_seconds", "Provider request latency (time to first chunk for streams)",
+    labels=("model",), buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 60)
+)
+llm_tokens = registry.counter("llm_tokens_total", "Tokens reported by the provider", labels=("model", "kind"))
+llm_cost = registry.counter("llm_cost_usd_total", "Estimated provider cost in USD", labels=("model",))
+# kind="prompt" | "cached" (prompt tokens served from the provider's prefix cache)
+llm_prompt_tokens = registry.counter(
+    "llm_prompt_tokens_total", "Prompt tokens sent and served from the provider prompt cache, by recipe",
+    labels=("recipe", "kind")
+)
+
+
+def prompt_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Per recipe: prompt tokens, cached prompt tokens and hit rate since startup"""
+    stats: Dict[str, Dict[str, Any]] = {}
+    for (recipe, kind), total in list(llm_prompt_tokens._values.items()):
+        entry = stats.setdefault(recipe, {"prompt_tokens": 0, "cached_tokens": 0})
+        entry["prompt_tokens" if kind == "prompt" else "cached_tokens"] = int(total)
+    for entry in stats.values():
+        prompt_tokens = entry["prompt_tokens"]
+        entry["hit_rate"] = round(entry["cached_tokens"] / prompt_tokens, 4) if prompt_tokens else 0.0
+    return stats
+
+
+_BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+# Sampled at scrape time from the stats() the limiter, caches and breakers already keep
+registry.sampled("llm_limiter_in_flight", "LLM calls holding a limiter slot",
+                 lambda: rate_limiter.stats()["in_flight"])
+registry.sampled("llm_limiter_queued", "LLM calls waiting for a limiter slot",
+                 lambda: rate_limiter.stats()["queued"])
+registry.sampled("llm_limiter_window", "Current adaptive concurrency window",
+                 lambda: rate_limiter.stats()["window"])
+registry.sampled("llm_rate_limited_total", "429 responses seen by the limiter",
+                 lambda: rate_limiter.stats()["rate_limited_total"], kind="counter")
+registry.sampled("llm_breaker_state", "Circuit breaker state per model (0 closed, 1 half-open, 2 open)",
+                 lambda: {(model,): _BREAKER_STATES[snapshot["state"]] for model, snapshot in breakers.stats().items()},
+                 labels=("model",))
+registry.sampled("llm_breaker_trips_total", "Times a model's breaker opened",
+                 lambda: {(model,): snapshot["trips"] for model, snapshot in breakers.stats().items()},
+                 labels=("model",), kind="counter")
+registry.sampled("llm_cache_hits_total", "Response cache hits by tier",
+                 lambda: {("memory",): llm_cache.stats()["hits_memory"], ("disk",): llm_cache.stats()["hits_disk"],
+                          ("semantic",): semantic_cache.stats()["hits"]},
+                 labels=("tier",), kind="counter")
+registry.sampled("llm_cache_misses_total", "Exact-match response cache misses",
+                 lambda: llm_cache.stats()["misses"], kind="counter")
+registry.sampled("llm_cache_hit_ratio", "Hit ratio since start per cache",
+                 lambda: {("exact",): llm_cache.stats()["hit_rate"], ("semantic",): semantic_cache.stats()["hit_rate"]},
+                 labels=("cache",))
+registry.sampled("llm_singleflight_in_flight", "Distinct provider calls currently shared by identical callers",
+                 lambda: singleflight.stats()["in_flight"])
+registry.sampled("llm_singleflight_coalesced_total", "Calls served by joining an identical in-flight call",
+                 lambda: singleflight.stats()["coalesced"], kind="counter")
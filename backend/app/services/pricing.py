@@ -0,0 +1,65 @@
+"""
+Model Price Table
+Estimated USD cost of a chat completion from its token usage.
+Prices are USD per 1M tokens: (input, cached input, output). Dated snapshots
+("gpt-4o-mini-2024-07-18") match their base name by longest prefix.
+Override or extend with LLM_PRICE_TABLE='{"my-model": [input, cached, output]}'.
+Completions served by the provider's batch API cost BATCH_PRICE_FACTOR of that.
+"""
+
+import json
+from typing import Any, Dict, Optional, Tuple
+from ..config import settings
+
+MODEL_PRICES: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "o4-mini": (1.10, 0.275, 4.40),
+    "o3-mini": (1.10, 0.55, 4.40),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+}
+
+BATCH_PRICE_FACTOR = 0.5
+
+if settings.llm_price_table:
+    try:
+        MODEL_PRICES.update({
+            model: tuple(float(price) for price in prices)
+            for model, prices in json.loads(settings.llm_price_table).items()
+        })
+    except (ValueError, TypeError) as e:
+        print(f"⚠️ Ignoring invalid LLM_PRICE_TABLE: {e}")
+
+
+def model_prices(model: str) -> Optional[Tuple[float, float, float]]:
+    if model in MODEL_PRICES:
+        return MODEL_PRICES[model]
+    matches = [name for name in MODEL_PRICES if model.startswith(name)]
+    return MODEL_PRICES[max(matches, key=len)] if matches else None
+
+
+def token_usage(usage: Any) -> Dict[str, int]:
+    """prompt/completion/cached token counts from an SDK usage object (None -> zeros)"""
+    if usage is None:
+        return {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens or 0,
+        "completion_tokens": usage.completion_tokens or 0,
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0
+    }
+
+
+def estimate_cost(model: str, tokens: Dict[str, int], batch: bool = False) -> Optional[float]:
+    """Estimated USD cost, or None for a model missing from the price table"""
+    prices = model_prices(model or "")
+    if prices is None:
+        return None
+    input_price, cached_price, output_price = prices
+    uncached = tokens["prompt_tokens"] - tokens["cached_tokens"]
+    cost = (uncached * input_price + tokens["cached_tokens"] * cached_price
+            + tokens["completion_tokens"] * output_price) / 1_000_000
+    return cost * BATCH_PRICE_FACTOR if batch else cost
@@ -0,0 +1,47 @@
+"""
+Prompt Layout
+Providers reuse the longest prompt prefix they have recently processed (OpenAI
+does so automatically for prompts of 1024+ tokens) and bill those prompt tokens
+at a discount, with lower latency. Only an exact prefix counts: one differing
+character early in the prompt makes the rest of it a miss. So every request is
+laid out from the most static content to the most dynamic:
+
+1. fixed per recipe: the recipe (or chat agent) system prompt, then a chain
+   step's system prompt, the language guardrails and a debate track's framing
+2. fixed per user: the profile preferences
+3. fixed per call: the user message with the rendered inputs, state and prior
+   results
+
+response_format schemas and chat tool lists, which count towards the prefix as
+well, are built once per recipe (see recipe_plan and recipe_tools), so they are
+byte-identical from call to call. Cached prompt tokens are reported per recipe
+in run usage (prompt_cache_hit_rate), GET /run/cache and /metrics.
+"""
+
+from typing import Optional
+from ..models_user import UserProfile
+
+
+def profile_context(profile: UserProfile) -> str:
+    """The user's preferences as system prompt text"""
+    return (
+        "User Preferences:\n"
+        f"- Goals: {', '.join(profile.goals)}\n"
+        f"- Domains: {', '.join(profile.domains)}\n"
+        f"- Tone: {profile.preferred_tone}; Detail: {profile.detail}\n"
+        f"- Output formats: {', '.join(profile.output_formats)}\n"
+        f"- Cognitive: div={profile.cognitive.divergent}, big={profile.cognitive.big_picture}, "
+        f"speed={profile.cognitive.speed_over_evidence}, risk={profile.cognitive.risk_tolerance}, visual={profile.cognitive.visual_pref}\n"
+        f"- Step-by-step: {profile.step_by_step}; Citations: {profile.wants_citations}\n"
+        f"- Constraints: {profile.constraints}\n"
+        f"- Notes: {profile.style_notes or '—'}\n"
+        "Follow these when applying any recipe."
+    )
+
+
+def layout_system_prompt(*static_parts: Optional[str], profile: Optional[str] = None) -> str:
+    """Non-empty static parts in the given order, then the (per-user) profile text last"""
+    parts = [part for part in static_parts if part]
+    if profile:
+        parts.append(profile)
+    return "\n\n".join(parts)
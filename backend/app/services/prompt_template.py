@@ -0,0 +1,145 @@
+"""
+Prompt Templates
+Recipe prompts are parsed once into literal segments and placeholders, then
+rendered in a single pass, instead of scanning the whole template once per
+context key. A placeholder is {name} where name starts with a letter or
+underscore ({topic}, {step.analyze_word.output}); literal JSON in prompts
+({"title": "..."}, { }) never matches, and a placeholder with no value in the
+context is left as written, exactly as str.replace-based rendering did.
+
+compile_template() memoizes by template text, so templates assembled at run
+time (language guardrails + substep prompt) are parsed once too. When recipes
+are loaded, check_recipe_templates() compiles every prompt and reports
+placeholders the runner will never fill.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Set, Tuple
+from ..models import Recipe, InputDefinition
+from .step_graph import step_id, step_prompt
+
+_PLACEHOLDER = re.compile(r"\{([A-Za-z_][^{}\s\"':,]*)\}")
+_MISSING = object()
+
+
+class PromptTemplate:
+    """A template split into literals and placeholders; render() fills them in one pass"""
+
+    __slots__ = ("text", "names", "_head", "_slots")
+
+    def __init__(self, text: str):
+        self.text = text
+        pieces = _PLACEHOLDER.split(text)
+        # split() alternates literal, name, literal, ..., literal
+        self._head = pieces[0]
+        self._slots: Tuple[Tuple[str, str], ...] = tuple(zip(pieces[1::2], pieces[2::2]))
+        self.names: Tuple[str, ...] = tuple(pieces[1::2])
+
+    @property
+    def placeholders(self) -> Set[str]:
+        return set(self.names)
+
+    def count(self, name: str) -> int:
+        """Occurrences of {name}"""
+        return self.names.count(name)
+
+    def render(self, context: Dict[str, Any]) -> str:
+        if not self._slots:
+            return self._head
+        parts = [self._head]
+        for name, literal in self._slots:
+            value = context.get(name, _MISSING)
+            parts.append("{" + name + "}" if value is _MISSING else str(value))
+            parts.append(literal)
+        return "".join(parts)
+
+
+@lru_cache(maxsize=2048)
+def compile_template(text: str) -> PromptTemplate:
+    return PromptTemplate(text)
+
+
+def input_names(recipe: Recipe) -> List[str]:
+    """Parameter names a recipe declares (legacy "loops=3" entries included)"""
+    names = []
+    for input_def in recipe.inputs:
+        if isinstance(input_def, str):
+            names.append(input_def.split("=", 1)[0])
+        elif isinstance(input_def, InputDefinition):
+            names.append(input_def.name)
+        elif isinstance(input_def, dict) and "name" in input_def:
+            names.append(input_def["name"])
+    return names
+
+
+def recipe_templates(recipe: Recipe) -> Iterator[Tuple[str, str, Set[str]]]:
+    """
+    (location, template, names the runner puts in its context) for every prompt a
+    recipe renders with safe_template_replace/render_prompt. Routing prompts go
+    through LangChain's own formatter and are not listed.
+    """
+    inputs = set(input_names(recipe))
+    yield "user_prompt_template", recipe.user_prompt_template, inputs
+
+    workflow = recipe.workflow
+    if workflow and workflow.chain:
+        for i, step in enumerate(workflow.chain.steps):
+            yield f"chain.steps[{step_id(step, i)}]", step_prompt(step), inputs
+
+    if workflow and workflow.parallel:
+        parallel = workflow.parallel
+        for branch in parallel.branches or []:
+            yield f"parallel.branches[{branch.get('name', 'branch')}]", branch.get("prompt", ""), inputs
+        if parallel.prompt:
+            yield "parallel.prompt", parallel.prompt, inputs
+        if parallel.synthesis:
+            yield "parallel.synthesis", parallel.synthesis.get("prompt", ""), inputs | {"parallel_results"}
+
+    if workflow and workflow.orchestrator:
+        orchestrator = workflow.orchestrator
+        yield "orchestrator.planner", orchestrator.planner.get("prompt", ""), inputs
+        for worker in orchestrator.workers.get("available", []):
+            yield (f"orchestrator.workers[{worker.get('name', 'worker')}]", worker.get("prompt", ""),
+                   inputs | {"worker_context", "plan"})
+        yield ("orchestrator.synthesizer", orchestrator.synthesizer.get("prompt", ""),
+               inputs | {"plan", "worker_results"})
+
+    iterative = recipe.iterative
+    if iterative:
+        loop_names = inputs | {"loop", "state", "params"}
+        if iterative.language_guardrails:
+            yield "iterative.language_guardrails", iterative.language_guardrails, loop_names | {"role"}
+        if iterative.loop_prompt_template:
+            yield "iterative.loop_prompt_template", iterative.loop_prompt_template, loop_names | {"role"}
+        for i, substep in enumerate(iterative.substeps or [], start=1):
+            if substep.get("prompt"):
+                yield f"iterative.substeps[{substep.get('role', i)}]", substep["prompt"], loop_names | {"role"}
+        for key, value in (iterative.initial_state or {}).items():
+            if isinstance(value, str):
+                yield f"iterative.initial_state.{key}", value, inputs
+        if iterative.final_synthesis and iterative.final_synthesis.get("prompt"):
+            yield ("iterative.final_synthesis", iterative.final_synthesis["prompt"],
+                   inputs | {"iteration_summary", "final_state"})
+        summarizer = iterative.compaction.summarizer if iterative.compaction else None
+        if summarizer and summarizer.get("prompt"):
+            yield "iterative.compaction.summarizer", summarizer["prompt"], inputs | {"summary", "evicted", "state"}
+
+
+def check_recipe_templates(recipe: Recipe) -> List[str]:
+    """
+    Compile every prompt of a recipe (so runs start with parsed templates) and
+    return one message per prompt that has placeholders nothing will fill
+    """
+    issues = []
+    for location, text, known in recipe_templates(recipe):
+        if not text:
+            continue
+        unknown = [
+            name for name in dict.fromkeys(compile_template(text).names)
+            # {step.<id>.<key>} references are checked by the chain step graph
+            if name not in known and not name.startswith("step.")
+        ]
+        if unknown:
+            issues.append(f"{location}: unknown placeholder(s) {', '.join('{' + name + '}' for name in unknown)}")
+    return issues
@@ -0,0 +1,259 @@
+"""
+Adaptive Rate Limiter
+One process-wide limiter for every outbound LLM call, replacing the per-module
+Semaphore(5) copies. Combines:
+- an AIMD concurrency window (halves on 429s, grows back slowly on success)
+- token buckets for requests-per-minute and tokens-per-minute
+- provider rate-limit headers (x-ratelimit-*, retry-after) read from every response
+"""
+
+import asyncio
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional
+from ..config import settings
+from .tracing import start_span, active_span
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_reset_duration(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI-style reset durations ("20ms", "1s", "6m0s") into seconds"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    multipliers = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+    return sum(float(amount) * multipliers[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Continuous-refill token bucket. A rate of 0 disables the bucket."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.per_minute = per_minute
+        self.capacity = capacity or per_minute
+        self.available = self.capacity
+        self._updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.enabled:
+            self.available = min(self.capacity, self.available + (now - self._updated) * self.per_minute / 60.0)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` can be consumed (0 if available now)"""
+        if not self.enabled:
+            return 0.0
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60.0 / self.per_minute
+
+    def consume(self, amount: float):
+        if self.enabled:
+            self._refill()
+            self.available -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        """Return tokens consumed in excess (a negative amount consumes the shortfall)"""
+        if self.enabled:
+            self._refill()
+            self.available = min(self.capacity, self.available + amount)
+
+    def set_limit(self, per_minute: float):
+        """Adopt the limit reported by the provider"""
+        if per_minute > 0 and per_minute != self.per_minute:
+            self._refill()
+            self.per_minute = per_minute
+            self.capacity = per_minute
+            self.available = min(self.available, self.capacity)
+
+    def cap_available(self, remaining: float):
+        """Never assume more headroom than the provider says is left"""
+        if self.enabled:
+            self._refill()
+            self.available = min(self.available, remaining)
+
+
+class AdaptiveRateLimiter:
+    """
+    Shared limiter for all LLM calls.
+    Usage:
+        async with rate_limiter.limit(estimated_tokens):
+            response = await client.chat.completions.create(...)
+        rate_limiter.settle(estimated_tokens, response.usage.total_tokens)
+    Feedback arrives through on_response(), registered as an httpx response hook
+    on the shared LLM client, so every call (native or LangChain) is observed.
+    """
+
+    def __init__(self, max_concurrency: int, min_concurrency: int = 1,
+                 rpm_limit: float = 0, tpm_limit: float = 0,
+                 decrease_factor: float = 0.5, decrease_cooldown: float = 1.0):
+        self.max_window = float(max_concurrency)
+        self.min_window = float(min_concurrency)
+        self.window = float(max_concurrency)
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+
+        self.requests = TokenBucket(rpm_limit)
+        self.tokens = TokenBucket(tpm_limit)
+
+        self._in_flight = 0
+        self._queued = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._rate_limited_total = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop = None
+
+    def _condition(self) -> asyncio.Condition:
+        """Condition bound to the running loop (recreated if the loop changes)"""
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+        return self._cond
+
+    def _wait_time(self, tokens: int) -> Optional[float]:
+        """Seconds to wait before a call may start; None means wait for a slot to free"""
+        if self._in_flight >= max(1, int(self.window)):
+            return None
+        return max(
+            self._blocked_until - time.monotonic(),
+            self.requests.wait_time(1),
+            self.tokens.wait_time(tokens),
+            0.0
+        )
+
+    @asynccontextmanager
+    async def limit(self, tokens: int = 0):
+        """Hold one concurrency slot (and budget `tokens` against TPM) for the duration of a call"""
+        cond = self._condition()
+        # Queueing time is traced apart from the call itself (see tracing.py)
+        wait_span = start_span("llm.limiter_wait", queued_ahead=self._queued, in_flight=self._in_flight)
+        wait_started = time.monotonic()
+        self._queued += 1
+        try:
+            async with cond:
+                while True:
+                    delay = self._wait_time(tokens)
+                    if delay == 0:
+                        break
+                    try:
+                        await asyncio.wait_for(cond.wait(), timeout=delay)
+                    except asyncio.TimeoutError:
+                        pass
+                self._in_flight += 1
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+        except BaseException as e:
+            wait_span.end(error=type(e).__name__)
+            raise
+        finally:
+            self._queued -= 1
+        wait_span.end()
+        active_span().add("limiter_wait_ms", (time.monotonic() - wait_started) * 1000)
+
+        try:
+            yield self
+        finally:
+            self._in_flight -= 1
+            async with cond:
+                cond.notify_all()
+
+    def settle(self, charged: int, used: int):
+        """Correct a call's TPM charge once its usage is known (unused output reserve comes back)"""
+        self.tokens.refund(charged - used)
+
+    def record_success(self):
+        """Additive increase: roughly +1 slot per window's worth of successful calls"""
+        if self.window < self.max_window:
+            self.window = min(self.max_window, self.window + 1.0 / self.window)
+
+    def record_rate_limited(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease, at most once per cooldown so one burst of 429s halves once"""
+        now = time.monotonic()
+        self._rate_limited_total += 1
+        if now - self._last_decrease >= self.decrease_cooldown:
+            self.window = max(self.min_window, self.window * self.decrease_factor)
+            self._last_decrease = now
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, now + retry_after)
+
+    def observe_headers(self, headers) -> Optional[float]:
+        """Align buckets with provider x-ratelimit-* headers; returns the requests reset delay"""
+        def number(name: str) -> Optional[float]:
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+
+        limit_requests = number("x-ratelimit-limit-requests")
+        limit_tokens = number("x-ratelimit-limit-tokens")
+        remaining_requests = number("x-ratelimit-remaining-requests")
+        remaining_tokens = number("x-ratelimit-remaining-tokens")
+
+        if limit_requests:
+            self.requests.set_limit(limit_requests)
+        if limit_tokens:
+            self.tokens.set_limit(limit_tokens)
+        if remaining_requests is not None:
+            self.requests.cap_available(remaining_requests)
+        if remaining_tokens is not None:
+            self.tokens.cap_available(remaining_tokens)
+
+        return parse_reset_duration(headers.get("x-ratelimit-reset-requests"))
+
+    async def on_response(self, response):
+        """httpx response hook: adapt the window from status codes and headers"""
+        reset = self.observe_headers(response.headers)
+        if response.status_code == 429:
+            retry_after = parse_reset_duration(response.headers.get("retry-after")) or reset
+            self.record_rate_limited(retry_after)
+        elif response.status_code < 400:
+            self.record_success()
+        else:
+            return
+        cond = self._condition()
+        async with cond:
+            cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        """Current window, queue depth and bucket levels"""
+        self.requests._refill()
+        self.tokens._refill()
+        return {
+            "window": round(self.window, 2),
+            "max_window": self.max_window,
+            "in_flight": self._in_flight,
+            "queued": self._queued,
+            "rpm_limit": self.requests.per_minute,
+            "requests_available": round(self.requests.available, 1) if self.requests.enabled else None,
+            "tpm_limit": self.tokens.per_minute,
+            "tokens_available": round(self.tokens.available) if self.tokens.enabled else None,
+            "throttled_for": round(max(0.0, self._blocked_until - time.monotonic()), 3),
+            "rate_limited_total": self._rate_limited_total
+        }
+
+
+# Process-wide limiter shared by every runner, the legacy runners and the chat agent
+rate_limiter = AdaptiveRateLimiter(
+    max_concurrency=settings.llm_max_concurrency,
+    min_concurrency=settings.llm_min_concurrency,
+    rpm_limit=settings.llm_rpm_limit,
+    tpm_limit=settings.llm_tpm_limit
+)
@@ -0,0 +1,163 @@
+"""
+Recipe Plans
+Every recipe is compiled once, when recipes are loaded, into an immutable
+RecipePlan: its runner class, its validated workflow config, prebuilt
+response_format objects, its parsed prompt templates and (for chains) the step
+dependency levels. A run then only binds inputs: run_recipe looks the plan up
+and creates the runner from it. A misconfigured recipe is rejected at startup,
+not mid-request after LLM calls were already paid for.
+
+Plans assume recipes are not modified after loading. Recipes built on the fly
+(tests, benchmarks, anything not in RECIPES) are compiled per run by plan_for.
+"""
+
+from typing import Any, Dict, List, Optional, Type
+from openai import AsyncOpenAI
+from pydantic import BaseModel, ConfigDict
+from ..models import Recipe
+from ..models_user import UserProfile
+from .base_runner import BaseRunner, build_response_format
+from .prompt_template import PromptTemplate, compile_template, recipe_templates
+from .runner_factory import RunnerFactory, RUNNERS
+from .runners.iterative import substep_schema
+from .step_graph import step_id, step_dependencies, topological_levels
+
+
+class RecipePlan(BaseModel):
+    """Everything a run of one recipe needs that does not depend on its inputs"""
+    model_config = ConfigDict(frozen=True, arbitrary_types_allowed=True)
+
+    recipe: Recipe
+    runner_type: str
+    runner_class: Type[BaseRunner]
+    config: Optional[Dict[str, Any]] = None  # Workflow section as a plain dict (read-only)
+    response_formats: Dict[str, Dict[str, Any]] = {}  # json_schema name -> shared response_format
+    templates: Dict[str, PromptTemplate] = {}  # Prompt location -> parsed template
+    step_dependencies: Dict[str, List[str]] = {}
+    step_levels: List[List[str]] = []
+
+    def runner(self, profile: Optional[UserProfile] = None, client: Optional[AsyncOpenAI] = None) -> BaseRunner:
+        """A fresh runner for one run (runners carry per-run state), bound to this plan"""
+        runner = self.runner_class(profile, client)
+        runner.plan = self
+        return runner
+
+
+# Plans of the loaded recipes (see recipes.load_recipes)
+PLANS: Dict[str, RecipePlan] = {}
+
+
+def _response_formats(recipe: Recipe, runner_type: str, config: Optional[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Every response_format the recipe's runner asks for, keyed by json_schema name as the runner names them"""
+    schemas: Dict[str, Optional[Dict[str, Any]]] = {}
+    workflow = recipe.workflow
+    if runner_type == "single_shot":
+        schemas[f"{recipe.id}_response"] = (recipe.response_format or {}).get("schema")
+    elif runner_type == "chain":
+        for i, step in enumerate(workflow.chain.steps):
+            schemas[f"{recipe.id}_{step_id(step, i)}"] = step.get("response_schema")
+    elif runner_type == "parallel":
+        parallel = workflow.parallel
+        for branch in parallel.branches or []:
+            schemas[f"{recipe.id}_{branch.get('name', 'branch')}"] = branch.get("response_schema")
+        if parallel.mode != "branching":
+            for vote_idx in range(parallel.votes or 0):
+                schemas[f"{recipe.id}_vote_{vote_idx}"] = parallel.response_schema
+        if parallel.synthesis:
+            schemas[f"{recipe.id}_synthesis"] = parallel.synthesis.get("response_schema")
+    elif runner_type == "orchestrator":
+        schemas[f"{recipe.id}_plan"] = config["planner"].get("schema")
+        for worker in config["workers"].get("available", []) + config["workers"].get("default", []):
+            schemas[f"{recipe.id}_{worker.get('name', 'worker')}"] = worker.get("schema")
+        schemas[f"{recipe.id}_synthesis"] = config["synthesizer"].get("schema")
+    elif runner_type == "iterative":
+        it = recipe.iterative
+        for substep_num, substep in enumerate(it.substeps or [], start=1):
+            schemas[f"{recipe.id}_sub_{substep_num}"] = substep_schema(it, substep, substep_num)
+        schemas[f"{recipe.id}_step"] = it.step_response_schema
+        summarizer = it.compaction.summarizer if it.compaction else None
+        if summarizer:
+            schemas[f"{recipe.id}_state_summary"] = summarizer.get("schema")
+        if it.final_synthesis:
+            schemas[f"{recipe.id}_final_synthesis"] = it.final_synthesis.get("response_schema")
+
+    formats = {}
+    for name, schema in schemas.items():
+        if schema is not None and not isinstance(schema, dict):
+            raise ValueError(f"Response schema for '{name}' must be a JSON object")
+        formats[name] = build_response_format(name, schema)
+    return formats
+
+
+def _check_workflow(recipe: Recipe, runner_type: str):
+    """Misconfigurations a runner would otherwise only hit mid-run"""
+    workflow = recipe.workflow
+    if runner_type == "iterative":
+        it = recipe.iterative
+        if it.default_loops > it.max_loops:
+            raise ValueError(f"default_loops ({it.default_loops}) exceeds max_loops ({it.max_loops})")
+    elif runner_type == "parallel":
+        parallel = workflow.parallel
+        if parallel.mode not in ("voting", "branching"):
+            raise ValueError(f"Unknown parallel mode '{parallel.mode}' (voting, branching)")
+        if parallel.mode == "branching" and not parallel.branches:
+            raise ValueError("Parallel branching recipes need at least one branch")
+        if parallel.mode == "voting" and not parallel.prompt:
+            raise ValueError("Parallel voting recipes need a prompt")
+    elif runner_type == "orchestrator":
+        orchestrator = workflow.orchestrator
+        if not orchestrator.planner.get("prompt"):
+            raise ValueError("Orchestrator planner needs a prompt")
+        # Workers are picked from "available" by the plan, or run as listed in "default"
+        lists = {key: orchestrator.workers.get(key) or [] for key in ("available", "default")}
+        if not any(lists.values()):
+            raise ValueError("Orchestrator recipes need workers.available or workers.default")
+        for key, workers in lists.items():
+            unnamed = [i for i, worker in enumerate(workers) if not worker.get("name") or not worker.get("prompt")]
+            if unnamed:
+                raise ValueError(f"Orchestrator workers.{key} at position(s) {unnamed} need a name and a prompt")
+
+
+def compile_plan(recipe: Recipe) -> RecipePlan:
+    """Validate a recipe for its runner and precompute its plan; raises ValueError when misconfigured"""
+    runner_type = RunnerFactory._determine_runner_type(recipe)
+    if runner_type not in RUNNERS:
+        raise ValueError(f"Unknown runner type: {runner_type}")
+    is_valid, error_message = RunnerFactory.validate_recipe_for_runner(recipe)
+    if not is_valid:
+        raise ValueError(f"Invalid recipe configuration: {error_message}")
+    _check_workflow(recipe, runner_type)
+
+    workflow = recipe.workflow
+    section = {
+        "chain": workflow.chain,
+        "parallel": workflow.parallel,
+        "orchestrator": workflow.orchestrator,
+        "routing": workflow.router
+    }.get(runner_type) if workflow else None
+    config = section.model_dump() if section is not None else None
+
+    dependencies: Dict[str, List[str]] = {}
+    levels: List[List[str]] = []
+    if runner_type == "chain":
+        dependencies = step_dependencies(recipe.workflow.chain.steps)
+        levels = topological_levels(dependencies)
+
+    return RecipePlan(
+        recipe=recipe,
+        runner_type=runner_type,
+        runner_class=RUNNERS[runner_type],
+        config=config,
+        response_formats=_response_formats(recipe, runner_type, config),
+        templates={location: compile_template(text) for location, text, _ in recipe_templates(recipe) if text},
+        step_dependencies=dependencies,
+        step_levels=levels
+    )
+
+
+def plan_for(recipe: Recipe) -> RecipePlan:
+    """The loaded plan of this recipe object, or a plan compiled for this run"""
+    plan = PLANS.get(recipe.id)
+    if plan is not None and plan.recipe is recipe:
+        return plan
+    return compile_plan(recipe)
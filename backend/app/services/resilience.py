@@ -0,0 +1,162 @@
+"""
+LLM Call Resilience
+Retries with jittered exponential backoff for transient provider errors, a
+per-model circuit breaker that fails fast while a model is degraded, and an
+optional fallback model (settings.llm_fallback_model) used while the
+requested model's breaker is open.
+Retries and the serving model of each call are recorded by llm_gateway into
+the run's CallLog (see call_log.py).
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+import openai
+from ..config import settings
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the provider while every candidate model's breaker is open"""
+
+
+def is_retryable(error: Exception) -> bool:
+    """Timeouts, connection errors, 408/409/429 and 5xx are worth another attempt"""
+    if isinstance(error, openai.APIConnectionError):  # includes APITimeoutError
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _counts_against_breaker(error: Exception) -> bool:
+    # 429s are load, not a broken model: the rate limiter backs off for those
+    return not (isinstance(error, openai.APIStatusError) and error.status_code == 429)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given retry attempt (1-based)"""
+    ceiling = min(settings.llm_retry_max_delay, settings.llm_retry_base_delay * 2 ** (attempt - 1))
+    return random.uniform(0, ceiling)
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half_open after `cooldown` seconds, letting a single probe through;
+    half_open -> closed on probe success, back to open on probe failure.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self.failures = 0
+        self.trips = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self._probing = False
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self.trips += 1
+
+    def release(self):
+        """Attempt ended without a verdict (cancelled, client-side error): free the probe slot"""
+        self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"state": self.state, "consecutive_failures": self.failures, "trips": self.trips}
+
+
+class BreakerRegistry:
+    """One circuit breaker per model"""
+
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(self.failure_threshold, self.cooldown)
+        return breaker
+
+    def stats(self) -> Dict[str, Any]:
+        return {model: breaker.snapshot() for model, breaker in self._breakers.items()}
+
+
+# Process-wide breakers used by llm_gateway
+breakers = BreakerRegistry(settings.llm_breaker_failure_threshold, settings.llm_breaker_cooldown)
+
+
+async def call_with_resilience(fn: Callable[[str], Awaitable[Any]], model: str) -> Tuple[Any, str, int]:
+    """
+    Run fn(model) with retries, the model's circuit breaker and the fallback model.
+    Returns (response, model that served it, retries spent).
+    """
+    candidates = [model]
+    if settings.llm_fallback_model and settings.llm_fallback_model != model:
+        candidates.append(settings.llm_fallback_model)
+
+    retries = 0
+    last_error: Optional[Exception] = None
+    for candidate in candidates:
+        breaker = breakers.get(candidate)
+        attempt = 0
+        while breaker.allow():
+            try:
+                response = await fn(candidate)
+            except asyncio.CancelledError:
+                breaker.release()
+                raise
+            except Exception as e:
+                if not is_retryable(e):
+                    breaker.release()
+                    raise
+                if _counts_against_breaker(e):
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+                last_error = e
+                if attempt >= settings.llm_max_retries or breaker.state == CircuitBreaker.OPEN:
+                    break
+                attempt += 1
+                retries += 1
+                print(f"⚠️ LLM call failed on {candidate} ({e.__class__.__name__}), retry {attempt}/{settings.llm_max_retries}")
+                await asyncio.sleep(backoff_delay(attempt))
+                continue
+
+            breaker.record_success()
+            return response, candidate, retries
+
+        if breaker.state == CircuitBreaker.CLOSED:
+            # Retries exhausted on a model still considered healthy: no fallback
+            break
+
+    if last_error is not None:
+        raise last_error
+    raise CircuitOpenError(f"Circuit open for model(s) {', '.join(candidates)}; not calling the provider")
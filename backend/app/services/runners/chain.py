@@ -1,118 +1,138 @@
-import json
-import asyncio
-from typing import Dict, Any, List
-from openai import AsyncOpenAI
-from ...config import settings
-from ...models import Recipe
-from ..base_runner import BaseRunner
-
-MAX_CONCURRENT_CALLS = 5
-_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
-
-
-class ChainRunner(BaseRunner):
-    """Sequential chain execution with optional LangChain or native OpenAI support"""
-
-    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        if not recipe.workflow or recipe.workflow.type != "chain":
-            raise ValueError("Recipe must have workflow.type='chain'")
-
-        # Route to LangChain or native implementation based on config
-        if settings.use_langchain:
-            return await self._run_with_langchain(recipe, inputs)
-        else:
-            return await self._run_native(recipe, inputs)
-
-    async def _run_native(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        """Native OpenAI implementation (default, more reliable with JSON)"""
-        workflow = recipe.workflow
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
-        temperature = workflow.chain.temperature if workflow.chain and hasattr(workflow.chain, 'temperature') and workflow.chain.temperature is not None else 0.7
-
-        # Build system prompt with profile injection
-        base_system_prompt = self.build_system_prompt(recipe.system_prompt or "")
-
-        # Execute chain steps sequentially
-        context = inputs.copy()
-        step_results = []
-
-        for i, step in enumerate(workflow.chain.steps if workflow.chain else []):
-            step_id = step.get("id", step.get("name", f"step_{i+1}"))
-            step_role = step.get("role", "")
-            step_system_prompt = step.get("system_prompt", "")
-            step_user_prompt = step.get("user_prompt", step.get("prompt", ""))
-
-            # Build system prompt with step-specific additions
-            if step_system_prompt:
-                full_system_prompt = base_system_prompt + "\n\n" + step_system_prompt
-            else:
-                full_system_prompt = base_system_prompt
-
-            # Replace template variables in user prompt
-            user_prompt = self.safe_template_replace(step_user_prompt, context)
-
-            # Determine response format
-            response_format = {"type": "json_object"}
-            if step.get("response_schema"):
-                response_format = {
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": f"{recipe.id}_{step_id}",
-                        "schema": step["response_schema"],
-                        "strict": True
-                    }
-                }
-
-            # Execute step
-            async with _semaphore:
-                response = await client.chat.completions.create(
-                    model=settings.openai_model,
-                    messages=[
-                        {"role": "system", "content": full_system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    response_format=response_format,
-                    temperature=temperature
-                )
-
-            # Parse response
-            step_result = json.loads(response.choices[0].message.content)
-
-            step_results.append({
-                "step": step_id,
-                "output": step_result
-            })
-
-            # Add step result to context for next step
-            # Make step output available as step.{step_id}.output
-            context[f"step.{step_id}.output"] = step_result
-            if isinstance(step_result, dict):
-                # Also add individual keys for easier access
-                for key, value in step_result.items():
-                    context[f"step.{step_id}.{key}"] = value
-
-        # Prepare final result
-        final_output = step_results[-1]["output"] if step_results else {}
-
-        return {
-            "recipe_id": recipe.id,
-            "mode": "chain",
-            "output": final_output,
-            "steps": step_results,
-            "methodology": recipe.methodology if hasattr(recipe, 'methodology') and recipe.methodology else None,
-            "meta": {
-                "runner_type": "chain",
-                "total_steps": len(step_results),
-                "execution_mode": "native"
-            }
-        }
-
-    async def _run_with_langchain(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        """LangChain implementation (optional, enable with USE_LANGCHAIN=true)"""
-        # TODO: Implement LangChain version if needed
-        # Challenge: LangChain PromptTemplate can't handle literal JSON in prompts
-        # Solution: Would need to escape JSON examples or use different approach
-        raise NotImplementedError(
-            "LangChain mode not yet implemented for ChainRunner. "
-            "Set USE_LANGCHAIN=false in .env to use native OpenAI implementation."
+import asyncio
+from typing import Dict, Any, List
+from ...config import settings
+from ...models import Recipe
+from ..base_runner import BaseRunner
+from ..llm_gateway import chat_completion
+from ..call_log import phase
+from ..step_graph import step_id, step_prompt, step_dependencies, topological_levels
+from ..prompt_template import compile_template
+
+
+class ChainRunner(BaseRunner):
+    """Chain execution (steps run as their dependencies complete) with optional LangChain or native OpenAI support"""
+
+    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        if not recipe.workflow or recipe.workflow.type != "chain":
+            raise ValueError("Recipe must have workflow.type='chain'")
+
+        # Route to LangChain or native implementation based on config
+        if settings.use_langchain:
+            return await self._run_with_langchain(recipe, inputs)
+        else:
+            return await self._run_native(recipe, inputs)
+
+    async def _run_native(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Native OpenAI implementation (default, more reliable with JSON)"""
+        workflow = recipe.workflow
+        client = self.client
+        temperature = workflow.chain.temperature if workflow.chain and hasattr(workflow.chain, 'temperature') and workflow.chain.temperature is not None else 0.7
+
+        steps = workflow.chain.steps if workflow.chain else []
+        step_ids = [step_id(step, i) for i, step in enumerate(steps)]
+        if self.plan is not None:
+            dependencies, levels = self.plan.step_dependencies, self.plan.step_levels
+        else:
+            dependencies = step_dependencies(steps)
+            levels = topological_levels(dependencies)
+
+        # Shared by all steps; a step only starts once the outputs it reads are here
+        context = inputs.copy()
+        outputs: Dict[str, Any] = {}
+
+        async def run_step(i: int, step: Dict[str, Any]):
+            step_id = step_ids[i]
+            await asyncio.gather(*(tasks[dep] for dep in dependencies[step_id]))
+
+            step_system_prompt = step.get("system_prompt", "")
+            step_user_prompt = step_prompt(step)
+
+            # Step-specific additions go ahead of the profile, which varies per user
+            full_system_prompt = self.build_system_prompt(recipe.system_prompt or "", step_system_prompt)
+
+            # Replace template variables in user prompt; earlier step outputs (oldest first)
+            # give way if the prompt would overflow the context
+            placeholders = compile_template(step_user_prompt).placeholders
+            referenced = [key for key in context if key.startswith("step.") and key in placeholders]
+            user_prompt = self.render_prompt(step_user_prompt, context, full_system_prompt,
+                                             trim=referenced, render=str)
+
+            # Determine response format
+            response_format = self.response_format(f"{recipe.id}_{step_id}", step.get("response_schema"))
+
+            # Execute step
+            self.emit("step_started", step=step_id, index=i + 1, total=len(steps))
+            with phase(step=step_id):
+                response = await chat_completion(
+                    client,
+                    model=settings.openai_model,
+                    messages=[
+                        {"role": "system", "content": full_system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    response_format=response_format,
+                    temperature=temperature,
+                    cache=self.cache_enabled(recipe, step, temperature),
+                    coalesce=self.coalesce_enabled(recipe, step),
+                    # Only steps fed purely by user inputs are near-duplicate candidates
+                    cache_scope=f"{recipe.id}:{step_id}",
+                    semantic_text=None if "{step." in step_user_prompt else self.semantic_cache_text(inputs)
+                )
+
+            # Parse response
+            step_result = self.parse_response(response)
+            outputs[step_id] = step_result
+            self.emit("step_completed", step=step_id, index=i + 1, total=len(steps), output=step_result)
+
+            # Make step output available to dependent steps as step.{step_id}.output
+            context[f"step.{step_id}.output"] = step_result
+            if isinstance(step_result, dict):
+                # Also add individual keys for easier access
+                for key, value in step_result.items():
+                    context[f"step.{step_id}.{key}"] = value
+
+        # One task per step, created in dependency order so every step can await
+        # the tasks of the steps it depends on; independent steps overlap
+        tasks: Dict[str, asyncio.Task] = {}
+        by_id = dict(zip(step_ids, enumerate(steps)))
+        for level in levels:
+            for sid in level:
+                tasks[sid] = asyncio.create_task(run_step(*by_id[sid]))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        # Results in declaration order regardless of completion order
+        step_results = [{"step": sid, "output": outputs[sid]} for sid in step_ids]
+
+        # Prepare final result
+        final_output = step_results[-1]["output"] if step_results else {}
+
+        return {
+            "recipe_id": recipe.id,
+            "mode": "chain",
+            "output": final_output,
+            "steps": step_results,
+            "methodology": recipe.methodology if hasattr(recipe, 'methodology') and recipe.methodology else None,
+            "meta": {
+                "runner_type": "chain",
+                "total_steps": len(step_results),
+                "execution_mode": "native",
+                "step_levels": [list(level) for level in levels],
+                "max_parallel_steps": max((len(level) for level in levels), default=0)
+            }
+        }
+
+    async def _run_with_langchain(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """LangChain implementation (optional, enable with USE_LANGCHAIN=true)"""
+        # TODO: Implement LangChain version if needed
+        # Challenge: LangChain PromptTemplate can't handle literal JSON in prompts
+        # Solution: Would need to escape JSON examples or use different approach
+        raise NotImplementedError(
+            "LangChain mode not yet implemented for ChainRunner. "
+            "Set USE_LANGCHAIN=false in .env to use native OpenAI implementation."
         )
\ No newline at end of file
@@ -1,367 +1,549 @@
-import json
-import asyncio
-from typing import Dict, Any, List
-from openai import AsyncOpenAI
-from ...config import settings
-from ...models import Recipe
-from ..base_runner import BaseRunner
-
-MAX_CONCURRENT_CALLS = 5
-_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
-
-
-class IterativeRunner(BaseRunner):
-    """Enhanced version of current iterative system with state management and conditional execution"""
-    
-    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        if not recipe.iterative:
-            raise ValueError("Recipe must have iterative configuration")
-        
-        it = recipe.iterative
-        count = inputs.get("loops", it.default_loops)
-        if count > it.max_loops:
-            raise ValueError(f"Requested loops ({count}) exceed max_loops ({it.max_loops})")
-        
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
-        system_prompt = self.build_system_prompt(recipe.system_prompt or "")
-        
-        # Initialize state
-        state = it.initial_state.copy() if it.initial_state else {}
-        for k, v in list(state.items()):
-            if isinstance(v, str):
-                state[k] = self.safe_template_replace(v, inputs)
-        
-        history = []
-        
-        for i in range(1, count + 1):
-            # Check exit conditions
-            if await self._should_exit(state, it.get("exit_conditions", []), i):
-                break
-            
-            entry = {"loop": i, "substeps": []}
-            
-            if it.substeps:
-                # Multi-agent substeps
-                for si, sub in enumerate(it.substeps, start=1):
-                    role = sub.get("role", f"agent_{si}")
-                    
-                    # Check if this substep should be executed conditionally
-                    if not await self._should_execute_substep(sub, state, i):
-                        continue
-                    
-                    step_result = await self._execute_substep(
-                        client, system_prompt, sub, role, state, inputs, i, si, recipe, it
-                    )
-                    
-                    entry["substeps"].append({"role": role, "output": step_result})
-                    
-                    # Update state based on step result
-                    state = self._update_state(state, step_result, i, si)
-                
-                history.append(entry)
-            else:
-                # Single step per loop
-                step_result = await self._execute_single_step(
-                    client, system_prompt, it, state, inputs, i, recipe
-                )
-                
-                history.append(step_result)
-                state = self._update_state(state, step_result, i)
-        
-        # Run final synthesis if configured
-        final_synthesis_result = None
-        if it.final_synthesis and it.final_synthesis.get("enabled", False):
-            try:
-                final_synthesis_result = await self._run_final_synthesis(
-                    client, system_prompt, recipe, inputs, history, state
-                )
-            except Exception as e:
-                print(f"Error in final synthesis: {e}")
-        
-        result = {
-            "recipe_id": recipe.id,
-            "mode": "iterative",
-            "loops": len(history),
-            "history": history,
-            "final_state": state,
-            "methodology": recipe.methodology if hasattr(recipe, 'methodology') and recipe.methodology else None,
-            "meta": {"runner_type": "iterative"}
-        }
-        
-        if final_synthesis_result:
-            result["final_synthesis"] = final_synthesis_result
-        
-        # Add markdown rendering if configured
-        if recipe.ui_preferences and recipe.ui_preferences.get("render_as_markdown"):
-            result["markdown"] = self._render_markdown(history, final_synthesis_result)
-        
-        return result
-    
-    async def _should_exit(self, state: Dict[str, Any], exit_conditions: List[Dict[str, Any]], 
-                          loop_num: int) -> bool:
-        """Check if iteration should exit early based on conditions"""
-        for condition in exit_conditions:
-            condition_type = condition.get("type")
-            
-            if condition_type == "state_value":
-                key = condition.get("key")
-                value = condition.get("value")
-                if state.get(key) == value:
-                    return True
-            
-            elif condition_type == "max_loops":
-                max_val = condition.get("value", 10)
-                if loop_num >= max_val:
-                    return True
-            
-            # Add more condition types as needed
-        
-        return False
-    
-    async def _should_execute_substep(self, substep: Dict[str, Any], state: Dict[str, Any], 
-                                    loop_num: int) -> bool:
-        """Check if substep should be executed based on conditions"""
-        conditions = substep.get("conditions", [])
-        
-        for condition in conditions:
-            condition_type = condition.get("type")
-            
-            if condition_type == "state_exists":
-                key = condition.get("key")
-                if key not in state:
-                    return False
-            
-            elif condition_type == "loop_range":
-                min_loop = condition.get("min", 1)
-                max_loop = condition.get("max", float('inf'))
-                if not (min_loop <= loop_num <= max_loop):
-                    return False
-        
-        return True
-    
-    async def _execute_substep(self, client, system_prompt: str, substep: Dict[str, Any], 
-                             role: str, state: Dict[str, Any], inputs: Dict[str, Any], 
-                             loop_num: int, substep_num: int, recipe: Recipe, 
-                             it_config) -> Dict[str, Any]:
-        """Execute a single substep"""
-        prompt_template = substep.get("prompt", it_config.loop_prompt_template or "{state}")
-        guard = (it_config.language_guardrails + "\n\n") if it_config.language_guardrails else ""
-        
-        # Build prompt with context
-        loop_prompt = guard + prompt_template
-        context = {
-            **inputs,
-            "loop": str(loop_num),
-            "state": json.dumps(state, ensure_ascii=False),
-            "params": json.dumps(inputs, ensure_ascii=False),
-            "role": role
-        }
-        loop_prompt = self.safe_template_replace(loop_prompt, context)
-        
-        # Determine response format
-        response_format = {"type": "json_object"}
-        schema = substep.get("schema")
-        if not schema and substep_num == len(it_config.substeps or []) and it_config.step_response_schema:
-            schema = it_config.step_response_schema
-        
-        if schema:
-            response_format = {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": f"{recipe.id}_sub_{substep_num}",
-                    "schema": schema,
-                    "strict": True
-                }
-            }
-        
-        async with _semaphore:
-            response = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": loop_prompt}
-                ],
-                response_format=response_format
-            )
-        
-        return json.loads(response.choices[0].message.content)
-    
-    async def _execute_single_step(self, client, system_prompt: str, it_config, 
-                                 state: Dict[str, Any], inputs: Dict[str, Any], 
-                                 loop_num: int, recipe: Recipe) -> Dict[str, Any]:
-        """Execute a single iteration step"""
-        guard = (it_config.language_guardrails + "\n\n") if it_config.language_guardrails else ""
-        loop_prompt = guard + (it_config.loop_prompt_template or "{state}")
-        
-        context = {
-            **inputs,
-            "loop": str(loop_num),
-            "state": json.dumps(state, ensure_ascii=False),
-            "params": json.dumps(inputs, ensure_ascii=False)
-        }
-        loop_prompt = self.safe_template_replace(loop_prompt, context)
-        
-        response_format = {"type": "json_object"}
-        if it_config.step_response_schema:
-            response_format = {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": f"{recipe.id}_step",
-                    "schema": it_config.step_response_schema,
-                    "strict": True
-                }
-            }
-        
-        async with _semaphore:
-            response = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": loop_prompt}
-                ],
-                response_format=response_format
-            )
-        
-        return json.loads(response.choices[0].message.content)
-    
-    def _update_state(self, state: Dict[str, Any], step_result: Dict[str, Any], 
-                     loop_num: int, substep_num: int = None) -> Dict[str, Any]:
-        """Update state based on step result"""
-        if isinstance(step_result, dict) and "next_state" in step_result:
-            if isinstance(step_result["next_state"], dict):
-                return step_result["next_state"]
-        
-        # Fallback: add step result to state
-        key = f"loop_{loop_num}"
-        if substep_num is not None:
-            key += f"_sub_{substep_num}"
-        
-        return {**state, key: step_result}
-    
-    async def _run_final_synthesis(self, client, system_prompt: str, recipe: Recipe, 
-                                 inputs: Dict[str, Any], history: List[Dict[str, Any]], 
-                                 final_state: Dict[str, Any]) -> Dict[str, Any]:
-        """Run final synthesis to consolidate all iterations"""
-        synthesis_config = recipe.iterative.final_synthesis
-        
-        # Create iteration summary
-        iteration_summary = self._create_iteration_summary(history)
-        
-        # Format synthesis prompt
-        synthesis_prompt = synthesis_config["prompt"]
-        context = {
-            **inputs,
-            "iteration_summary": iteration_summary,
-            "final_state": json.dumps(final_state, ensure_ascii=False)
-        }
-        synthesis_prompt = self.safe_template_replace(synthesis_prompt, context)
-        
-        # Determine response format
-        response_format = {"type": "json_object"}
-        if "response_schema" in synthesis_config:
-            response_format = {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": f"{recipe.id}_final_synthesis",
-                    "schema": synthesis_config["response_schema"],
-                    "strict": True
-                }
-            }
-        
-        async with _semaphore:
-            response = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": synthesis_prompt}
-                ],
-                response_format=response_format
-            )
-        
-        return json.loads(response.choices[0].message.content)
-    
-    def _create_iteration_summary(self, history: List[Dict[str, Any]]) -> str:
-        """Create summary of all iterations"""
-        summary = ""
-        for i, entry in enumerate(history, 1):
-            summary += f"\n--- Iteration {i} ---\n"
-            
-            if "substeps" in entry:
-                for substep in entry.get("substeps", []):
-                    role = substep.get("role", "Agent")
-                    output = substep.get("output", {})
-                    
-                    if isinstance(output, dict):
-                        content_parts = []
-                        for key, value in output.items():
-                            if key != "next_state" and value:
-                                if isinstance(value, list):
-                                    for item in value:
-                                        if isinstance(item, dict) and "title" in item:
-                                            content_parts.append(f"{item.get('title', '')}: {item.get('why', item.get('description', ''))}")
-                                        else:
-                                            content_parts.append(str(item))
-                                else:
-                                    content_parts.append(str(value))
-                        
-                        content = "; ".join(content_parts) if content_parts else json.dumps(output, ensure_ascii=False)[:200]
-                        summary += f"🔸 {role}: {content}\n"
-                    else:
-                        summary += f"🔸 {role}: {str(output)[:200]}\n"
-            else:
-                summary += f"🔸 Result: {json.dumps(entry, ensure_ascii=False)[:200]}\n"
-        
-        return summary
-    
-    def _render_markdown(self, history: List[Dict[str, Any]], 
-                        final_synthesis: Dict[str, Any] = None) -> str:
-        """Render iterations as markdown"""
-        lines = []
-        
-        for entry in history:
-            loop_no = entry.get("loop")
-            lines.append(f"## 🧩 Loop {loop_no}")
-            
-            substeps = entry.get("substeps", [])
-            for step in substeps:
-                role = step.get("role", "Agent")
-                out = step.get("output", {})
-                
-                # Special rendering for debate format
-                if role.lower().startswith("optimist") and isinstance(out, dict) and "proposals" in out:
-                    for p in out.get("proposals", []):
-                        title = p.get("title", "Idea")
-                        why = p.get("why", "")
-                        lines.append(f"### 🟢 {role}\n**Proposal:** *{title}*\n> {why}\n")
-                elif role.lower().startswith("skeptic") and isinstance(out, dict) and "critiques" in out:
-                    for c in out.get("critiques", []):
-                        target = c.get("target", "")
-                        risk = c.get("risk", c.get("issue", ""))
-                        evidence = c.get("evidence", "")
-                        ev_text = f" (evidence: {evidence})" if evidence else ""
-                        lines.append(f"### 🔴 {role}\n**Critique:** *{target}*\n> {risk}{ev_text}\n")
-                elif role.lower().startswith("mediator") and isinstance(out, dict) and "synthesis" in out:
-                    for s in out.get("synthesis", []):
-                        direction = s.get("direction", "Synthesis")
-                        trade_off = s.get("trade_off", "")
-                        lines.append(f"### ⚪ {role}\n**Synthesis:** *{direction}*\n> Trade-off: {trade_off}\n")
-                else:
-                    snippet = json.dumps(out, ensure_ascii=False, indent=2)
-                    lines.append(f"### {role}\n```\n{snippet}\n```\n")
-                
-                lines.append("---")
-        
-        # Add final synthesis if available
-        if final_synthesis:
-            lines.append("\n## 🎯 Final Synthesis\n")
-            if "executive_summary" in final_synthesis:
-                lines.append(f"### Executive Summary\n{final_synthesis['executive_summary']}\n")
-            
-            if "validated_opportunities" in final_synthesis:
-                lines.append("### 💡 Validated Opportunities")
-                for opp in final_synthesis["validated_opportunities"]:
-                    lines.append(f"**{opp.get('title', 'Opportunity')}**")
-                    lines.append(f"*Rationale:* {opp.get('rationale', '')}")
-                    lines.append(f"*Risks:* {opp.get('risks', '')}\n")
-        
+import asyncio
+import json
+import math
+from typing import Dict, Any, List, Optional, Tuple
+from ...config import settings
+from ...models import Recipe, CompactionConfig
+from ..base_runner import BaseRunner
+from ..llm_gateway import chat_completion
+from ..call_log import phase
+from ..prompt_template import compile_template
+from ..state_compaction import (EARLIER_LOOPS_KEY, approx_tokens, split_evictable, fold_digest,
+                                trim_to_budget, bound_iteration_summary)
+
+# Temperature spread of generic tracks requested with `tracks: K`
+TRACK_TEMPERATURES = (0.5, 1.0)
+
+DEFAULT_SUMMARIZER_PROMPT = (
+    "Summary of earlier debate loops so far: {summary}\n\n"
+    "Older loop results to fold in: {evicted}\n\n"
+    "Update the summary with the key proposals, risks and decisions from these results, in under 200 words. "
+    'Return JSON: {"summary": "..."}'
+)
+
+
+def substep_schema(it_config, substep: Dict[str, Any], substep_num: int) -> Optional[Dict[str, Any]]:
+    """A substep's own schema; the last substep falls back to step_response_schema"""
+    schema = substep.get("schema")
+    if not schema and substep_num == len(it_config.substeps or []) and it_config.step_response_schema:
+        schema = it_config.step_response_schema
+    return schema
+
+
+class IterativeRunner(BaseRunner):
+    """Enhanced version of current iterative system with state management and conditional execution"""
+    
+    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        if not recipe.iterative:
+            raise ValueError("Recipe must have iterative configuration")
+        
+        it = recipe.iterative
+        count = inputs.get("loops", it.default_loops)
+        if count > it.max_loops:
+            raise ValueError(f"Requested loops ({count}) exceed max_loops ({it.max_loops})")
+        
+        client = self.client
+        system_prompt = self.build_system_prompt(recipe.system_prompt or "")
+        self._compaction_stats = {"compactions": 0, "evicted_keys": 0, "summarized": 0, "summary_trimmed": False}
+        
+        # Initialize state
+        state = it.initial_state.copy() if it.initial_state else {}
+        for k, v in list(state.items()):
+            if isinstance(v, str):
+                state[k] = self.safe_template_replace(v, inputs)
+        
+        tracks = self._resolve_tracks(it, inputs, count)
+        if tracks:
+            # Independent debate threads run concurrently, each from the initial state
+            async def run_track(track: Dict[str, Any]):
+                with phase(step="track", branch=track["name"]):
+                    return await self._run_loops(client, self._loop_system_prompt(recipe, it, track), recipe,
+                                                 it, inputs, dict(state), track["loops"], track)
+
+            outcomes = await asyncio.gather(*(run_track(track) for track in tracks))
+            history = [entry for track_history, _ in outcomes for entry in track_history]
+            state = {track["name"]: track_state for track, (_, track_state) in zip(tracks, outcomes)}
+        else:
+            history, state = await self._run_loops(client, self._loop_system_prompt(recipe, it), recipe,
+                                                   it, inputs, state, count)
+        
+        # Run final synthesis if configured
+        final_synthesis_result = None
+        if it.final_synthesis and it.final_synthesis.get("enabled", False):
+            try:
+                self.emit("synthesis_started")
+                with phase(step="final_synthesis"):
+                    final_synthesis_result = await self._run_final_synthesis(
+                        client, system_prompt, recipe, inputs, history, state
+                    )
+                self.emit("synthesis_completed", output=final_synthesis_result)
+            except Exception as e:
+                print(f"Error in final synthesis: {e}")
+        
+        result = {
+            "recipe_id": recipe.id,
+            "mode": "iterative",
+            "loops": len(history),
+            "history": history,
+            "final_state": state,
+            "methodology": recipe.methodology if hasattr(recipe, 'methodology') and recipe.methodology else None,
+            "meta": {"runner_type": "iterative"}
+        }
+        if tracks:
+            result["tracks"] = [
+                {"name": track["name"], "loops": sum(1 for entry in history if entry.get("track") == track["name"])}
+                for track in tracks
+            ]
+            result["meta"]["tracks"] = len(tracks)
+        if self._compaction_stats["compactions"] or self._compaction_stats["summary_trimmed"]:
+            result["meta"]["compaction"] = self._compaction_stats
+        
+        if final_synthesis_result:
+            result["final_synthesis"] = final_synthesis_result
+        
+        # Add markdown rendering if configured
+        if recipe.ui_preferences and recipe.ui_preferences.get("render_as_markdown"):
+            result["markdown"] = self._render_markdown(history, final_synthesis_result)
+        
+        return result
+    
+    async def _run_loops(self, client, system_prompt: str, recipe: Recipe, it, inputs: Dict[str, Any],
+                         state: Dict[str, Any], count: int,
+                         track: Optional[Dict[str, Any]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Run up to `count` loops from `state`; returns (history, final state)"""
+        # In tracks mode every entry and event says which track produced it
+        labels = {"track": track["name"]} if track else {}
+        history = []
+        
+        for i in range(1, count + 1):
+            # Check exit conditions
+            if await self._should_exit(state, it.exit_conditions or [], i):
+                break
+            
+            entry = {"loop": i, **labels, "substeps": []}
+            self.emit("loop_started", loop=i, total=count, **labels)
+            
+            if it.substeps:
+                # Multi-agent substeps
+                with phase(loop=i):
+                    for si, sub in enumerate(it.substeps, start=1):
+                        role = sub.get("role", f"agent_{si}")
+                        
+                        # Check if this substep should be executed conditionally
+                        if not await self._should_execute_substep(sub, state, i):
+                            continue
+                        
+                        with phase(substep=role, step=role):
+                            step_result = await self._execute_substep(
+                                client, system_prompt, sub, role, state, inputs, i, si, recipe, it, track
+                            )
+                        
+                        entry["substeps"].append({"role": role, "output": step_result})
+                        self.emit("substep_completed", loop=i, substep=si, role=role, output=step_result, **labels)
+                        
+                        # Update state based on step result
+                        state = self._update_state(state, step_result, i, si)
+                        state = await self._compact_state(client, system_prompt, recipe, it, inputs, state)
+                
+                history.append(entry)
+                self.emit("loop_completed", loop=i, total=count, **labels)
+            else:
+                # Single step per loop
+                with phase(loop=i, step="iteration"):
+                    step_result = await self._execute_single_step(
+                        client, system_prompt, it, state, inputs, i, recipe, track
+                    )
+                
+                history.append({"loop": i, **labels, **step_result} if labels and isinstance(step_result, dict) else step_result)
+                state = self._update_state(state, step_result, i)
+                state = await self._compact_state(client, system_prompt, recipe, it, inputs, state)
+                self.emit("loop_completed", loop=i, total=count, output=step_result, **labels)
+        
+        return history, state
+    
+    def _resolve_tracks(self, it, inputs: Dict[str, Any], count: int) -> List[Dict[str, Any]]:
+        """
+        Debate tracks for this run: the recipe's `tracks`, or `tracks: K` in the params
+        for K generic tracks (different seeds, temperatures spread over TRACK_TEMPERATURES).
+        Each track runs `loops` loops, by default the requested loops split between tracks.
+        No tracks (the default) means a single sequential thread.
+        """
+        requested = inputs.get("tracks")
+        configured = it.tracks or []
+        if requested is None and not configured:
+            return []
+        k = int(requested) if requested is not None else len(configured)
+        if k > it.max_tracks:
+            raise ValueError(f"Requested tracks ({k}) exceed max_tracks ({it.max_tracks})")
+        if k <= 1 and not configured:
+            return []
+        
+        low, high = TRACK_TEMPERATURES
+        tracks = []
+        for n in range(k):
+            track = dict(configured[n]) if n < len(configured) else {
+                "seed": n + 1,
+                "temperature": round(low + (high - low) * n / max(k - 1, 1), 2)
+            }
+            track.setdefault("name", f"track_{n + 1}")
+            track.setdefault("loops", max(1, math.ceil(count / k)))
+            if track["loops"] > it.max_loops:
+                raise ValueError(f"Track {track['name']} loops ({track['loops']}) exceed max_loops ({it.max_loops})")
+            tracks.append(track)
+        return tracks
+    
+    async def _should_exit(self, state: Dict[str, Any], exit_conditions: List[Dict[str, Any]], 
+                          loop_num: int) -> bool:
+        """Check if iteration should exit early based on conditions"""
+        for condition in exit_conditions:
+            condition_type = condition.get("type")
+            
+            if condition_type == "state_value":
+                key = condition.get("key")
+                value = condition.get("value")
+                if state.get(key) == value:
+                    return True
+            
+            elif condition_type == "max_loops":
+                max_val = condition.get("value", 10)
+                if loop_num >= max_val:
+                    return True
+            
+            # Add more condition types as needed
+        
+        return False
+    
+    async def _should_execute_substep(self, substep: Dict[str, Any], state: Dict[str, Any], 
+                                    loop_num: int) -> bool:
+        """Check if substep should be executed based on conditions"""
+        conditions = substep.get("conditions", [])
+        
+        for condition in conditions:
+            condition_type = condition.get("type")
+            
+            if condition_type == "state_exists":
+                key = condition.get("key")
+                if key not in state:
+                    return False
+            
+            elif condition_type == "loop_range":
+                min_loop = condition.get("min", 1)
+                max_loop = condition.get("max", float('inf'))
+                if not (min_loop <= loop_num <= max_loop):
+                    return False
+        
+        return True
+    
+    async def _execute_substep(self, client, system_prompt: str, substep: Dict[str, Any], 
+                             role: str, state: Dict[str, Any], inputs: Dict[str, Any], 
+                             loop_num: int, substep_num: int, recipe: Recipe, 
+                             it_config, track: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute a single substep"""
+        prompt_template = substep.get("prompt", it_config.loop_prompt_template or "{state}")
+        
+        # Build prompt with context
+        loop_prompt = self._dynamic_guardrails(it_config) + prompt_template
+        context = {
+            **inputs,
+            "loop": str(loop_num),
+            "state": state,
+            "params": json.dumps(inputs, ensure_ascii=False),
+            "role": role
+        }
+        loop_prompt = self.render_prompt(loop_prompt, context, system_prompt, trim=["state"])
+        
+        # Determine response format
+        response_format = self.response_format(f"{recipe.id}_sub_{substep_num}",
+                                               substep_schema(it_config, substep, substep_num))
+        
+        response = await chat_completion(
+            client,
+            model=settings.openai_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": loop_prompt}
+            ],
+            response_format=response_format,
+            cache=self.cache_enabled(recipe, substep),
+            coalesce=self.coalesce_enabled(recipe, substep),
+            cache_scope=f"{recipe.id}:sub_{substep_num}",
+            **self._track_sampling(track)
+        )
+        
+        return self.parse_response(response)
+    
+    async def _execute_single_step(self, client, system_prompt: str, it_config, 
+                                 state: Dict[str, Any], inputs: Dict[str, Any], 
+                                 loop_num: int, recipe: Recipe,
+                                 track: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Execute a single iteration step"""
+        loop_prompt = self._dynamic_guardrails(it_config) + (it_config.loop_prompt_template or "{state}")
+        
+        context = {
+            **inputs,
+            "loop": str(loop_num),
+            "state": state,
+            "params": json.dumps(inputs, ensure_ascii=False)
+        }
+        loop_prompt = self.render_prompt(loop_prompt, context, system_prompt, trim=["state"])
+        
+        response_format = self.response_format(f"{recipe.id}_step", it_config.step_response_schema)
+        
+        response = await chat_completion(
+            client,
+            model=settings.openai_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": loop_prompt}
+            ],
+            response_format=response_format,
+            cache=self.cache_enabled(recipe),
+            coalesce=self.coalesce_enabled(recipe),
+            cache_scope=f"{recipe.id}:step",
+            **self._track_sampling(track)
+        )
+        
+        return self.parse_response(response)
+    
+    def _loop_system_prompt(self, recipe: Recipe, it, track: Optional[Dict[str, Any]] = None) -> str:
+        """
+        System prompt of the loop calls: guardrails and track framing stay the same for every
+        loop, so they extend the cacheable prefix instead of heading each user message
+        """
+        guardrails = None if self._dynamic_guardrails(it) else it.language_guardrails
+        return self.build_system_prompt(recipe.system_prompt or "", guardrails, self._track_framing(track))
+
+    def _dynamic_guardrails(self, it) -> str:
+        """Guardrails that use loop placeholders ({state}, {role}, ...) are rendered into each loop prompt"""
+        if it.language_guardrails and compile_template(it.language_guardrails).names:
+            return it.language_guardrails + "\n\n"
+        return ""
+
+    def _track_framing(self, track: Optional[Dict[str, Any]]) -> str:
+        """Instructions giving a track its own angle on the problem"""
+        if not track or not track.get("framing"):
+            return ""
+        return f"Debate track {track['name']}: {track['framing']}"
+    
+    def _track_sampling(self, track: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Per-track temperature/seed request arguments (none outside tracks mode)"""
+        if not track:
+            return {}
+        return {key: track[key] for key in ("temperature", "seed") if track.get(key) is not None}
+    
+    def _compaction_budgets(self, it) -> Tuple[int, int]:
+        """(max state tokens, max iteration summary tokens): recipe compaction config over settings"""
+        policy = it.compaction
+        state_budget = policy.max_state_tokens if policy and policy.max_state_tokens is not None \
+            else settings.iterative_state_max_tokens
+        summary_budget = policy.max_summary_tokens if policy and policy.max_summary_tokens is not None \
+            else settings.iterative_summary_max_tokens
+        return state_budget, summary_budget
+    
+    async def _compact_state(self, client, system_prompt: str, recipe: Recipe, it,
+                             inputs: Dict[str, Any], state: Dict[str, Any]) -> Dict[str, Any]:
+        """Bring the state back under its token budget once loop results have piled up in it"""
+        budget, _ = self._compaction_budgets(it)
+        if not budget or approx_tokens(state) <= budget:
+            return state
+        
+        policy = it.compaction or CompactionConfig()
+        kept, evicted = split_evictable(state, policy.keep_recent_loops)
+        stats = self._compaction_stats
+        stats["compactions"] += 1
+        stats["evicted_keys"] += len(evicted)
+        
+        if evicted and policy.summarizer:
+            try:
+                with phase(step="state_compaction"):
+                    summary = await self._summarize_evicted(client, system_prompt, recipe, policy.summarizer,
+                                                            inputs, kept, evicted)
+                kept = {**kept, EARLIER_LOOPS_KEY: summary}
+                stats["summarized"] += 1
+            except Exception as e:
+                print(f"⚠️ State summarizer failed, truncating instead: {e}")
+                kept = fold_digest(kept, evicted, budget)
+        elif evicted:
+            kept = fold_digest(kept, evicted, budget)
+        
+        return trim_to_budget(kept, budget)
+    
+    async def _summarize_evicted(self, client, system_prompt: str, recipe: Recipe, summarizer: Dict[str, Any],
+                                 inputs: Dict[str, Any], kept: Dict[str, Any],
+                                 evicted: List[Tuple[str, Any]]) -> str:
+        """Configured summarizer step: fold evicted loop results into the running summary"""
+        context = {
+            **inputs,
+            "summary": str(kept.get(EARLIER_LOOPS_KEY, "")),
+            "evicted": json.dumps(dict(evicted), ensure_ascii=False),
+            "state": json.dumps({k: v for k, v in kept.items() if k != EARLIER_LOOPS_KEY}, ensure_ascii=False)
+        }
+        prompt = self.safe_template_replace(summarizer.get("prompt", DEFAULT_SUMMARIZER_PROMPT), context)
+        
+        response_format = self.response_format(f"{recipe.id}_state_summary", summarizer.get("schema"))
+        
+        response = await chat_completion(
+            client,
+            model=settings.openai_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            response_format=response_format,
+            cache=self.cache_enabled(recipe, summarizer),
+            coalesce=self.coalesce_enabled(recipe, summarizer),
+            cache_scope=f"{recipe.id}:state_summary"
+        )
+        
+        output = self.parse_response(response)
+        if isinstance(output, dict) and isinstance(output.get("summary"), str):
+            return output["summary"]
+        return json.dumps(output, ensure_ascii=False)
+    
+    def _update_state(self, state: Dict[str, Any], step_result: Dict[str, Any], 
+                     loop_num: int, substep_num: int = None) -> Dict[str, Any]:
+        """Update state based on step result"""
+        if isinstance(step_result, dict) and "next_state" in step_result:
+            if isinstance(step_result["next_state"], dict):
+                return step_result["next_state"]
+        
+        # Fallback: add step result to state
+        key = f"loop_{loop_num}"
+        if substep_num is not None:
+            key += f"_sub_{substep_num}"
+        
+        return {**state, key: step_result}
+    
+    async def _run_final_synthesis(self, client, system_prompt: str, recipe: Recipe, 
+                                 inputs: Dict[str, Any], history: List[Dict[str, Any]], 
+                                 final_state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run final synthesis to consolidate all iterations"""
+        synthesis_config = recipe.iterative.final_synthesis
+        
+        # Create iteration summary
+        iteration_summary = self._create_iteration_summary(history, self._compaction_budgets(recipe.iterative)[1])
+        
+        # Format synthesis prompt
+        synthesis_prompt = synthesis_config["prompt"]
+        context = {
+            **inputs,
+            "iteration_summary": iteration_summary,
+            "final_state": final_state
+        }
+        synthesis_prompt = self.render_prompt(synthesis_prompt, context, system_prompt,
+                                              trim=["final_state", "iteration_summary"])
+        
+        # Determine response format
+        response_format = self.response_format(f"{recipe.id}_final_synthesis",
+                                               synthesis_config.get("response_schema"))
+        
+        response = await chat_completion(
+            client,
+            model=settings.openai_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": synthesis_prompt}
+            ],
+            response_format=response_format,
+            cache=self.cache_enabled(recipe, synthesis_config),
+            coalesce=self.coalesce_enabled(recipe, synthesis_config)
+        )
+        
+        return self.parse_response(response)
+    
+    def _create_iteration_summary(self, history: List[Dict[str, Any]], max_tokens: int = 0) -> str:
+        """Create summary of all iterations, condensing the oldest ones beyond `max_tokens`"""
+        blocks = []
+        for i, entry in enumerate(history, 1):
+            summary = ""
+            if "track" in entry:
+                summary += f"\n--- Track {entry['track']}, iteration {entry.get('loop', i)} ---\n"
+            else:
+                summary += f"\n--- Iteration {i} ---\n"
+            
+            if "substeps" in entry:
+                for substep in entry.get("substeps", []):
+                    role = substep.get("role", "Agent")
+                    output = substep.get("output", {})
+                    
+                    if isinstance(output, dict):
+                        content_parts = []
+                        for key, value in output.items():
+                            if key != "next_state" and value:
+                                if isinstance(value, list):
+                                    for item in value:
+                                        if isinstance(item, dict) and "title" in item:
+                                            content_parts.append(f"{item.get('title', '')}: {item.get('why', item.get('description', ''))}")
+                                        else:
+                                            content_parts.append(str(item))
+                                else:
+                                    content_parts.append(str(value))
+                        
+                        content = "; ".join(content_parts) if content_parts else json.dumps(output, ensure_ascii=False)[:200]
+                        summary += f"🔸 {role}: {content}\n"
+                    else:
+                        summary += f"🔸 {role}: {str(output)[:200]}\n"
+            else:
+                summary += f"🔸 Result: {json.dumps(entry, ensure_ascii=False)[:200]}\n"
+            blocks.append((entry["loop"] if isinstance(entry.get("loop"), int) else i, summary))
+        
+        summary = bound_iteration_summary(blocks, max_tokens)
+        if max_tokens and len(summary) < sum(len(text) for _, text in blocks):
+            self._compaction_stats["summary_trimmed"] = True
+        return summary
+    
+    def _render_markdown(self, history: List[Dict[str, Any]], 
+                        final_synthesis: Dict[str, Any] = None) -> str:
+        """Render iterations as markdown"""
+        lines = []
+        
+        for entry in history:
+            loop_no = entry.get("loop")
+            if "track" in entry:
+                lines.append(f"## 🧩 Track {entry['track']} · Loop {loop_no}")
+            else:
+                lines.append(f"## 🧩 Loop {loop_no}")
+            
+            substeps = entry.get("substeps", [])
+            for step in substeps:
+                role = step.get("role", "Agent")
+                out = step.get("output", {})
+                
+                # Special rendering for debate format
+                if role.lower().startswith("optimist") and isinstance(out, dict) and "proposals" in out:
+                    for p in out.get("proposals", []):
+                        title = p.get("title", "Idea")
+                        why = p.get("why", "")
+                        lines.append(f"### 🟢 {role}\n**Proposal:** *{title}*\n> {why}\n")
+                elif role.lower().startswith("skeptic") and isinstance(out, dict) and "critiques" in out:
+                    for c in out.get("critiques", []):
+                        target = c.get("target", "")
+                        risk = c.get("risk", c.get("issue", ""))
+                        evidence = c.get("evidence", "")
+                        ev_text = f" (evidence: {evidence})" if evidence else ""
+                        lines.append(f"### 🔴 {role}\n**Critique:** *{target}*\n> {risk}{ev_text}\n")
+                elif role.lower().startswith("mediator") and isinstance(out, dict) and "synthesis" in out:
+                    for s in out.get("synthesis", []):
+                        direction = s.get("direction", "Synthesis")
+                        trade_off = s.get("trade_off", "")
+                        lines.append(f"### ⚪ {role}\n**Synthesis:** *{direction}*\n> Trade-off: {trade_off}\n")
+                else:
+                    snippet = json.dumps(out, ensure_ascii=False, indent=2)
+                    lines.append(f"### {role}\n```\n{snippet}\n```\n")
+                
+                lines.append("---")
+        
+        # Add final synthesis if available
+        if final_synthesis:
+            lines.append("\n## 🎯 Final Synthesis\n")
+            if "executive_summary" in final_synthesis:
+                lines.append(f"### Executive Summary\n{final_synthesis['executive_summary']}\n")
+            
+            if "validated_opportunities" in final_synthesis:
+                lines.append("### 💡 Validated Opportunities")
+                for opp in final_synthesis["validated_opportunities"]:
+                    lines.append(f"**{opp.get('title', 'Opportunity')}**")
+                    lines.append(f"*Rationale:* {opp.get('rationale', '')}")
+                    lines.append(f"*Risks:* {opp.get('risks', '')}\n")
+        
         return "\n".join(lines)
\ No newline at end of file
@@ -1,193 +1,221 @@
-import json
-import asyncio
-from typing import Dict, Any, List
-from openai import AsyncOpenAI
-from ...config import settings
-from ...models import Recipe
-from ..base_runner import BaseRunner
-
-MAX_CONCURRENT_CALLS = 5
-_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
-
-
-class OrchestratorRunner(BaseRunner):
-    """Planner→Workers→Synthesizer pattern with dynamic worker allocation"""
-    
-    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        if not recipe.workflow or recipe.workflow.type != "orchestrator":
-            raise ValueError("Recipe must have workflow.type='orchestrator'")
-        
-        workflow = recipe.workflow
-        orchestrator_config = workflow.orchestrator
-        
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
-        system_prompt = self.build_system_prompt(recipe.system_prompt or "")
-        
-        # Phase 1: Planning
-        plan = await self._run_planner(client, system_prompt, orchestrator_config, inputs, recipe)
-        
-        # Phase 2: Worker execution (parallel)
-        worker_results = await self._run_workers(client, system_prompt, orchestrator_config, 
-                                                plan, inputs, recipe)
-        
-        # Phase 3: Synthesis
-        synthesis = await self._run_synthesizer(client, system_prompt, orchestrator_config, 
-                                              plan, worker_results, inputs, recipe)
-        
-        return {
-            "recipe_id": recipe.id,
-            "mode": "orchestrator",
-            "output": synthesis,
-            "plan": plan,
-            "worker_results": worker_results,
-            "meta": {
-                "runner_type": "orchestrator",
-                "workers_executed": len(worker_results)
-            }
-        }
-    
-    async def _run_planner(self, client, system_prompt: str, config: Dict[str, Any], 
-                          inputs: Dict[str, Any], recipe: Recipe) -> Dict[str, Any]:
-        """Run planner to determine work allocation"""
-        planner_config = config.get("planner", {})
-        planner_prompt = self.safe_template_replace(planner_config.get("prompt", ""), inputs)
-        
-        response_format = {"type": "json_object"}
-        if planner_config.get("schema"):
-            response_format = {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": f"{recipe.id}_plan",
-                    "schema": planner_config["schema"],
-                    "strict": True
-                }
-            }
-        
-        async with _semaphore:
-            response = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": planner_prompt}
-                ],
-                response_format=response_format
-            )
-        
-        return json.loads(response.choices[0].message.content)
-    
-    async def _run_workers(self, client, system_prompt: str, config: Dict[str, Any], 
-                          plan: Dict[str, Any], inputs: Dict[str, Any], 
-                          recipe: Recipe) -> List[Dict[str, Any]]:
-        """Execute workers in parallel based on plan"""
-        workers_config = config.get("workers", {})
-        
-        # Determine workers to execute based on plan
-        workers_to_run = self._determine_workers(plan, workers_config)
-        
-        async def execute_worker(worker_spec: Dict[str, Any]) -> Dict[str, Any]:
-            worker_name = worker_spec.get("name", "worker")
-            worker_prompt = worker_spec.get("prompt", "")
-            
-            # Build context for worker
-            context = {
-                **inputs,
-                "plan": json.dumps(plan, ensure_ascii=False),
-                "worker_context": json.dumps(worker_spec.get("context", {}), ensure_ascii=False)
-            }
-            worker_prompt = self.safe_template_replace(worker_prompt, context)
-            
-            response_format = {"type": "json_object"}
-            if worker_spec.get("schema"):
-                response_format = {
-                    "type": "json_schema",
-                    "json_schema": {
-                        "name": f"{recipe.id}_{worker_name}",
-                        "schema": worker_spec["schema"],
-                        "strict": True
-                    }
-                }
-            
-            async with _semaphore:
-                response = await client.chat.completions.create(
-                    model=settings.openai_model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": worker_prompt}
-                    ],
-                    response_format=response_format,
-                    temperature=worker_spec.get("temperature", 0.7)
-                )
-            
-            return {
-                "worker": worker_name,
-                "output": json.loads(response.choices[0].message.content),
-                "context": worker_spec.get("context", {})
-            }
-        
-        # Execute all workers in parallel
-        worker_results = await asyncio.gather(*[execute_worker(worker) for worker in workers_to_run])
-        return worker_results
-    
-    async def _run_synthesizer(self, client, system_prompt: str, config: Dict[str, Any], 
-                             plan: Dict[str, Any], worker_results: List[Dict[str, Any]], 
-                             inputs: Dict[str, Any], recipe: Recipe) -> Dict[str, Any]:
-        """Synthesize worker results into final output"""
-        synthesizer_config = config.get("synthesizer", {})
-        synthesizer_prompt = synthesizer_config.get("prompt", "")
-        
-        # Build context for synthesizer
-        context = {
-            **inputs,
-            "plan": json.dumps(plan, ensure_ascii=False),
-            "worker_results": json.dumps(worker_results, ensure_ascii=False)
-        }
-        synthesizer_prompt = self.safe_template_replace(synthesizer_prompt, context)
-        
-        response_format = {"type": "json_object"}
-        if synthesizer_config.get("schema"):
-            response_format = {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": f"{recipe.id}_synthesis",
-                    "schema": synthesizer_config["schema"],
-                    "strict": True
-                }
-            }
-        
-        async with _semaphore:
-            response = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": synthesizer_prompt}
-                ],
-                response_format=response_format
-            )
-        
-        return json.loads(response.choices[0].message.content)
-    
-    def _determine_workers(self, plan: Dict[str, Any], workers_config: Dict[str, Any]) -> List[Dict[str, Any]]:
-        """Determine which workers to execute based on plan"""
-        workers_to_run = []
-        
-        # Check if plan specifies workers directly
-        if "workers" in plan:
-            planned_workers = plan["workers"]
-            available_workers = workers_config.get("available", [])
-            
-            for planned_worker in planned_workers:
-                worker_name = planned_worker.get("name") if isinstance(planned_worker, dict) else planned_worker
-                
-                # Find matching worker template
-                for worker_template in available_workers:
-                    if worker_template.get("name") == worker_name:
-                        worker_spec = worker_template.copy()
-                        if isinstance(planned_worker, dict):
-                            worker_spec["context"] = planned_worker.get("context", {})
-                        workers_to_run.append(worker_spec)
-                        break
-        else:
-            # Use default workers if no specific plan
-            workers_to_run = workers_config.get("default", workers_config.get("available", []))
-        
-        return workers_to_run
\ No newline at end of file
+import json
+import asyncio
+import contextvars
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from ...config import settings
+from ...models import Recipe
+from ..base_runner import BaseRunner
+from ..llm_gateway import chat_completion, chat_completion_stream
+from ..call_log import phase
+from ..hedging import Hedger
+from ..json_stream import JsonArrayStream
+
+
+class OrchestratorRunner(BaseRunner):
+    """Planner→Workers→Synthesizer pattern with dynamic worker allocation"""
+    
+    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        if not recipe.workflow or recipe.workflow.type != "orchestrator":
+            raise ValueError("Recipe must have workflow.type='orchestrator'")
+        
+        workflow = recipe.workflow
+        # Phase helpers read the config as a plain dict (dumped once by the recipe's plan)
+        orchestrator_config = self.plan.config if self.plan is not None else workflow.orchestrator.model_dump()
+        
+        client = self.client
+        system_prompt = self.build_system_prompt(recipe.system_prompt or "")
+        
+        # Phases 1+2: Planning, with workers starting as their plan entries stream in
+        hedger = self.hedger(recipe, "workers")
+        plan, worker_results, dispatched_early = await self._plan_and_run_workers(
+            client, system_prompt, orchestrator_config, inputs, recipe, hedger)
+        
+        # Phase 3: Synthesis
+        self.emit("synthesis_started")
+        with phase(step="synthesizer"):
+            synthesis = await self._run_synthesizer(client, system_prompt, orchestrator_config, 
+                                                  plan, worker_results, inputs, recipe)
+        self.emit("synthesis_completed", output=synthesis)
+        
+        meta = {
+            "runner_type": "orchestrator",
+            "workers_executed": len(worker_results),
+            "workers_started_while_planning": dispatched_early
+        }
+        if hedger:
+            meta["hedging"] = hedger.stats()
+        
+        return {
+            "recipe_id": recipe.id,
+            "mode": "orchestrator",
+            "output": synthesis,
+            "plan": plan,
+            "worker_results": worker_results,
+            "meta": meta
+        }
+    
+    async def _run_planner(self, client, system_prompt: str, config: Dict[str, Any], 
+                          inputs: Dict[str, Any], recipe: Recipe,
+                          on_worker: Callable[[Any], None]) -> Dict[str, Any]:
+        """
+        Stream the planner's answer, calling on_worker(entry) for each entry of
+        plan["workers"] as soon as it is complete, and return the whole plan
+        """
+        planner_config = config.get("planner", {})
+        planner_prompt = self.safe_template_replace(planner_config.get("prompt", ""), inputs)
+        
+        response_format = self.response_format(f"{recipe.id}_plan", planner_config.get("schema"))
+        
+        workers = JsonArrayStream("workers")
+        content = []
+        async for chunk in chat_completion_stream(
+            client,
+            model=settings.openai_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": planner_prompt}
+            ],
+            response_format=response_format,
+            cache=self.cache_enabled(recipe, planner_config),
+            coalesce=self.coalesce_enabled(recipe, planner_config)
+        ):
+            text = chunk.choices[0].delta.content if chunk.choices else None
+            if text:
+                content.append(text)
+                for planned_worker in workers.feed(text):
+                    on_worker(planned_worker)
+        
+        plan = self.parse_json("".join(content))
+        if not workers.done and isinstance(plan.get("workers"), list):
+            # Not spotted while streaming (unexpected layout): dispatch from the parsed plan
+            for planned_worker in plan["workers"]:
+                on_worker(planned_worker)
+        return plan
+    
+    async def _plan_and_run_workers(self, client, system_prompt: str, config: Dict[str, Any], 
+                                    inputs: Dict[str, Any], recipe: Recipe,
+                                    hedger: Optional[Hedger] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]], int]:
+        """
+        Run the planner and the workers it plans, overlapping the two: each worker starts
+        as soon as its plan entry has streamed in, except workers whose prompt uses {plan},
+        which wait for the whole plan. Returns (plan, worker results in plan order,
+        workers started before the plan was complete).
+        """
+        workers_config = config.get("workers", {})
+        plan: Dict[str, Any] = {}
+        plan_ready = asyncio.Event()
+        tasks: List[asyncio.Task] = []
+        # Workers run as siblings of the planner phase, not inside it
+        run_context = contextvars.copy_context()
+        
+        async def execute_worker(worker_spec: Dict[str, Any]) -> Dict[str, Any]:
+            worker_name = worker_spec.get("name", "worker")
+            worker_prompt = worker_spec.get("prompt", "")
+            
+            # Build context for worker
+            context = {
+                **inputs,
+                "worker_context": json.dumps(worker_spec.get("context", {}), ensure_ascii=False)
+            }
+            if "{plan}" in worker_prompt:
+                await plan_ready.wait()
+                context["plan"] = plan
+            worker_prompt = self.render_prompt(worker_prompt, context, system_prompt, trim=["plan"])
+            
+            response_format = self.response_format(f"{recipe.id}_{worker_name}", worker_spec.get("schema"))
+            
+            with phase(step="worker", branch=worker_name):
+                response = await self.hedged_completion(
+                    hedger,
+                    model=settings.openai_model,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": worker_prompt}
+                    ],
+                    response_format=response_format,
+                    temperature=worker_spec.get("temperature", 0.7),
+                    cache=self.cache_enabled(recipe, worker_spec, worker_spec.get("temperature", 0.7)),
+                    coalesce=self.coalesce_enabled(recipe, worker_spec)
+                )
+            
+            worker_result = {
+                "worker": worker_name,
+                "output": self.parse_response(response),
+                "context": worker_spec.get("context", {})
+            }
+            self.emit("worker_completed", worker=worker_name, output=worker_result["output"])
+            return worker_result
+        
+        def dispatch(worker_spec: Dict[str, Any]):
+            tasks.append(run_context.run(asyncio.create_task, execute_worker(worker_spec)))
+        
+        def on_planned_worker(planned_worker: Any):
+            worker_spec = self._match_worker(planned_worker, workers_config)
+            if worker_spec is not None:
+                dispatch(worker_spec)
+        
+        try:
+            with phase(step="planner"):
+                plan.update(await self._run_planner(client, system_prompt, config, inputs, recipe,
+                                                    on_planned_worker))
+            plan_ready.set()
+            dispatched_early = len(tasks)
+            self.emit("plan_completed", plan=plan)
+            
+            if "workers" not in plan:
+                # Use default workers if no specific plan
+                for worker_spec in workers_config.get("default", workers_config.get("available", [])):
+                    dispatch(worker_spec)
+            
+            worker_results = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return plan, list(worker_results), dispatched_early
+    
+    async def _run_synthesizer(self, client, system_prompt: str, config: Dict[str, Any], 
+                             plan: Dict[str, Any], worker_results: List[Dict[str, Any]], 
+                             inputs: Dict[str, Any], recipe: Recipe) -> Dict[str, Any]:
+        """Synthesize worker results into final output"""
+        synthesizer_config = config.get("synthesizer", {})
+        synthesizer_prompt = synthesizer_config.get("prompt", "")
+        
+        # Build context for synthesizer
+        context = {
+            **inputs,
+            "plan": plan,
+            "worker_results": worker_results
+        }
+        synthesizer_prompt = self.render_prompt(synthesizer_prompt, context, system_prompt,
+                                                trim=["plan", "worker_results"])
+        
+        response_format = self.response_format(f"{recipe.id}_synthesis", synthesizer_config.get("schema"))
+        
+        response = await chat_completion(
+            client,
+            model=settings.openai_model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": synthesizer_prompt}
+            ],
+            response_format=response_format,
+            cache=self.cache_enabled(recipe, synthesizer_config),
+            coalesce=self.coalesce_enabled(recipe, synthesizer_config)
+        )
+        
+        return self.parse_response(response)
+    
+    def _match_worker(self, planned_worker: Any, workers_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Worker template for one plan entry (a name, or {"name": ..., "context": {...}})"""
+        worker_name = planned_worker.get("name") if isinstance(planned_worker, dict) else planned_worker
+        
+        # Find matching worker template
+        for worker_template in workers_config.get("available", []):
+            if worker_template.get("name") == worker_name:
+                worker_spec = worker_template.copy()
+                if isinstance(planned_worker, dict):
+                    worker_spec["context"] = planned_worker.get("context", {})
+                return worker_spec
+        return None
\ No newline at end of file
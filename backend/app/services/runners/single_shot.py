@@ -1,55 +1,56 @@
-import json
-import asyncio
-from typing import Dict, Any
-from openai import AsyncOpenAI
-from ...config import settings
-from ...models import Recipe
-from ..base_runner import BaseRunner
-
-MAX_CONCURRENT_CALLS = 5
-_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CALLS)
-
-
-class SingleShotRunner(BaseRunner):
-    """Direct LLM call with profile injection for simple generation tasks"""
-    
-    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
-        client = AsyncOpenAI(api_key=settings.openai_api_key)
-        
-        # Build system prompt with profile injection
-        system_prompt = self.build_system_prompt(recipe.system_prompt or "")
-        
-        # Build user prompt from template
-        user_prompt = self.safe_template_replace(recipe.user_prompt_template, inputs)
-        
-        # Determine response format
-        response_format = {"type": "json_object"}
-        if recipe.response_format and "schema" in recipe.response_format:
-            response_format = {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": f"{recipe.id}_response",
-                    "schema": recipe.response_format["schema"],
-                    "strict": True
-                }
-            }
-        
-        async with _semaphore:
-            response = await client.chat.completions.create(
-                model=settings.openai_model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                response_format=response_format
-            )
-        
-        result = json.loads(response.choices[0].message.content)
-
-        return {
-            "recipe_id": recipe.id,
-            "mode": "single_shot",
-            "output": result,
-            "methodology": recipe.methodology if hasattr(recipe, 'methodology') and recipe.methodology else None,
-            "meta": {"runner_type": "single_shot"}
+from typing import Dict, Any
+from ...config import settings
+from ...models import Recipe
+from ..base_runner import BaseRunner
+from ..llm_gateway import chat_completion
+
+
+class SingleShotRunner(BaseRunner):
+    """Direct LLM call with profile injection for simple generation tasks"""
+    
+    async def run(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        request = self.build_request(recipe, inputs)
+        
+        self.emit("step_started", step=recipe.id)
+        response = await chat_completion(
+            self.client,
+            **request,
+            cache=self.cache_enabled(recipe),
+            coalesce=self.coalesce_enabled(recipe),
+            cache_scope=recipe.id,
+            semantic_text=self.semantic_cache_text(inputs)
+        )
+        
+        return self.build_result(recipe, response)
+
+    def build_request(self, recipe: Recipe, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """The chat completion request (model, messages, response_format); also what batch_runner defers"""
+        # Build system prompt with profile injection
+        system_prompt = self.build_system_prompt(recipe.system_prompt or "")
+        
+        # Build user prompt from template
+        user_prompt = self.safe_template_replace(recipe.user_prompt_template, inputs)
+        
+        # Determine response format
+        response_format = self.response_format(f"{recipe.id}_response", (recipe.response_format or {}).get("schema"))
+        
+        return {
+            "model": settings.openai_model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": response_format
+        }
+
+    def build_result(self, recipe: Recipe, response) -> Dict[str, Any]:
+        result = self.parse_response(response)
+        self.emit("step_completed", step=recipe.id, output=result)
+
+        return {
+            "recipe_id": recipe.id,
+            "mode": "single_shot",
+            "output": result,
+            "methodology": recipe.methodology if hasattr(recipe, 'methodology') and recipe.methodology else None,
+            "meta": {"runner_type": "single_shot"}
         }
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Semantic (Near-Duplicate) Prompt Cache
+Second cache tier behind the exact-match cache: reuses a cached output when the
+user-supplied text of a recipe step is a near-duplicate of an earlier one
+("AI in healthcare" vs "AI for healthcare").
+Embeddings are computed locally with a NumPy hashing-trick vectorizer over
+word and character n-gram features - no external embedding service.
+"""
+
+import re
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List
+import numpy as np
+from ..config import settings
+
+
+# Function words carry little meaning for topic-style inputs
+_STOPWORDS = {
+    "a", "an", "the", "in", "for", "of", "on", "to", "and", "or", "with", "about",
+    "at", "by", "from", "into", "is", "are", "my", "our", "your", "this", "that"
+}
+_WORD = re.compile(r"[a-z0-9]+")
+
+# Best-score histogram buckets (upper bounds) used for threshold tuning
+_SCORE_BUCKETS = [0.5, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 1.0]
+
+
+class HashingVectorizer:
+    """
+    Signed hashing-trick vectorizer: word unigrams plus character n-grams
+    inside each word, projected into a fixed number of dimensions and
+    L2-normalized so a dot product is the cosine similarity.
+    """
+
+    def __init__(self, dims: int = 2048, ngram: int = 3, word_weight: float = 2.0):
+        self.dims = dims
+        self.ngram = ngram
+        self.word_weight = word_weight
+
+    def _features(self, text: str) -> List[tuple[str, float]]:
+        features = []
+        for word in _WORD.findall(text.lower()):
+            if word in _STOPWORDS:
+                continue
+            features.append(("w:" + word, self.word_weight))
+            padded = f" {word} "
+            for i in range(len(padded) - self.ngram + 1):
+                features.append(("c:" + padded[i:i + self.ngram], 1.0))
+        return features
+
+    def transform(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dims, dtype=np.float32)
+        for feature, weight in self._features(text):
+            h = zlib.crc32(feature.encode("utf-8"))
+            vector[h % self.dims] += weight if h & 0x80000000 else -weight
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+
+class _ScopeIndex:
+    """Vectors and cached outputs for one recipe step (oldest evicted first)"""
+
+    def __init__(self):
+        self.vectors: List[np.ndarray] = []
+        self.values: List[str] = []
+        self.expires: List[float] = []
+        self._matrix: Optional[np.ndarray] = None
+
+    def matrix(self) -> np.ndarray:
+        if self._matrix is None:
+            self._matrix = np.vstack(self.vectors)
+        return self._matrix
+
+    def add(self, vector: np.ndarray, value: str, expires_at: float, max_entries: int):
+        self.vectors.append(vector)
+        self.values.append(value)
+        self.expires.append(expires_at)
+        if len(self.vectors) > max_entries:
+            del self.vectors[0], self.values[0], self.expires[0]
+        self._matrix = None
+
+
+class SemanticCache:
+    """
+    Near-duplicate lookup per scope. A scope pins everything except the
+    compared text (model, system prompt, response format, recipe step), so a
+    hit can only return output produced for the same step and profile.
+    """
+
+    def __init__(self, threshold: float, max_entries_per_scope: int, ttl: float,
+                 dims: int = 2048, max_scopes: int = 256):
+        self.threshold = threshold
+        self.max_entries_per_scope = max_entries_per_scope
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        self.vectorizer = HashingVectorizer(dims)
+        self._scopes: "OrderedDict[str, _ScopeIndex]" = OrderedDict()
+
+        self._lookups = 0
+        self._hits = 0
+        self._hit_score_total = 0.0
+        self._score_histogram = [0] * len(_SCORE_BUCKETS)
+
+    def _record_score(self, score: float):
+        for i, upper in enumerate(_SCORE_BUCKETS):
+            if score <= upper:
+                self._score_histogram[i] += 1
+                return
+        self._score_histogram[-1] += 1
+
+    def lookup(self, scope: str, text: str) -> Optional[str]:
+        """Return the cached output of the most similar earlier text above the threshold"""
+        self._lookups += 1
+        index = self._scopes.get(scope)
+        if index is None or not index.vectors:
+            return None
+        self._scopes.move_to_end(scope)
+
+        scores = index.matrix() @ self.vectorizer.transform(text)
+        now = time.time()
+        for position in np.argsort(scores)[::-1]:
+            if index.expires[position] >= now:
+                break
+        else:
+            return None
+
+        score = float(scores[position])
+        self._record_score(score)
+        if score < self.threshold:
+            return None
+
+        self._hits += 1
+        self._hit_score_total += score
+        return index.values[position]
+
+    def store(self, scope: str, text: str, value: str):
+        index = self._scopes.get(scope)
+        if index is None:
+            index = self._scopes[scope] = _ScopeIndex()
+            while len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+        self._scopes.move_to_end(scope)
+        index.add(self.vectorizer.transform(text), value, time.time() + self.ttl, self.max_entries_per_scope)
+
+    def clear(self):
+        self._scopes.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        labels = []
+        lower = 0.0
+        for upper in _SCORE_BUCKETS:
+            labels.append(f"{lower:.2f}-{upper:.2f}")
+            lower = upper
+        return {
+            "threshold": self.threshold,
+            "scopes": len(self._scopes),
+            "entries": sum(len(index.vectors) for index in self._scopes.values()),
+            "lookups": self._lookups,
+            "hits": self._hits,
+            "hit_rate": round(self._hits / self._lookups, 4) if self._lookups else 0.0,
+            "mean_hit_score": round(self._hit_score_total / self._hits, 4) if self._hits else None,
+            "best_score_histogram": dict(zip(labels, self._score_histogram))
+        }
+
+
+# Process-wide semantic cache used by llm_gateway.chat_completion
+semantic_cache = SemanticCache(
+    threshold=settings.llm_semantic_cache_threshold,
+    max_entries_per_scope=settings.llm_semantic_cache_max_entries,
+    ttl=settings.llm_cache_ttl,
+    dims=settings.llm_semantic_cache_dims
+)
@@ -0,0 +1,68 @@
+"""
+Singleflight Request Coalescing
+Identical LLM calls that are in flight at the same time (same key as the
+response cache) share one provider request: the first caller leads, later
+callers await the leader's task.
+The shared call runs as its own task and is shielded from its waiters, so one
+disconnecting client does not cancel it for the others; it is only cancelled
+once every waiter has gone.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Coalesces concurrent calls by key"""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self._leaders = 0
+        self._followers = 0
+        self._abandoned = 0
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            self._waiters.pop(key, None)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn() once per key among concurrent callers and return its result to all of them"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self._leaders += 1
+        else:
+            self._followers += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # Last waiter gone: nobody needs the answer, stop paying for it
+            if self._calls.get(key) is task and self._waiters.get(key) == 1 and not task.done():
+                self._forget(key, task)
+                task.cancel()
+                self._abandoned += 1
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        total = self._leaders + self._followers
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self._leaders,
+            "coalesced": self._followers,
+            "coalesce_rate": round(self._followers / total, 4) if total else 0.0,
+            "abandoned": self._abandoned
+        }
+
+
+# Process-wide coalescer used by llm_gateway.chat_completion
+singleflight = SingleFlight()
@@ -0,0 +1,14 @@
+"""
+Server-Sent Events helpers shared by the streaming endpoints (/run/stream, /chat/stream)
+"""
+
+import json
+from typing import Dict, Any
+
+# Disable proxy buffering so events reach the client as they are produced
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Encode a typed event ({"type": ..., ...}) as one SSE frame"""
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
@@ -0,0 +1,127 @@
+"""
+Iterative State Compaction
+Keeps what IterativeRunner puts into every prompt ({state}) and into the final
+synthesis ({iteration_summary}) within a token budget, so prompt size stops
+growing with the number of loops.
+
+State: once over budget, the loop_<n>[_sub_<m>] keys appended for steps without
+next_state are evicted oldest first (the most recent loops stay verbatim) and
+folded into a digest under EARLIER_LOOPS_KEY, either by a configured summarizer
+step (see IterativeRunner._compact_state) or as one clipped line per entry; any
+remaining excess is trimmed from the largest values. History: the oldest
+iterations are condensed to one line each, then omitted, until the summary fits.
+All rules are deterministic, so compacted prompts still hit the response cache.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Tuple
+from .tokenizer import token_counter
+
+EARLIER_LOOPS_KEY = "earlier_loops"
+
+_LOOP_KEY = re.compile(r"^loop_(\d+)(?:_sub_(\d+))?$")
+_CHARS_PER_TOKEN = 4  # for turning token budgets into character cuts
+_CONDENSED_CHARS = 160
+
+
+def approx_tokens(value: Any) -> int:
+    """Prompt tokens a value takes once rendered into a template"""
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return token_counter.count(text)
+
+
+def clip(text: str, max_chars: int) -> str:
+    return text if len(text) <= max_chars else text[:max(0, max_chars - 1)] + "…"
+
+
+def split_evictable(state: Dict[str, Any], keep_recent_loops: int) -> Tuple[Dict[str, Any], List[Tuple[str, Any]]]:
+    """
+    (state without old loop keys, [(key, value), ...] evicted oldest first).
+    Keys of the newest `keep_recent_loops` loops are kept.
+    """
+    loops = sorted({int(m.group(1)) for m in map(_LOOP_KEY.match, state) if m})
+    recent = set(loops[-keep_recent_loops:]) if keep_recent_loops > 0 else set()
+    evicted = []
+    for key, value in state.items():
+        match = _LOOP_KEY.match(key)
+        if match and int(match.group(1)) not in recent:
+            evicted.append(((int(match.group(1)), int(match.group(2) or 0)), key, value))
+    evicted.sort(key=lambda item: item[0])
+    evicted_keys = {key for _, key, _ in evicted}
+    kept = {key: value for key, value in state.items() if key not in evicted_keys}
+    return kept, [(key, value) for _, key, value in evicted]
+
+
+def fold_digest(state: Dict[str, Any], evicted: List[Tuple[str, Any]], max_tokens: int) -> Dict[str, Any]:
+    """Append one clipped line per evicted entry to the digest, keeping its newest lines within half the budget"""
+    lines = [line for line in str(state.get(EARLIER_LOOPS_KEY, "")).split("\n") if line]
+    for key, value in evicted:
+        text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+        lines.append(f"{key}: {clip(text, _CONDENSED_CHARS)}")
+    max_chars = max_tokens * _CHARS_PER_TOKEN // 2
+    while len(lines) > 1 and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return {**state, EARLIER_LOOPS_KEY: "\n".join(lines)}
+
+
+def _shrink(value: Any) -> Any:
+    """Roughly halve a value: strings keep their head, lists their newest items"""
+    if isinstance(value, str):
+        return clip(value, len(value) // 2)
+    if isinstance(value, list):
+        return value[len(value) // 2:] if len(value) > 1 else [_shrink(value[0])] if value else value
+    if isinstance(value, dict):
+        return clip(json.dumps(value, ensure_ascii=False), approx_tokens(value) * _CHARS_PER_TOKEN // 2)
+    return value
+
+
+def trim_to_budget(state: Dict[str, Any], max_tokens: int) -> Dict[str, Any]:
+    """Shrink the largest values until the state fits (last resort after eviction)"""
+    state = dict(state)
+    for _ in range(64):
+        if approx_tokens(state) <= max_tokens:
+            break
+        key = max(state, key=lambda k: approx_tokens(state[k]), default=None)
+        if key is None:
+            break
+        shrunk = _shrink(state[key])
+        if shrunk == state[key]:
+            break
+        state[key] = shrunk
+    return state
+
+
+def bound_iteration_summary(blocks: List[Tuple[int, str]], max_tokens: int) -> str:
+    """
+    Join (loop number, text) blocks in order, condensing the lowest loops first to their
+    first line, then leaving them out, until the text fits `max_tokens` (0 = unbounded)
+    """
+    texts = [text for _, text in blocks]
+    if not max_tokens or approx_tokens("".join(texts)) <= max_tokens:
+        return "".join(texts)
+
+    max_chars = max_tokens * _CHARS_PER_TOKEN
+    oldest_first = sorted(range(len(blocks)), key=lambda index: (blocks[index][0], index))
+    total = sum(len(text) for text in texts)
+    for index in oldest_first:
+        if total <= max_chars:
+            break
+        lines = [line for line in texts[index].split("\n") if line]
+        condensed = "\n" + clip(" ".join(lines), _CONDENSED_CHARS) + "\n"
+        if len(condensed) < len(texts[index]):
+            total -= len(texts[index]) - len(condensed)
+            texts[index] = condensed
+
+    omitted = 0
+    for index in oldest_first:
+        if total <= max_chars:
+            break
+        total -= len(texts[index])
+        texts[index] = ""
+        omitted += 1
+
+    summary = "".join(texts)
+    if omitted:
+        summary = f"\n({omitted} earlier iterations omitted)\n" + summary
+    return summary
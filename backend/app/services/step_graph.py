@@ -0,0 +1,73 @@
+"""
+Chain Step Graph
+Dependencies between chain steps, inferred from the {step.<id>.<key>} placeholders
+in each step's prompt plus an optional explicit "depends_on" list. Checked for
+unknown step ids and cycles when the recipe is loaded (see ChainConfig), and used
+by ChainRunner to start each step as soon as the steps it reads from are done.
+"""
+
+import re
+from typing import Any, Dict, List
+
+_STEP_REFERENCE = re.compile(r"\{step\.([^.{}]+)\.")
+
+
+def step_id(step: Dict[str, Any], index: int) -> str:
+    """Id a chain step is addressed by in placeholders, events and run meta"""
+    return step.get("id", step.get("name", f"step_{index + 1}"))
+
+
+def step_prompt(step: Dict[str, Any]) -> str:
+    return step.get("user_prompt", step.get("prompt", ""))
+
+
+def step_dependencies(steps: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    {step id: ids of the steps it depends on}, in declaration order.
+    Raises ValueError for duplicate ids or references to steps that do not exist.
+    """
+    ids = [step_id(step, i) for i, step in enumerate(steps)]
+    duplicates = sorted({sid for sid in ids if ids.count(sid) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate chain step id(s): {', '.join(duplicates)}")
+
+    dependencies: Dict[str, List[str]] = {}
+    for sid, step in zip(ids, steps):
+        explicit = step.get("depends_on") or []
+        if isinstance(explicit, str):
+            explicit = [explicit]
+        referenced = _STEP_REFERENCE.findall(step_prompt(step))
+        depends_on = list(dict.fromkeys([*explicit, *referenced]))
+        unknown = [dep for dep in depends_on if dep not in ids]
+        if unknown:
+            raise ValueError(f"Chain step '{sid}' depends on unknown step(s): {', '.join(unknown)}")
+        dependencies[sid] = depends_on
+    return dependencies
+
+
+def topological_levels(dependencies: Dict[str, List[str]]) -> List[List[str]]:
+    """
+    Group steps into levels whose members only depend on earlier levels
+    (declaration order kept within a level). Raises ValueError naming a cycle.
+    """
+    levels: List[List[str]] = []
+    done: set = set()
+    remaining = list(dependencies)
+    while remaining:
+        ready = [sid for sid in remaining if all(dep in done for dep in dependencies[sid])]
+        if not ready:
+            raise ValueError(f"Chain steps form a cycle: {' -> '.join(_find_cycle(dependencies, remaining))}")
+        levels.append(ready)
+        done.update(ready)
+        remaining = [sid for sid in remaining if sid not in done]
+    return levels
+
+
+def _find_cycle(dependencies: Dict[str, List[str]], remaining: List[str]) -> List[str]:
+    """Follow unresolved dependencies from a blocked step until one repeats"""
+    path = [remaining[0]]
+    while True:
+        following = next(dep for dep in dependencies[path[-1]] if dep in remaining)
+        if following in path:
+            return path[path.index(following):] + [following]
+        path.append(following)
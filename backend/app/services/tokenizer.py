@@ -0,0 +1,143 @@
+"""
+Token Counter
+Prompt token counts without a provider round-trip. Uses tiktoken when the
+model's encoding is available offline (tiktoken ships with langchain-openai;
+encodings are read from TIKTOKEN_CACHE_DIR or its default cache and never
+downloaded here), otherwise an approximation modelled on how BPE tokenizers
+split text: word pieces, digit groups, punctuation runs and non-ASCII characters.
+
+The approximation is calibrated per model from the prompt_tokens the provider
+reports for each call (see llm_gateway), so estimates converge on the real
+tokenizer after a few requests. LLM_TOKENIZER=approx skips tiktoken entirely.
+"""
+
+import hashlib
+import math
+import os
+import re
+import tempfile
+from typing import Any, Dict, List, Optional
+from ..config import settings
+
+# tiktoken counts each chat message as its content plus a few framing tokens
+_TOKENS_PER_MESSAGE = 3
+_TOKENS_PER_REPLY = 3
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d\x80-\U0010ffff]+|[\x80-\U0010ffff]|\s+")
+
+_encodings: Dict[str, Any] = {}
+_unavailable: set = set()
+
+
+_ENCODING_FILES = {
+    "o200k_base": "https://openaipublic.blob.core.windows.net/encodings/o200k_base.tiktoken",
+    "cl100k_base": "https://openaipublic.blob.core.windows.net/encodings/cl100k_base.tiktoken",
+}
+
+
+def _encoding_name(model: str) -> str:
+    if model.startswith(("gpt-4o", "gpt-4.1", "gpt-5", "o1", "o3", "o4")):
+        return "o200k_base"
+    return "cl100k_base"
+
+
+def _is_cached(name: str) -> bool:
+    """Whether tiktoken can build the encoding from its local cache (it would otherwise download the file)"""
+    cache_dir = os.environ.get("TIKTOKEN_CACHE_DIR") or os.environ.get("DATA_GYM_CACHE_DIR") \
+        or os.path.join(tempfile.gettempdir(), "data-gym-cache")
+    return os.path.exists(os.path.join(cache_dir, hashlib.sha1(_ENCODING_FILES[name].encode()).hexdigest()))
+
+
+def _encoding(model: Optional[str]) -> Any:
+    """tiktoken encoding for the model, or None when tiktoken or its encoding file is not available locally"""
+    if settings.llm_tokenizer == "approx":
+        return None
+    name = _encoding_name(model or settings.openai_model)
+    if name in _encodings:
+        return _encodings[name]
+    if name in _unavailable:
+        return None
+    encoding = None
+    try:
+        import tiktoken
+        if _is_cached(name):
+            encoding = tiktoken.get_encoding(name)
+    except Exception as e:
+        print(f"⚠️ Tokenizer: could not load tiktoken '{name}': {e}")
+    if encoding is None:
+        _unavailable.add(name)
+        print(f"ℹ️ Tokenizer: no local '{name}' encoding, using the calibrated approximation")
+        return None
+    _encodings[name] = encoding
+    return encoding
+
+
+def approximate_tokens(text: str) -> float:
+    """Uncalibrated estimate: letters ~5 per token, digits ~3, punctuation ~2, one per non-ASCII character"""
+    count = 0.0
+    for piece in _PIECE.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            count += math.ceil(len(piece) / 5)
+        elif first.isdigit():
+            count += math.ceil(len(piece) / 3)
+        elif first.isspace():
+            # A single space joins the next word's token; longer runs and newlines cost their own
+            count += 0 if piece == " " else math.ceil(len(piece) / 4)
+        elif first.isascii():
+            count += math.ceil(len(piece) / 2)
+        else:
+            count += 1
+    return count
+
+
+class TokenCounter:
+    """Counts prompt tokens; keeps a per-model correction factor for the approximation"""
+
+    def __init__(self):
+        self._factors: Dict[str, float] = {}
+        self.calibrations = 0
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        if not text:
+            return 0
+        encoding = _encoding(model)
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return math.ceil(approximate_tokens(text) * self._factors.get(model or "", 1.0))
+
+    def count_messages(self, messages: List[Dict[str, Any]], model: Optional[str] = None) -> int:
+        """Prompt tokens of a chat request (message contents plus per-message framing)"""
+        total = _TOKENS_PER_REPLY
+        for message in messages:
+            content = message.get("content")
+            total += _TOKENS_PER_MESSAGE + (self.count(content, model) if isinstance(content, str) else 0)
+        return total
+
+    def exact(self, model: Optional[str] = None) -> bool:
+        return _encoding(model) is not None
+
+    def calibrate(self, model: str, messages: List[Dict[str, Any]], reported_prompt_tokens: int):
+        """Fold the provider's prompt_tokens for these messages into the model's correction factor"""
+        if not model or not reported_prompt_tokens or self.exact(model):
+            return
+        raw = sum(approximate_tokens(m["content"]) for m in messages if isinstance(m.get("content"), str))
+        framing = _TOKENS_PER_REPLY + _TOKENS_PER_MESSAGE * len(messages)
+        if raw < 16:
+            return
+        observed = min(2.0, max(0.5, (reported_prompt_tokens - framing) / raw))
+        factor = self._factors.get(model)
+        # Exponential moving average: quick to converge, robust to one odd prompt
+        self._factors[model] = observed if factor is None else factor * 0.8 + observed * 0.2
+        self.calibrations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": settings.llm_tokenizer,
+            "exact_encodings": sorted(_encodings),
+            "calibration_factors": {model: round(factor, 3) for model, factor in self._factors.items()},
+            "calibrations": self.calibrations
+        }
+
+
+token_counter = TokenCounter()
@@ -0,0 +1,281 @@
+"""
+Request Tracing
+Hierarchical spans for request -> run_recipe -> runner phase -> LLM call, kept
+in memory for the most recent traces and exportable as OpenTelemetry (OTLP/JSON)
+or Chrome trace-event files (chrome://tracing, https://ui.perfetto.dev).
+
+LLM call spans carry the rate-limiter wait separately from provider time, the
+prompt size and token usage; parse spans time JSON decoding of the answer.
+No OpenTelemetry SDK is needed: spans are plain objects and the exporters only
+produce the wire format.
+"""
+
+import asyncio
+import json
+import os
+import secrets
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from ..config import settings
+
+
+class Span:
+    """One timed operation; attributes are flat str/int/float/bool values"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "start_ns", "end_ns",
+                 "attributes", "error", "lane")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], kind: str,
+                 attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        # Concurrent tasks (branches, votes, workers) get their own Chrome trace row
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        self.lane = trace.lane(id(task) if task else 0)
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, key: str, amount: float):
+        """Accumulate a numeric attribute (e.g. wait time over retries)"""
+        self.attributes[key] = round(self.attributes.get(key, 0) + amount, 3)
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def end(self, error: Optional[str] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = time.time_ns()
+        self.error = error
+        self.trace.span_ended(self)
+
+
+class _NoopSpan:
+    """Stand-in while tracing is disabled, so call sites never check"""
+
+    trace_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, key: str, amount: float):
+        pass
+
+    def end(self, error: Optional[str] = None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """All spans sharing one trace id; complete once every started span has ended"""
+
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.open = 0
+        self._lanes: Dict[int, int] = {}
+
+    def lane(self, task_id: int) -> int:
+        return self._lanes.setdefault(task_id, len(self._lanes) + 1)
+
+    def start(self, name: str, parent_id: Optional[str], kind: str, attributes: Dict[str, Any]) -> Span:
+        span = Span(self, name, parent_id, kind, attributes)
+        self.spans.append(span)
+        self.open += 1
+        return span
+
+    def span_ended(self, span: Span):
+        self.open -= 1
+        if self.open == 0:
+            trace_store.complete(self)
+
+    @property
+    def root(self) -> Optional[Span]:
+        return self.spans[0] if self.spans else None
+
+    def summary(self) -> Dict[str, Any]:
+        root = self.root
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name if root else None,
+            "started_at": root.start_ns / 1e9 if root else None,
+            "duration_ms": round(root.duration_ms, 3) if root else None,
+            "spans": len(self.spans),
+            "error": any(span.error for span in self.spans)
+        }
+
+
+class TraceStore:
+    """Most recent completed traces, plus an optional export directory"""
+
+    def __init__(self, max_traces: int, export_dir: str = ""):
+        self.max_traces = max_traces
+        self.export_dir = export_dir
+        self._traces: "OrderedDict[str, Trace]" = OrderedDict()
+
+    def complete(self, trace: Trace):
+        self._traces[trace.trace_id] = trace
+        self._traces.move_to_end(trace.trace_id)
+        while len(self._traces) > self.max_traces:
+            self._traces.popitem(last=False)
+        if self.export_dir:
+            self._export(trace)
+
+    def _export(self, trace: Trace):
+        try:
+            os.makedirs(self.export_dir, exist_ok=True)
+            base = os.path.join(self.export_dir, trace.trace_id)
+            with open(f"{base}.otel.json", "w") as f:
+                json.dump(to_otel_json([trace]), f)
+            with open(f"{base}.chrome.json", "w") as f:
+                json.dump(to_chrome_trace([trace]), f)
+        except OSError as e:
+            print(f"⚠️ Trace export failed: {e}")
+
+    def get(self, trace_id: str) -> Optional[Trace]:
+        return self._traces.get(trace_id)
+
+    def recent(self, limit: int = 50) -> List[Trace]:
+        return list(reversed(self._traces.values()))[:limit]
+
+    def clear(self):
+        self._traces.clear()
+
+
+trace_store = TraceStore(settings.tracing_max_traces, settings.tracing_export_dir)
+
+# Innermost open span of the running task (copied into tasks spawned by gather)
+current_span: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes) -> Iterator[Any]:
+    """
+    Time the block as a child of the current span (or as the root of a new trace).
+    Yields the span so the block can attach attributes; exceptions mark it as failed.
+    """
+    if not settings.tracing_enabled:
+        yield NOOP_SPAN
+        return
+
+    parent = current_span.get()
+    trace = parent.trace if parent is not None else Trace()
+    current = trace.start(name, parent.span_id if parent is not None else None, kind, attributes)
+    token = current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+        raise
+    finally:
+        current_span.reset(token)
+        current.end()
+
+
+def start_span(name: str, kind: str = "internal", **attributes) -> Any:
+    """
+    Child span of the current span without making it current; end it with .end().
+    For work that outlives a single block, such as a streamed response body.
+    """
+    if not settings.tracing_enabled:
+        return NOOP_SPAN
+    parent = current_span.get()
+    trace = parent.trace if parent is not None else Trace()
+    return trace.start(name, parent.span_id if parent is not None else None, kind, attributes)
+
+
+@contextmanager
+def use_span(active: Any):
+    """Make a span from start_span() the parent of spans opened inside the block (does not end it)"""
+    if not isinstance(active, Span):
+        yield
+        return
+    token = current_span.set(active)
+    try:
+        yield
+    finally:
+        current_span.reset(token)
+
+
+def active_span() -> Any:
+    """Innermost open span, or a no-op stand-in outside any trace"""
+    return current_span.get() or NOOP_SPAN
+
+
+_OTEL_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _otel_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def to_otel_json(traces: List[Trace]) -> Dict[str, Any]:
+    """OTLP/JSON (ExportTraceServiceRequest), accepted by OTLP/HTTP collectors"""
+    spans = []
+    for trace in traces:
+        for s in trace.spans:
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": _OTEL_KINDS.get(s.kind, 1),
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or time.time_ns()),
+                "attributes": [{"key": key, "value": _otel_value(value)} for key, value in s.attributes.items()],
+                "status": {"code": 2, "message": s.error} if s.error else {"code": 1}
+            })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": settings.tracing_service_name}}]},
+        "scopeSpans": [{"scope": {"name": "thought-partner.tracing"}, "spans": spans}]
+    }]}
+
+
+def to_chrome_trace(traces: List[Trace]) -> Dict[str, Any]:
+    """Chrome trace-event format: one process per trace, one thread row per asyncio task"""
+    events = []
+    for pid, trace in enumerate(traces, start=1):
+        events.append({"name": "process_name", "ph": "M", "pid": pid,
+                       "args": {"name": f"{trace.root.name if trace.root else 'trace'} {trace.trace_id[:8]}"}})
+        for s in trace.spans:
+            args = dict(s.attributes)
+            if s.error:
+                args["error"] = s.error
+            events.append({
+                "name": s.name,
+                "cat": s.name.split(".")[0].split(" ")[0],
+                "ph": "X",
+                "ts": s.start_ns / 1000,
+                "dur": ((s.end_ns or time.time_ns()) - s.start_ns) / 1000,
+                "pid": pid,
+                "tid": s.lane,
+                "args": args
+            })
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
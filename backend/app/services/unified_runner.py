@@ -1,57 +1,95 @@
-import json
-from typing import Dict, Any
-from ..models import Recipe
-from ..models_user import UserProfile
-from .runner_factory import RunnerFactory
-from .runner import load_profile  # Import profile loading function
-
-
-async def run_recipe(recipe: Recipe, params: Dict[str, Any]) -> str:
-    """
-    Unified recipe runner that automatically selects appropriate runner type
-    and executes with profile-aware personalization
-    """
-    # Load user profile
-    user_id = params.get("user_id")
-    profile = load_profile(user_id)
-    
-    # Validate recipe configuration
-    is_valid, error_message = RunnerFactory.validate_recipe_for_runner(recipe)
-    if not is_valid:
-        raise ValueError(f"Invalid recipe configuration: {error_message}")
-    
-    # Create appropriate runner
-    runner = RunnerFactory.create_runner(recipe, profile)
-    
-    # Execute recipe
-    result = await runner.run(recipe, params)
-    
-    # Return as JSON string for compatibility with existing API
-    return json.dumps(result, ensure_ascii=False)
-
-
-def get_runner_info(recipe: Recipe) -> Dict[str, Any]:
-    """Get information about what runner would be used for a recipe"""
-    runner_type = RunnerFactory._determine_runner_type(recipe)
-    is_valid, validation_message = RunnerFactory.validate_recipe_for_runner(recipe)
-    
-    return {
-        "runner_type": runner_type,
-        "is_valid": is_valid,
-        "validation_message": validation_message,
-        "available_runners": RunnerFactory.get_available_runner_types()
-    }
-
-
-# Backward compatibility functions
-async def run_one_shot(recipe: Recipe, params: Dict[str, Any]) -> str:
-    """Legacy function for backward compatibility"""
-    return await run_recipe(recipe, params)
-
-
-async def run_iterative_generic(recipe: Recipe, params: Dict[str, Any], loops: int = None) -> str:
-    """Legacy function for backward compatibility"""
-    if loops is not None:
-        params = params.copy()
-        params["loops"] = loops
+import json
+from typing import Dict, Any, Optional, AsyncIterator
+from openai import AsyncOpenAI
+from ..config import settings
+from ..models import Recipe
+from ..models_user import UserProfile
+from .runner_factory import RunnerFactory
+from .recipe_plan import plan_for
+from .runner import load_profile  # Import profile loading function
+from .tracing import span
+
+
+async def run_recipe(recipe: Recipe, params: Dict[str, Any], client: Optional[AsyncOpenAI] = None) -> str:
+    """
+    Unified recipe runner that automatically selects appropriate runner type
+    and executes with profile-aware personalization.
+    Uses the shared pooled LLM client unless one is injected.
+    """
+    # Validated and precompiled when recipes were loaded; only the inputs are bound here
+    plan = plan_for(recipe)
+    with span("run_recipe", recipe=recipe.id, runner_type=plan.runner_type):
+        # Load user profile
+        user_id = params.get("user_id")
+        profile = load_profile(user_id)
+        
+        # Create the runner for this run from the plan
+        runner = plan.runner(profile, client)
+        
+        # Execute recipe
+        result = await runner.execute(recipe, params)
+        
+        # Return as JSON string for compatibility with existing API
+        with span("serialize_result"):
+            return json.dumps(result, ensure_ascii=False)
+
+
+def response_meta(result: Any) -> Dict[str, Any]:
+    """RunResponse meta: configured model plus the run's token/cost and retry/fallback telemetry"""
+    meta = {"model": settings.openai_model}
+    run_meta = (result.get("meta") or {}) if isinstance(result, dict) else {}
+    for key in ("usage", "resilience", "batch_id"):
+        if run_meta.get(key):
+            meta[key] = run_meta[key]
+    return meta
+
+
+async def stream_recipe(recipe: Recipe, params: Dict[str, Any],
+                        client: Optional[AsyncOpenAI] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of run_recipe: yields typed progress events
+    (run_started, step_completed, substep_completed, vote_completed, ...)
+    and finishes with run_completed (carrying the full result) or error.
+    """
+    try:
+        plan = plan_for(recipe)
+    except ValueError as e:
+        yield {"type": "error", "message": str(e)}
+        return
+
+    profile = load_profile(params.get("user_id"))
+    runner = plan.runner(profile, client)
+    yield {
+        "type": "run_started",
+        "recipe_id": recipe.id,
+        "runner_type": plan.runner_type
+    }
+    async for event in runner.stream(recipe, params):
+        yield event
+
+
+def get_runner_info(recipe: Recipe) -> Dict[str, Any]:
+    """Get information about what runner would be used for a recipe"""
+    runner_type = RunnerFactory._determine_runner_type(recipe)
+    is_valid, validation_message = RunnerFactory.validate_recipe_for_runner(recipe)
+    
+    return {
+        "runner_type": runner_type,
+        "is_valid": is_valid,
+        "validation_message": validation_message,
+        "available_runners": RunnerFactory.get_available_runner_types()
+    }
+
+
+# Backward compatibility functions
+async def run_one_shot(recipe: Recipe, params: Dict[str, Any]) -> str:
+    """Legacy function for backward compatibility"""
+    return await run_recipe(recipe, params)
+
+
+async def run_iterative_generic(recipe: Recipe, params: Dict[str, Any], loops: int = None) -> str:
+    """Legacy function for backward compatibility"""
+    if loops is not None:
+        params = params.copy()
+        params["loops"] = loops
     return await run_recipe(recipe, params)
\ No newline at end of file
@@ -0,0 +1,8 @@
+"""
+Orchestration-overhead benchmarks: every runner, the tool registry and the
+chat agent against instant fake LLM clients, so the numbers are pure Python.
+
+    python -m benchmarks                       # writes benchmarks/results/<commit>.json
+    python -m benchmarks --only micro --iterations 20
+    python -m benchmarks --compare old.json new.json
+"""
@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+# No real provider is ever called; LangChain still wants a key to build its client
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+from app.config import settings  # noqa: E402
+from .suite import run_suite  # noqa: E402
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def _headline(stats: dict) -> float:
+    return stats["mean"] if stats["unit"] == "ms" else stats["best"]
+
+
+def compare(old_path: str, new_path: str):
+    old = json.loads(Path(old_path).read_text())
+    new = json.loads(Path(new_path).read_text())
+    print(f"{'case':58} {old['meta']['git_commit']:>12} {new['meta']['git_commit']:>12}   change")
+    for name, stats in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            continue
+        a, b = _headline(before), _headline(stats)
+        change = f"{(b - a) / a * 100:+.1f}%" if a else "n/a"
+        print(f"{name:58} {a:>10.3f}{stats['unit']:>2} {b:>10.3f}{stats['unit']:>2}   {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Orchestration-overhead benchmarks (instant fake LLM)")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", default="", help="comma-separated groups: runners,chat,micro")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # Caches and coalescing would turn repeat runs into lookups; measure the full path
+    settings.llm_cache_enabled = False
+    settings.llm_semantic_cache_enabled = False
+    settings.llm_singleflight_enabled = False
+
+    only = [group.strip() for group in args.only.split(",") if group.strip()]
+    started = time.time()
+    results = asyncio.run(run_suite(args.iterations, args.warmup, only))
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "git_commit": commit,
+            "timestamp": int(started),
+            "duration_s": round(time.time() - started, 2),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "warmup": args.warmup
+        },
+        "results": results
+    }
+
+    output = Path(args.output or f"benchmarks/results/{commit}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    for name, stats in results.items():
+        extra = f"  ({stats['llm_calls_per_run']} calls, {stats['overhead_per_call_ms']} ms/call)" \
+            if "llm_calls_per_run" in stats else ""
+        print(f"{name:58} {_headline(stats):>10.3f} {stats['unit']}{extra}")
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Instant LLM stand-ins for benchmarks: canned, schema-conformant responses with
+no network and no sleep, so timings measure only our own orchestration code.
+
+InstantClient replaces AsyncOpenAI for the runners and the chat agent
+(stream=True answers with the same content in a few chunks).
+"""
+
+import json
+import random
+import time
+from typing import Any, Dict, List, Optional
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+from mock_llm.schema_faker import fake_from_schema, fake_json_object
+
+_WORDS = ["bench", "idea", "signal", "pilot", "community", "platform"]
+
+
+class _CannedContent:
+    """Response text per schema name, generated once and replayed"""
+
+    def __init__(self):
+        self._by_key: Dict[str, str] = {}
+
+    def for_request(self, request: Dict[str, Any]) -> str:
+        response_format = request.get("response_format") or {}
+        json_schema = response_format.get("json_schema") or {}
+        key = json_schema.get("name") or response_format.get("type") or "text"
+        content = self._by_key.get(key)
+        if content is None:
+            rng = random.Random(key)
+            if json_schema:
+                content = json.dumps(fake_from_schema(json_schema.get("schema", {}), rng, _WORDS))
+            elif response_format.get("type") == "json_object":
+                content = json.dumps(fake_json_object(rng, _WORDS))
+            else:
+                content = "Here are the results. Which idea should we explore further?"
+            self._by_key[key] = content
+        return content
+
+
+def _completion(model: str, message: Dict[str, Any], finish_reason: str) -> Dict[str, Any]:
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", **message}, "finish_reason": finish_reason}],
+        "usage": {"prompt_tokens": 100, "completion_tokens": 20, "total_tokens": 120}
+    }
+
+
+class _InstantStream:
+    """Async iterator of chunks with the AsyncStream close() the gateway calls"""
+
+    def __init__(self, completion: Dict[str, Any], include_usage: bool, pieces: int = 4):
+        choice = completion["choices"][0]
+        content = choice["message"].get("content") or ""
+        size = max(1, -(-len(content) // pieces))
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> ChatCompletionChunk:
+            return ChatCompletionChunk.model_validate({
+                "id": completion["id"], "object": "chat.completion.chunk", "created": completion["created"],
+                "model": completion["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+                **extra
+            })
+
+        self._chunks = [chunk({"role": "assistant", "content": ""})]
+        if choice["message"].get("tool_calls"):
+            self._chunks.append(chunk({"tool_calls": [{"index": i, **call}
+                                                      for i, call in enumerate(choice["message"]["tool_calls"])]}))
+        else:
+            self._chunks += [chunk({"content": content[i:i + size]}) for i in range(0, len(content), size)]
+        self._chunks.append(chunk({}, choice["finish_reason"]))
+        if include_usage:
+            self._chunks.append(chunk(None, usage=completion["usage"]))
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self._chunks:
+            yield chunk
+
+    async def close(self):
+        pass
+
+
+def _is_classifier(messages: List[Dict[str, Any]]) -> bool:
+    """The routing classifier asks for a category name in plain text"""
+    return "category" in " ".join(str(m.get("content", "")) for m in messages).lower()
+
+
+class _Completions:
+    def __init__(self, client: "InstantClient"):
+        self._client = client
+
+    async def create(self, **request) -> Any:
+        self._client.calls += 1
+        messages: List[Dict[str, Any]] = request.get("messages", [])
+        tool_call = self._client.tool_call
+        if tool_call and request.get("tools") and messages and messages[-1].get("role") == "user":
+            message = {"content": None, "tool_calls": [{
+                "id": "call_bench",
+                "type": "function",
+                "function": {"name": tool_call["name"], "arguments": json.dumps(tool_call["arguments"])}
+            }]}
+            completion = _completion(request.get("model"), message, "tool_calls")
+        elif self._client.route_name and not request.get("response_format") and _is_classifier(messages):
+            completion = _completion(request.get("model"), {"content": self._client.route_name}, "stop")
+        else:
+            message = {"content": self._client.content.for_request(request)}
+            completion = _completion(request.get("model"), message, "stop")
+        if request.get("stream"):
+            return _InstantStream(completion, bool((request.get("stream_options") or {}).get("include_usage")))
+        return ChatCompletion.model_validate(completion)
+
+
+class _Chat:
+    def __init__(self, client: "InstantClient"):
+        self.completions = _Completions(client)
+
+
+class InstantClient:
+    """
+    Duck-typed AsyncOpenAI: chat.completions.create returns immediately.
+    With `tool_call` set ({"name": ..., "arguments": {...}}), a user turn
+    offered tools gets that tool call, as the chat agent expects. With
+    `route_name` set, the routing classifier is answered with that route.
+    """
+
+    def __init__(self, tool_call: Optional[Dict[str, Any]] = None, route_name: Optional[str] = None):
+        self.tool_call = tool_call
+        self.route_name = route_name
+        self.content = _CannedContent()
+        self.calls = 0
+        self.chat = _Chat(self)
+
+    async def close(self):
+        pass
+
@@ -0,0 +1,128 @@
+"""
+Benchmark fixtures: sample inputs for the bundled recipes, plus synthetic
+recipes for the runner types brainstorm_recipes.json does not use yet
+(parallel voting/branching, orchestrator, routing).
+"""
+
+from typing import Any, Dict
+from app.models import Recipe, InputDefinition
+
+_IDEA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "description": {"type": "string"},
+        "score": {"type": "integer"}
+    },
+    "required": ["title", "description", "score"],
+    "additionalProperties": False
+}
+_IDEAS = {
+    "type": "object",
+    "properties": {"ideas": {"type": "array", "items": _IDEA, "minItems": 3, "maxItems": 5}},
+    "required": ["ideas"],
+    "additionalProperties": False
+}
+_PLAN = {
+    "type": "object",
+    "properties": {
+        "workers": {
+            "type": "array",
+            "minItems": 3,
+            "maxItems": 3,
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string", "enum": ["market", "technology", "community"]},
+                    "context": {
+                        "type": "object",
+                        "properties": {"focus": {"type": "string"}},
+                        "required": ["focus"],
+                        "additionalProperties": False
+                    }
+                },
+                "required": ["name", "context"],
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["workers"],
+    "additionalProperties": False
+}
+
+_SYSTEM = "You are a structured brainstorming assistant. Respond with JSON only."
+
+
+def _recipe(recipe_id: str, workflow: Dict[str, Any]) -> Recipe:
+    return Recipe(
+        id=recipe_id,
+        name=recipe_id.replace("_", " ").title(),
+        description="Synthetic benchmark recipe",
+        inputs=["topic"],
+        user_prompt_template="",
+        system_prompt=_SYSTEM,
+        workflow=workflow
+    )
+
+
+SYNTHETIC_RECIPES = [
+    _recipe("bench_parallel_voting", {"type": "parallel", "parallel": {
+        "mode": "voting",
+        "votes": 5,
+        "prompt": "Generate ideas about {topic}.",
+        "response_schema": _IDEAS,
+        "synthesis": {"prompt": "Merge these votes into the strongest ideas: {parallel_results}",
+                      "response_schema": _IDEAS}
+    }}),
+    _recipe("bench_parallel_branching", {"type": "parallel", "parallel": {
+        "mode": "branching",
+        "branches": [
+            {"name": lens, "prompt": f"Ideas about {{topic}} through a {lens} lens.", "response_schema": _IDEAS}
+            for lens in ("economic", "social", "technical", "environmental")
+        ],
+        "synthesis": {"prompt": "Combine the branches: {parallel_results}", "response_schema": _IDEAS}
+    }}),
+    _recipe("bench_orchestrator", {"type": "orchestrator", "orchestrator": {
+        "planner": {"prompt": "Plan research workers for {topic}.", "schema": _PLAN},
+        "workers": {"available": [
+            {"name": name, "prompt": f"As the {name} worker, explore {{topic}} given {{worker_context}}.",
+             "schema": _IDEAS}
+            for name in ("market", "technology", "community")
+        ]},
+        "synthesizer": {"prompt": "Synthesize {worker_results} for plan {plan}.", "schema": _IDEAS}
+    }}),
+    _recipe("bench_routing", {"type": "routing", "router": {
+        "classifier": {},
+        "routes": [
+            {"name": "ideas", "description": "open-ended idea generation", "type": "chain", "steps": [
+                {"name": "diverge", "prompt": "List many raw ideas about {topic}."},
+                {"name": "converge", "prompt": "Pick the three best ideas about {topic}."}
+            ]},
+            {"name": "critique", "description": "stress-testing an existing plan",
+             "prompt": "Critique this plan: {topic}."}
+        ]
+    }})
+]
+
+# Route the instant client answers the routing classifier with
+ROUTING_ROUTE = "ideas"
+
+
+def sample_inputs(recipe: Recipe) -> Dict[str, Any]:
+    """Plausible params for a recipe: examples/defaults from its input definitions"""
+    params: Dict[str, Any] = {}
+    for definition in recipe.inputs:
+        if isinstance(definition, str):
+            params[definition] = f"sample {definition} about community gardens"
+            continue
+        if isinstance(definition, dict):
+            definition = InputDefinition(**definition)
+        if definition.default is not None:
+            params[definition.name] = definition.default
+        elif definition.examples:
+            params[definition.name] = definition.examples[0]
+        elif definition.type == "integer":
+            params[definition.name] = definition.range[0] if definition.range else 3
+        else:
+            params[definition.name] = f"sample {definition.name} about community gardens"
+    return params
@@ -0,0 +1,223 @@
+"""
+Benchmark cases. Runner cases execute whole recipes against instant LLM
+stand-ins, so every millisecond reported is our own orchestration overhead
+(profile/prompt building, template rendering, JSON handling, limiter,
+gateway, result assembly). Micro cases time the individual hot spots.
+"""
+
+import json
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
+from app import recipes as recipe_store
+from app.models import Recipe
+from app.services.conversation_agent import ConversationAgent
+from app.services.llm_client import llm_clients
+from app.services.metrics import registry as metrics_registry
+from app.services.prompt_template import compile_template, recipe_templates
+from app.services.recipe_tools import RecipeToolRegistry, RecipeTool
+from app.services.runner import load_profile
+from app.services.runner_factory import RunnerFactory
+from app.services.runners.chain import ChainRunner
+from app.services.runners.iterative import IterativeRunner
+from app.services.unified_runner import run_recipe
+from .fake_client import InstantClient
+from .fixtures import SYNTHETIC_RECIPES, ROUTING_ROUTE, sample_inputs
+
+
+def _summarize_ms(samples: List[float]) -> Dict[str, Any]:
+    ordered = sorted(samples)
+    return {
+        "unit": "ms",
+        "iterations": len(samples),
+        "mean": round(statistics.fmean(samples) * 1000, 4),
+        "p50": round(ordered[len(ordered) // 2] * 1000, 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 4),
+        "min": round(ordered[0] * 1000, 4),
+        "max": round(ordered[-1] * 1000, 4)
+    }
+
+
+async def _time_async(fn: Callable[[], Awaitable[Any]], iterations: int, warmup: int) -> List[float]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _time_sync(fn: Callable[[], Any], repeat: int = 5, min_round: float = 0.05) -> Dict[str, Any]:
+    """timeit-style: calibrate a loop count per round, report per-call microseconds"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        if time.perf_counter() - started >= min_round:
+            break
+        number *= 2
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) / number)
+    return {
+        "unit": "us",
+        "loops": number,
+        "best": round(min(rounds) * 1e6, 3),
+        "mean": round(statistics.fmean(rounds) * 1e6, 3)
+    }
+
+
+def _all_recipes() -> List[Recipe]:
+    return list(recipe_store.RECIPES.values()) + SYNTHETIC_RECIPES
+
+
+def _case_name(recipe: Recipe) -> str:
+    runner_type = RunnerFactory._determine_runner_type(recipe)
+    if runner_type == "parallel":
+        runner_type = f"parallel_{recipe.workflow.parallel.mode}"
+    return f"runner.{runner_type}.{recipe.id}"
+
+
+async def bench_runners(iterations: int, warmup: int) -> Dict[str, Any]:
+    """Every bundled and synthetic recipe end to end through run_recipe with an instant client"""
+    results = {}
+    for recipe in _all_recipes():
+        client = InstantClient(route_name=ROUTING_ROUTE)
+        llm_clients._client = client
+        inputs = sample_inputs(recipe)
+        samples = await _time_async(lambda: run_recipe(recipe, dict(inputs), client=client), iterations, warmup)
+
+        client.calls = 0
+        await run_recipe(recipe, dict(inputs), client=client)
+        calls = client.calls
+
+        stats = _summarize_ms(samples)
+        stats["llm_calls_per_run"] = calls
+        stats["overhead_per_call_ms"] = round(stats["mean"] / calls, 4) if calls else None
+        results[_case_name(recipe)] = stats
+    return results
+
+
+async def bench_chat(iterations: int, warmup: int) -> Dict[str, Any]:
+    """ConversationAgent.chat: a plain reply turn and a tool turn (mind_mapping run + follow-up)"""
+    registry = RecipeToolRegistry(list(recipe_store.RECIPES.values()))
+    results = {}
+    cases = {
+        "chat.plain_turn": None,
+        "chat.tool_turn": {"name": "mind_mapping", "arguments": sample_inputs(recipe_store.RECIPES["mind_mapping"])}
+    }
+    for name, tool_call in cases.items():
+        llm_clients._client = InstantClient(tool_call)
+        agent = ConversationAgent(registry, llm_clients)
+        samples = await _time_async(
+            lambda: agent.chat("Help me brainstorm community garden ideas", [], user_id=None),
+            iterations, warmup
+        )
+        results[name] = _summarize_ms(samples)
+    return results
+
+
+def _replace_per_key(template: str, params: Dict[str, Any]) -> str:
+    """Rendering before compiled templates: one scan of the template per context key"""
+    for key, value in params.items():
+        placeholder = f"{{{key}}}"
+        if placeholder in template:
+            template = template.replace(placeholder, str(value))
+    return template
+
+
+async def _bundled_renders(history: List[Dict[str, Any]], state: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(template, context) for every prompt of the bundled recipes; chain contexts carry real step.* keys"""
+    renders = []
+    for recipe in recipe_store.RECIPES.values():
+        inputs = sample_inputs(recipe)
+        context = {
+            **inputs,
+            "loop": "2",
+            "role": "Skeptic",
+            "state": json.dumps(state, ensure_ascii=False),
+            "params": json.dumps(inputs, ensure_ascii=False),
+            "iteration_summary": json.dumps(history, ensure_ascii=False),
+            "final_state": json.dumps(state, ensure_ascii=False)
+        }
+        if recipe.workflow and recipe.workflow.chain:
+            result = await ChainRunner(None, InstantClient()).run(recipe, dict(inputs))
+            for step in result["steps"]:
+                context[f"step.{step['step']}.output"] = step["output"]
+                if isinstance(step["output"], dict):
+                    for key, value in step["output"].items():
+                        context[f"step.{step['step']}.{key}"] = value
+        renders.extend((text, context) for _, text, _ in recipe_templates(recipe) if text)
+    return renders
+
+
+async def bench_micro() -> Dict[str, Any]:
+    """Hot spots timed in isolation: rendering, state (de)serialization, markdown, schema building, scraping"""
+    results = {}
+    bundled = list(recipe_store.RECIPES.values())
+    profile = load_profile("demo-user")
+
+    # A realistic iterative history/state, produced by one instant debate run
+    debate = recipe_store.RECIPES["multi_agent_debate"]
+    debate_result = await IterativeRunner(profile, InstantClient()).run(debate, sample_inputs(debate))
+    history, state = debate_result["history"], debate_result["final_state"]
+
+    runner = IterativeRunner(profile, InstantClient())
+    template = max((r.user_prompt_template for r in bundled), key=len)
+    context = {
+        **sample_inputs(debate),
+        "state": json.dumps(state, ensure_ascii=False),
+        "params": json.dumps(sample_inputs(debate), ensure_ascii=False),
+        "loop": "2"
+    }
+    results["template.safe_template_replace"] = _time_sync(lambda: runner.safe_template_replace(template, context))
+
+    # Every prompt of the bundled recipes with the context its runner builds: per-key
+    # str.replace scans (how templates were rendered before) vs compiled single-pass rendering
+    renders = await _bundled_renders(history, state)
+    results["template.bundled.str_replace"] = _time_sync(
+        lambda: [_replace_per_key(text, context) for text, context in renders]
+    )
+    results["template.bundled.compiled"] = _time_sync(
+        lambda: [compile_template(text).render(context) for text, context in renders]
+    )
+    results["prompt.build_system_prompt"] = _time_sync(lambda: runner.build_system_prompt(debate.system_prompt or ""))
+
+    results["state.json_dumps"] = _time_sync(lambda: json.dumps(state, ensure_ascii=False))
+    state_json = json.dumps(state, ensure_ascii=False)
+    results["state.json_loads"] = _time_sync(lambda: json.loads(state_json))
+    results["history.json_dumps"] = _time_sync(lambda: json.dumps(history, ensure_ascii=False))
+
+    results["markdown.iterative_render"] = _time_sync(
+        lambda: runner._render_markdown(history, debate_result.get("final_synthesis"))
+    )
+
+    results["schema.to_openai_function_schema"] = _time_sync(
+        lambda: [RecipeTool(r).to_openai_function_schema() for r in bundled]
+    )
+    registry = RecipeToolRegistry(bundled)
+    results["tools.list_tool_schemas"] = _time_sync(registry.list_tool_schemas)
+
+    results["result.json_dumps"] = _time_sync(lambda: json.dumps(debate_result, ensure_ascii=False))
+    results["metrics.render"] = _time_sync(metrics_registry.render)
+    return results
+
+
+async def run_suite(iterations: int, warmup: int, only: List[str]) -> Dict[str, Any]:
+    groups = {
+        "runners": lambda: bench_runners(iterations, warmup),
+        "chat": lambda: bench_chat(iterations, warmup),
+        "micro": bench_micro
+    }
+    results = {}
+    for name, bench in groups.items():
+        if only and name not in only:
+            continue
+        results.update(await bench())
+    return results
@@ -1,9 +1,28 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.recipes import load_recipes
-from app.routers import recipes, run, profile, chat
+from app.routers import recipes, run, profile, chat, traces, jobs
+from app.services.llm_client import llm_clients
+from app.services.llm_cache import llm_cache
+from app.services.job_queue import job_queue
+from app.services.tracing import start_span, use_span
+from app.services.metrics import registry as metrics_registry, CONTENT_TYPE as METRICS_CONTENT_TYPE
 
-app = FastAPI(title="Thought Partner API", version="0.2.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled LLM client for the whole process
+    llm_clients.startup()
+    # Drop expired and overflow rows left in the disk cache tier by earlier runs
+    await llm_cache.prune()
+    await job_queue.start()
+    yield
+    await job_queue.shutdown()
+    await llm_clients.shutdown()
+
+app = FastAPI(title="Thought Partner API", version="0.2.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -13,12 +32,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Root span per request; it ends when the body has been sent, so SSE streams are covered"""
+    if request.url.path.startswith(("/traces", "/metrics")):
+        return await call_next(request)
+
+    request_span = start_span(f"{request.method} {request.url.path}", kind="server",
+                              **{"http.method": request.method, "http.target": request.url.path})
+    try:
+        with use_span(request_span):
+            response = await call_next(request)
+    except BaseException as e:
+        request_span.end(error=type(e).__name__)
+        raise
+    request_span.set(**{"http.status_code": response.status_code})
+    if request_span.trace_id:
+        response.headers["x-trace-id"] = request_span.trace_id
+
+    body = response.body_iterator
+
+    async def traced_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            request_span.end()
+
+    response.body_iterator = traced_body()
+    return response
+
 load_recipes("brainstorm_recipes.json")
 app.include_router(recipes.router)
 app.include_router(run.router)
 app.include_router(profile.router)
 app.include_router(chat.router, tags=["chat"])
+app.include_router(traces.router)
+app.include_router(jobs.router)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (async so rendering never races the event loop's updates)"""
+    return PlainTextResponse(metrics_registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 @app.get("/")
 def root():
-    return {"ok": True, "routes": ["/recipes", "/run", "/profile", "/chat"]}
\ No newline at end of file
+    return {"ok": True, "routes": ["/recipes", "/run", "/profile", "/chat", "/jobs", "/traces", "/metrics"]}
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+Local OpenAI-compatible mock LLM server (see server.py).
+
+    python -m mock_llm --port 8100
+    OPENAI_BASE_URL=http://localhost:8100/v1 uvicorn main:app --port 8000
+"""
@@ -0,0 +1,14 @@
+import argparse
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the mock OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    args = parser.parse_args()
+    uvicorn.run("mock_llm.server:app", host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Schema Faker
+Builds JSON values that conform to the (strict-mode) JSON Schemas used in
+brainstorm_recipes.json: objects with required properties, arrays with
+minItems/maxItems, enums, strings, integers, numbers and booleans.
+Strings are made from words of the prompt so outputs look loosely on-topic.
+"""
+
+import random
+from typing import Any, Dict, List
+
+_FILLER = [
+    "idea", "approach", "insight", "option", "angle", "concept", "pilot", "signal",
+    "user", "cost", "risk", "value", "community", "platform", "experiment", "habit"
+]
+
+
+def sentence(rng: random.Random, words: List[str], length: int = 8) -> str:
+    pool = words or _FILLER
+    text = " ".join(rng.choice(pool) for _ in range(length))
+    return text[:1].upper() + text[1:] + "."
+
+
+def fake_from_schema(schema: Dict[str, Any], rng: random.Random, words: List[str], depth: int = 0) -> Any:
+    """Return a value valid against `schema`"""
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    if "const" in schema:
+        return schema["const"]
+    for combinator in ("anyOf", "oneOf"):
+        if combinator in schema:
+            return fake_from_schema(schema[combinator][0], rng, words, depth)
+
+    schema_type = schema.get("type")
+    if isinstance(schema_type, list):
+        schema_type = next((t for t in schema_type if t != "null"), "null")
+    if schema_type is None:
+        schema_type = "object" if "properties" in schema else "string"
+
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        # Strict schemas require every property; keep optional ones too, they are valid
+        return {name: fake_from_schema(sub, rng, words, depth + 1) for name, sub in properties.items()}
+    if schema_type == "array":
+        low = schema.get("minItems", 2)
+        high = schema.get("maxItems", max(low, 4 if depth < 3 else low))
+        count = rng.randint(low, max(low, min(high, low + 3)))
+        return [fake_from_schema(schema.get("items", {}), rng, words, depth + 1) for _ in range(count)]
+    if schema_type == "integer":
+        low = schema.get("minimum", 1)
+        return rng.randint(low, schema.get("maximum", max(low, 10)))
+    if schema_type == "number":
+        low = schema.get("minimum", 0.0)
+        return round(rng.uniform(low, schema.get("maximum", low + 1.0)), 3)
+    if schema_type == "boolean":
+        return rng.random() < 0.5
+    if schema_type == "null":
+        return None
+    return sentence(rng, words, rng.randint(3, 10))
+
+
+def fake_json_object(rng: random.Random, words: List[str]) -> Dict[str, Any]:
+    """Generic payload for response_format={"type": "json_object"} (no schema to follow)"""
+    return {
+        "summary": sentence(rng, words, 12),
+        "ideas": [sentence(rng, words, 6) for _ in range(3)],
+        "next_state": {"notes": sentence(rng, words, 6)}
+    }
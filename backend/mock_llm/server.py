@@ -0,0 +1,408 @@
+"""
+Mock LLM Server
+OpenAI-compatible stand-in for POST /v1/chat/completions, used to benchmark
+and load-test the API with no network. Point the app at it with
+OPENAI_BASE_URL=http://localhost:8100/v1.
+
+- response_format json_schema -> JSON conforming to the schema
+- response_format json_object -> generic JSON object
+- tools + a user turn naming a tool (e.g. "mind map ...") -> tool call
+- stream=true -> SSE chunks (text and tool calls), optional usage chunk
+- /v1/files + /v1/batches -> batch API: an uploaded JSONL input is answered
+  into output/error files MOCK_LLM_BATCH_LATENCY seconds after submission
+- latency distributions, 500/429 injection and an RPM window with
+  x-ratelimit-* headers, configured by MOCK_LLM_* env vars or PUT /mock/config
+"""
+
+import asyncio
+import email.policy
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import time
+import uuid
+from collections import deque
+from email.parser import BytesParser
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel
+from .schema_faker import fake_from_schema, fake_json_object, sentence
+
+
+class MockConfig(BaseModel):
+    latency: str = os.getenv("MOCK_LLM_LATENCY", "lognormal")  # none, fixed, uniform, lognormal
+    latency_mean: float = float(os.getenv("MOCK_LLM_LATENCY_MEAN", "0.3"))  # seconds (median for lognormal)
+    latency_sigma: float = float(os.getenv("MOCK_LLM_LATENCY_SIGMA", "0.5"))  # lognormal sigma / uniform half-width
+    per_token_latency: float = float(os.getenv("MOCK_LLM_PER_TOKEN_LATENCY", "0"))  # seconds per completion token
+    error_rate: float = float(os.getenv("MOCK_LLM_ERROR_RATE", "0"))  # fraction answered with HTTP 500
+    rate_limit_rate: float = float(os.getenv("MOCK_LLM_RATE_LIMIT_RATE", "0"))  # fraction answered with HTTP 429
+    retry_after: float = float(os.getenv("MOCK_LLM_RETRY_AFTER", "1"))
+    rpm_limit: int = int(os.getenv("MOCK_LLM_RPM_LIMIT", "0"))  # 0 = unlimited
+    tool_call_rate: float = float(os.getenv("MOCK_LLM_TOOL_CALL_RATE", "0"))  # tool call odds when no tool is named
+    stream_chunk_delay: float = float(os.getenv("MOCK_LLM_STREAM_CHUNK_DELAY", "0.02"))
+    batch_latency: float = float(os.getenv("MOCK_LLM_BATCH_LATENCY", "2"))  # seconds until a batch completes
+
+
+config = MockConfig()
+app = FastAPI(title="Mock LLM", version="0.1.0")
+
+_stats = {"requests": 0, "completed": 0, "streamed": 0, "errors": 0, "rate_limited": 0, "tool_calls": 0,
+          "batches": 0, "batch_requests": 0}
+_recent_requests: deque = deque()
+
+# Batch API state: file id -> {"object": file object, "content": bytes}, batch id -> batch object
+_files: Dict[str, Dict[str, Any]] = {}
+_batches: Dict[str, Dict[str, Any]] = {}
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z\-]{3,}")
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _sample_latency(rng: random.Random) -> float:
+    if config.latency == "fixed":
+        return config.latency_mean
+    if config.latency == "uniform":
+        return max(0.0, rng.uniform(config.latency_mean - config.latency_sigma,
+                                    config.latency_mean + config.latency_sigma))
+    if config.latency == "lognormal":
+        return rng.lognormvariate(math.log(max(config.latency_mean, 1e-6)), config.latency_sigma)
+    return 0.0
+
+
+def _error(status: int, message: str, error_type: str, headers: Optional[Dict[str, str]] = None) -> JSONResponse:
+    return JSONResponse({"error": {"message": message, "type": error_type, "code": None}},
+                        status_code=status, headers=headers)
+
+
+def _rate_limit_headers() -> Dict[str, str]:
+    if not config.rpm_limit:
+        return {}
+    now = time.monotonic()
+    reset = (_recent_requests[0] + 60 - now) if _recent_requests else 0.0
+    return {
+        "x-ratelimit-limit-requests": str(config.rpm_limit),
+        "x-ratelimit-remaining-requests": str(max(0, config.rpm_limit - len(_recent_requests))),
+        "x-ratelimit-reset-requests": f"{max(0.0, reset):.3f}s"
+    }
+
+
+def _admit() -> bool:
+    """Sliding 60s request window for rpm_limit"""
+    if not config.rpm_limit:
+        return True
+    now = time.monotonic()
+    while _recent_requests and _recent_requests[0] <= now - 60:
+        _recent_requests.popleft()
+    if len(_recent_requests) >= config.rpm_limit:
+        return False
+    _recent_requests.append(now)
+    return True
+
+
+def _text(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content or ""
+
+
+def _pick_tool(tools: List[Dict[str, Any]], user_text: str, rng: random.Random) -> Optional[Dict[str, Any]]:
+    """Tool whose name is spelled out in the user turn ("mind map" -> mind_mapping), else by tool_call_rate"""
+    prefixes = {word[:3] for word in re.findall(r"[a-z]+", user_text.lower())}
+    for tool in tools:
+        name = tool.get("function", {}).get("name", "")
+        tokens = [token for token in name.lower().split("_") if token]
+        if tokens and all(token[:3] in prefixes for token in tokens):
+            return tool
+    if tools and rng.random() < config.tool_call_rate:
+        return rng.choice(tools)
+    return None
+
+
+def _tool_arguments(tool: Dict[str, Any], user_text: str, rng: random.Random, words: List[str]) -> Dict[str, Any]:
+    parameters = tool.get("function", {}).get("parameters", {})
+    arguments = {}
+    for name in parameters.get("required", list(parameters.get("properties", {}))):
+        schema = parameters.get("properties", {}).get(name, {})
+        # Free-text parameters (topic, problem, ...) get the user's own words
+        arguments[name] = user_text if schema.get("type", "string") == "string" and "enum" not in schema \
+            else fake_from_schema(schema, rng, words)
+    return arguments
+
+
+def _build_reply(body: Dict[str, Any], rng: random.Random) -> Dict[str, Any]:
+    """Decide the assistant message: {"content": ...} or {"tool_calls": [...]}"""
+    messages = body.get("messages", [])
+    last = messages[-1] if messages else {}
+    user_text = next((_text(m) for m in reversed(messages) if m.get("role") == "user"), "")
+    words = [w.lower() for w in _WORD.findall(user_text)]
+
+    tools = body.get("tools") or []
+    if tools and last.get("role") == "user" and body.get("tool_choice") != "none":
+        tool = _pick_tool(tools, user_text, rng)
+        if tool is not None:
+            return {"tool_calls": [{
+                "id": f"call_{uuid.uuid4().hex[:24]}",
+                "type": "function",
+                "function": {
+                    "name": tool["function"]["name"],
+                    "arguments": json.dumps(_tool_arguments(tool, user_text, rng, words))
+                }
+            }]}
+
+    response_format = body.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format.get("json_schema", {}).get("schema", {})
+        return {"content": json.dumps(fake_from_schema(schema, rng, words), ensure_ascii=False)}
+    if response_format.get("type") == "json_object":
+        return {"content": json.dumps(fake_json_object(rng, words), ensure_ascii=False)}
+    if last.get("role") == "tool":
+        return {"content": "Here are the results. " + sentence(rng, words, 10) + " Want to explore any of them further?"}
+    return {"content": " ".join(sentence(rng, words, rng.randint(6, 12)) for _ in range(2))}
+
+
+def _usage(body: Dict[str, Any], reply: Dict[str, Any]) -> Dict[str, int]:
+    prompt_tokens = sum(_estimate_tokens(_text(m)) + 4 for m in body.get("messages", []))
+    completion_tokens = _estimate_tokens(reply.get("content") or json.dumps(reply.get("tool_calls")))
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def _request_rng(body: Dict[str, Any]) -> random.Random:
+    # Same request -> same answer, different temperatures -> different samples
+    digest = hashlib.sha256(json.dumps(body, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+    return random.Random(int(digest[:16], 16))
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    _stats["requests"] += 1
+    rng = _request_rng(body)
+    chaos = random.random()
+
+    if not _admit():
+        _stats["rate_limited"] += 1
+        return _error(429, "Rate limit reached for requests (mock rpm_limit)", "requests",
+                      {"retry-after": f"{config.retry_after:g}", **_rate_limit_headers()})
+    if chaos < config.rate_limit_rate:
+        _stats["rate_limited"] += 1
+        return _error(429, "Rate limit reached (mock injection)", "requests",
+                      {"retry-after": f"{config.retry_after:g}", **_rate_limit_headers()})
+    if chaos < config.rate_limit_rate + config.error_rate:
+        await asyncio.sleep(_sample_latency(random.Random()))
+        _stats["errors"] += 1
+        return _error(500, "The server had an error while processing your request (mock injection)", "server_error")
+
+    reply = _build_reply(body, rng)
+    usage = _usage(body, reply)
+    if reply.get("tool_calls"):
+        _stats["tool_calls"] += 1
+    finish_reason = "tool_calls" if reply.get("tool_calls") else "stop"
+    completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+    model = body.get("model", "mock")
+    latency = _sample_latency(random.Random()) + config.per_token_latency * usage["completion_tokens"]
+
+    if body.get("stream"):
+        _stats["streamed"] += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+        return StreamingResponse(
+            _stream(completion_id, model, reply, finish_reason, usage if include_usage else None, latency),
+            media_type="text/event-stream",
+            headers=_rate_limit_headers()
+        )
+
+    await asyncio.sleep(latency)
+    _stats["completed"] += 1
+    return JSONResponse(_completion(completion_id, model, reply, finish_reason, usage), headers=_rate_limit_headers())
+
+
+def _completion(completion_id: str, model: str, reply: Dict[str, Any], finish_reason: str,
+                usage: Dict[str, int]) -> Dict[str, Any]:
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply.get("content"), "tool_calls": reply.get("tool_calls")},
+            "finish_reason": finish_reason
+        }],
+        "usage": usage
+    }
+
+
+async def _stream(completion_id: str, model: str, reply: Dict[str, Any], finish_reason: str,
+                  usage: Optional[Dict[str, int]], first_token_latency: float):
+    def chunk(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+        payload = {
+            "id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}]
+        }
+        return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+    await asyncio.sleep(first_token_latency)
+    yield chunk({"role": "assistant", "content": ""})
+
+    if reply.get("tool_calls"):
+        for index, call in enumerate(reply["tool_calls"]):
+            yield chunk({"tool_calls": [{"index": index, "id": call["id"], "type": "function",
+                                         "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            arguments = call["function"]["arguments"]
+            for start in range(0, len(arguments), 16):
+                await asyncio.sleep(config.stream_chunk_delay)
+                yield chunk({"tool_calls": [{"index": index, "function": {"arguments": arguments[start:start + 16]}}]})
+    else:
+        for piece in re.findall(r"\S+\s*", reply.get("content") or ""):
+            await asyncio.sleep(config.stream_chunk_delay)
+            yield chunk({"content": piece})
+
+    yield chunk({}, finish_reason)
+    if usage is not None:
+        payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": model, "choices": [], "usage": usage}
+        yield f"data: {json.dumps(payload)}\n\n"
+    yield "data: [DONE]\n\n"
+    _stats["completed"] += 1
+
+
+def _multipart(body: bytes, content_type: str) -> Dict[str, Tuple[Optional[str], bytes]]:
+    """form field name -> (filename, content) of a multipart/form-data body"""
+    message = BytesParser(policy=email.policy.HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    if not message.is_multipart():
+        return {}
+    return {
+        part.get_param("name", header="content-disposition"): (part.get_filename(), part.get_payload(decode=True))
+        for part in message.iter_parts()
+    }
+
+
+def _store_file(content: bytes, filename: str, purpose: str) -> Dict[str, Any]:
+    file_id = f"file-mock-{uuid.uuid4().hex[:24]}"
+    _files[file_id] = {
+        "object": {"id": file_id, "object": "file", "bytes": len(content), "created_at": int(time.time()),
+                   "filename": filename, "purpose": purpose, "status": "processed"},
+        "content": content
+    }
+    return _files[file_id]["object"]
+
+
+def _jsonl(records: List[Dict[str, Any]]) -> bytes:
+    return "\n".join(json.dumps(record, ensure_ascii=False) for record in records).encode("utf-8")
+
+
+async def _process_batch(batch: Dict[str, Any], content: bytes):
+    """Answer every request of a batch input file, then publish the output/error files"""
+    await asyncio.sleep(config.batch_latency)
+    outputs, errors = [], []
+    for line in content.decode("utf-8").splitlines():
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        body = request.get("body") or {}
+        _stats["batch_requests"] += 1
+        record = {"id": f"batch_req_{uuid.uuid4().hex[:24]}", "custom_id": request.get("custom_id"), "error": None}
+        if random.random() < config.error_rate:
+            record["response"] = {"status_code": 500, "request_id": uuid.uuid4().hex, "body": {"error": {
+                "message": "The server had an error while processing your request (mock injection)",
+                "type": "server_error"}}}
+            errors.append(record)
+            continue
+        reply = _build_reply(body, _request_rng(body))
+        finish_reason = "tool_calls" if reply.get("tool_calls") else "stop"
+        completion = _completion(f"chatcmpl-mock-{uuid.uuid4().hex[:12]}", body.get("model", "mock"), reply,
+                                 finish_reason, _usage(body, reply))
+        record["response"] = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": completion}
+        outputs.append(record)
+
+    if outputs:
+        batch["output_file_id"] = _store_file(_jsonl(outputs), "batch_output.jsonl", "batch_output")["id"]
+    if errors:
+        batch["error_file_id"] = _store_file(_jsonl(errors), "batch_errors.jsonl", "batch_output")["id"]
+    batch["request_counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)}
+    batch["status"] = "completed"
+    batch["completed_at"] = int(time.time())
+
+
+@app.post("/v1/files")
+async def upload_file(request: Request):
+    parts = _multipart(await request.body(), request.headers.get("content-type", ""))
+    if "file" not in parts:
+        return _error(400, "Missing 'file' form field", "invalid_request_error")
+    filename, content = parts["file"]
+    purpose = parts.get("purpose", (None, b"batch"))[1].decode("utf-8")
+    return _store_file(content or b"", filename or "upload.jsonl", purpose)
+
+
+@app.get("/v1/files/{file_id}")
+async def get_file(file_id: str):
+    if file_id not in _files:
+        return _error(404, f"No such File object: {file_id}", "invalid_request_error")
+    return _files[file_id]["object"]
+
+
+@app.get("/v1/files/{file_id}/content")
+async def get_file_content(file_id: str):
+    if file_id not in _files:
+        return _error(404, f"No such File object: {file_id}", "invalid_request_error")
+    return Response(_files[file_id]["content"], media_type="application/octet-stream")
+
+
+@app.post("/v1/batches")
+async def create_batch(body: Dict[str, Any]):
+    input_file = _files.get(body.get("input_file_id"))
+    if input_file is None:
+        return _error(404, f"No such File object: {body.get('input_file_id')}", "invalid_request_error")
+    now = int(time.time())
+    batch_id = f"batch_mock_{uuid.uuid4().hex[:24]}"
+    total = sum(1 for line in input_file["content"].splitlines() if line.strip())
+    batch = _batches[batch_id] = {
+        "id": batch_id, "object": "batch", "endpoint": body.get("endpoint", "/v1/chat/completions"),
+        "errors": None, "input_file_id": input_file["object"]["id"],
+        "completion_window": body.get("completion_window", "24h"), "status": "in_progress",
+        "output_file_id": None, "error_file_id": None, "created_at": now, "in_progress_at": now,
+        "completed_at": None, "request_counts": {"total": total, "completed": 0, "failed": 0},
+        "metadata": body.get("metadata")
+    }
+    _stats["batches"] += 1
+    asyncio.create_task(_process_batch(batch, input_file["content"]))
+    return batch
+
+
+@app.get("/v1/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    if batch_id not in _batches:
+        return _error(404, f"No such Batch object: {batch_id}", "invalid_request_error")
+    return _batches[batch_id]
+
+
+@app.get("/v1/models")
+async def list_models():
+    return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock-llm"}]}
+
+
+@app.get("/mock/config")
+async def get_config():
+    return config
+
+
+@app.put("/mock/config")
+async def update_config(update: Dict[str, Any]):
+    """Change latency / fault injection at runtime (partial update)"""
+    global config
+    config = MockConfig(**{**config.model_dump(), **update})
+    return config
+
+
+@app.get("/mock/stats")
+async def get_stats():
+    return _stats
@@ -0,0 +1,75 @@
+"""
+Context budget (context_budget.apply_budget): output limits follow the model
+that actually serves the call, including the fallback model.
+Run from backend/: python -m pytest -q
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import httpx
+import openai
+
+from app.config import settings
+from app.services import resilience
+from app.services.context_budget import apply_budget, retarget
+from app.services.llm_gateway import chat_completion
+from benchmarks.fake_client import InstantClient
+
+MESSAGES = [{"role": "user", "content": "Ideas about community gardens."}]
+
+
+def test_retarget_moves_explicit_limit_to_fallback_parameter():
+    assert retarget({"model": "gpt-4o", "max_tokens": 16_000}, "o4-mini") == {
+        "model": "o4-mini", "max_completion_tokens": 16_000
+    }
+
+
+def test_retarget_clamps_explicit_limit_to_fallback_maximum():
+    assert retarget({"model": "gpt-4o", "max_tokens": 16_000}, "gpt-4-turbo") == {
+        "model": "gpt-4-turbo", "max_tokens": 4_096
+    }
+
+
+def test_fallback_call_is_budgeted_for_the_fallback_model(monkeypatch):
+    monkeypatch.setattr(settings, "llm_fallback_model", "gpt-4-turbo")
+    monkeypatch.setattr(settings, "llm_max_retries", 0)
+    monkeypatch.setattr(resilience, "breakers", resilience.BreakerRegistry(1, 60))
+    client = InstantClient()
+    create = client.chat.completions.create
+    sent = []
+
+    async def failing_primary(**request):
+        sent.append(request)
+        if request["model"] == "gpt-4o":
+            raise openai.APIConnectionError(request=httpx.Request("POST", "http://provider"))
+        return await create(**request)
+
+    client.chat.completions.create = failing_primary
+    asyncio.run(chat_completion(client, messages=MESSAGES, model="gpt-4o", max_tokens=16_000, coalesce=False))
+    assert [request["model"] for request in sent] == ["gpt-4o", "gpt-4-turbo"]
+    assert sent[0]["max_tokens"] == 16_000
+    assert sent[1]["max_tokens"] == 4_096
+
+
+def test_roomy_prompt_keeps_provider_output_default(monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_output_tokens", 0)
+    request = {"model": "gpt-4o-mini"}
+    apply_budget(MESSAGES, request)
+    assert "max_tokens" not in request
+
+
+def test_prompt_near_the_window_gets_the_room_left(monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_output_tokens", 0)
+    request = {"model": "gpt-4"}
+    prompt_tokens = apply_budget([{"role": "user", "content": "garden " * 2000}], request)
+    assert request["max_tokens"] == 8_192 - prompt_tokens
+
+
+def test_configured_output_cap_is_applied(monkeypatch):
+    monkeypatch.setattr(settings, "llm_max_output_tokens", 1_000)
+    request = {"model": "gpt-4o-mini"}
+    apply_budget(MESSAGES, request)
+    assert request["max_tokens"] == 1_000
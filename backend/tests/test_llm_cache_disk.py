@@ -0,0 +1,37 @@
+"""
+SQLite response cache tier: expired rows are purged and the row count stays
+bounded, at startup (LLMResponseCache.prune) and every PRUNE_EVERY writes.
+Run from backend/: python -m pytest -q
+"""
+
+import asyncio
+import os
+import time
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.services.llm_cache import LLMResponseCache, SQLiteCacheStore
+
+
+def test_writes_keep_row_count_bounded(tmp_path):
+    store = SQLiteCacheStore(str(tmp_path / "cache.db"), ttl=3600, max_entries=50)
+    for i in range(SQLiteCacheStore.PRUNE_EVERY * 3):
+        store.set(f"key-{i}", "value")
+    assert store.count() == 50
+    assert store.get(f"key-{SQLiteCacheStore.PRUNE_EVERY * 3 - 1}") is not None
+    assert store.get("key-0") is None
+    store.close()
+
+
+def test_startup_prune_drops_expired_rows(tmp_path):
+    path = str(tmp_path / "cache.db")
+    store = SQLiteCacheStore(path, ttl=0.01, max_entries=100)
+    for i in range(5):
+        store.set(f"key-{i}", "value")
+    store.close()
+    time.sleep(0.02)
+
+    cache = LLMResponseCache(max_entries=10, ttl=3600, db_path=path, db_max_entries=100)
+    assert asyncio.run(cache.prune()) == 5
+    assert cache.disk.count() == 0
+    cache.disk.close()
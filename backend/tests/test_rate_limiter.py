@@ -0,0 +1,38 @@
+"""
+TPM accounting (AdaptiveRateLimiter): a call is charged its prompt plus its
+output limit up front, then settled to the tokens the provider reports.
+Run from backend/: python -m pytest -q
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import pytest
+
+from app.services import llm_gateway
+from app.services.rate_limiter import AdaptiveRateLimiter
+from benchmarks.fake_client import InstantClient
+
+
+def test_call_is_charged_output_limit_then_settled_to_usage(monkeypatch):
+    limiter = AdaptiveRateLimiter(max_concurrency=4, tpm_limit=100_000)
+    monkeypatch.setattr(llm_gateway, "rate_limiter", limiter)
+    client = InstantClient()
+    create = client.chat.completions.create
+    charged = []
+
+    async def observed_create(**request):
+        charged.append(limiter.tokens.capacity - limiter.tokens.available)
+        return await create(**request)
+
+    client.chat.completions.create = observed_create
+    messages = [{"role": "user", "content": "Ideas about community gardens."}]
+    prompt_tokens = llm_gateway.apply_budget(messages, {"model": "gpt-4o-mini"})
+    asyncio.run(llm_gateway.chat_completion(client, messages=messages, model="gpt-4o-mini",
+                                            max_tokens=2_000, coalesce=False))
+
+    # InstantClient reports 120 total tokens per call; the bucket refills a little meanwhile
+    assert charged[0] == pytest.approx(prompt_tokens + 2_000, abs=5)
+    assert limiter.tokens.capacity - limiter.tokens.available == pytest.approx(120, abs=5)
@@ -0,0 +1,66 @@
+"""
+Response cache opt-in (BaseRunner.cache_enabled): sampling steps give fresh
+output on every run unless the recipe or step asks for caching.
+Run from backend/: python -m pytest -q
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.models import Recipe
+from app.recipes import RECIPES
+from app.services.llm_cache import llm_cache
+from app.services.runner_factory import RunnerFactory
+from benchmarks.fake_client import InstantClient
+
+
+def _chain_recipe(recipe_id: str, temperature=0.7, **step) -> Recipe:
+    return Recipe(
+        id=recipe_id,
+        name=recipe_id,
+        description="Cache policy test recipe",
+        inputs=["topic"],
+        user_prompt_template="",
+        system_prompt=f"You are the {recipe_id} test recipe.",
+        workflow={"type": "chain", "chain": {
+            "temperature": temperature,
+            "steps": [{"id": "ideas", "prompt": "Ideas about {topic}.", **step}]
+        }}
+    )
+
+
+def _provider_calls(recipe: Recipe, runs: int = 2) -> int:
+    """Provider requests made by `runs` identical runs of a recipe"""
+    llm_cache.clear()
+    client = InstantClient()
+
+    async def run_all():
+        for _ in range(runs):
+            runner = RunnerFactory.create_runner(recipe, client=client)
+            await runner.execute(recipe, {"topic": "community gardens"})
+
+    asyncio.run(run_all())
+    return client.calls
+
+
+def test_sampling_step_without_opt_in_is_not_cached():
+    assert _provider_calls(_chain_recipe("cache_policy_sampling")) == 2
+
+
+def test_step_opt_in_is_cached():
+    assert _provider_calls(_chain_recipe("cache_policy_step_opt_in", cache=True)) == 1
+
+
+def test_recipe_opt_in_is_cached():
+    recipe = _chain_recipe("cache_policy_recipe_opt_in").model_copy(update={"cache": True})
+    assert _provider_calls(recipe) == 1
+
+
+def test_deterministic_step_is_cached_by_default():
+    assert _provider_calls(_chain_recipe("cache_policy_deterministic", temperature=0)) == 1
+
+
+def test_bundled_mind_mapping_is_cached():
+    assert _provider_calls(RECIPES["mind_mapping"]) == 1
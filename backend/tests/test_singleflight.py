@@ -0,0 +1,78 @@
+"""
+Request coalescing (singleflight): identical calls in flight at the same time
+share one provider request, cached or not, unless a call opts out.
+Run from backend/: python -m pytest -q
+"""
+
+import asyncio
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from app.models import Recipe
+from app.services.llm_cache import llm_cache
+from app.services.llm_gateway import chat_completion
+from app.services.runners.chain import ChainRunner
+from benchmarks.fake_client import InstantClient
+
+
+def _slow_client(delay: float = 0.05) -> InstantClient:
+    """Instant client whose calls stay in flight long enough to overlap"""
+    client = InstantClient()
+    create = client.chat.completions.create
+
+    async def slow_create(**request):
+        await asyncio.sleep(delay)
+        return await create(**request)
+
+    client.chat.completions.create = slow_create
+    return client
+
+
+def _concurrent_calls(client: InstantClient, count: int = 4, **options):
+    request = {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": "Ideas about community gardens."}],
+        "response_format": {"type": "json_object"},
+        "temperature": 0.7
+    }
+
+    async def run_all():
+        return await asyncio.gather(*(chat_completion(client, **request, **options) for _ in range(count)))
+
+    return asyncio.run(run_all())
+
+
+def test_concurrent_identical_calls_share_one_provider_call():
+    client = _slow_client()
+    responses = _concurrent_calls(client)
+    assert client.calls == 1
+    assert len({response.choices[0].message.content for response in responses}) == 1
+
+
+def test_coalescing_opt_out_gets_own_calls():
+    client = _slow_client()
+    _concurrent_calls(client, coalesce=False)
+    assert client.calls == 4
+
+
+def test_concurrent_identical_runs_share_provider_calls():
+    llm_cache.clear()
+    recipe = Recipe(
+        id="singleflight_runs",
+        name="singleflight_runs",
+        description="Singleflight test recipe",
+        inputs=["topic"],
+        user_prompt_template="",
+        system_prompt="You are the singleflight test recipe.",
+        workflow={"type": "chain", "chain": {"steps": [{"id": "ideas", "prompt": "Ideas about {topic}."}]}}
+    )
+    client = _slow_client()
+
+    async def run_all():
+        await asyncio.gather(*(
+            ChainRunner(client=client).execute(recipe, {"topic": "community gardens"}) for _ in range(4)
+        ))
+
+    asyncio.run(run_all())
+    assert client.calls == 1